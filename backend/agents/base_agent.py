@@ -1,37 +1,54 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from collections import deque
+from typing import Dict, Any, List, Deque, Optional
 from datetime import datetime
 
+class AgentContext:
+    """État d'un agent pour une salle (l'agent lui-même n'en garde aucun)"""
+
+    history_size = 50
+
+    def __init__(self):
+        self.last_analysis: Optional[Dict[str, Any]] = None
+        self.analysis_history: Deque[Dict[str, Any]] = deque(maxlen=self.history_size)
+
+    def clear(self):
+        """Libère l'historique et les caches"""
+        self.last_analysis = None
+        self.analysis_history.clear()
+
+    def export(self) -> Dict[str, Any]:
+        """État à conserver dans les snapshots (sans les caches ni l'historique complet)"""
+        return {}
+
+    def load(self, state: Dict[str, Any]):
+        """Restaure un état exporté"""
+        pass
+
 class BaseAgent(ABC):
-    """Classe de base pour tous les agents AI"""
-    
+    """Classe de base pour tous les agents AI (sans état : tout passe par le contexte)"""
+
     def __init__(self, name: str):
         self.name = name
-        self.last_analysis = None
-        self.analysis_history = []
         print(f"🤖 Agent initialized: {name}")
-    
+
     @abstractmethod
-    async def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze(self, data: Dict[str, Any], context: AgentContext) -> Dict[str, Any]:
         """Méthode principale d'analyse à implémenter"""
         pass
-    
-    def _store_analysis(self, result: Dict[str, Any]):
-        """Stocke l'analyse dans l'historique"""
-        self.last_analysis = {
+
+    def _store_analysis(self, context: AgentContext, result: Dict[str, Any]):
+        """Stocke l'analyse dans l'historique (anneau borné) du contexte"""
+        context.last_analysis = {
             "timestamp": datetime.now().isoformat(),
             "result": result
         }
-        self.analysis_history.append(self.last_analysis)
-        
-        # Garde seulement les 50 dernières analyses
-        if len(self.analysis_history) > 50:
-            self.analysis_history = self.analysis_history[-50:]
-    
-    def get_last_analysis(self) -> Dict[str, Any]:
+        context.analysis_history.append(context.last_analysis)
+
+    def get_last_analysis(self, context: AgentContext) -> Dict[str, Any]:
         """Retourne la dernière analyse"""
-        return self.last_analysis
-    
-    def get_history(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return context.last_analysis
+
+    def get_history(self, context: AgentContext, limit: int = 10) -> List[Dict[str, Any]]:
         """Retourne l'historique des analyses"""
-        return self.analysis_history[-limit:]
\ No newline at end of file
+        return list(context.analysis_history)[-limit:]
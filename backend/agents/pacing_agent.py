@@ -1,11 +1,49 @@
-from .base_agent import BaseAgent
-from typing import Dict, Any, List
+from .base_agent import BaseAgent, AgentContext
+from typing import Dict, Any, List, Deque, Optional, Tuple
+from collections import deque
 import asyncio
 from datetime import datetime, timedelta
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from services.gemini_service import gemini_service
+from services.metrics import CACHE_LOOKUPS
+
+class PacingContext(AgentContext):
+    """Per-room pacing state: trend histories, alert cooldowns and AI cache"""
+    
+    def __init__(self):
+        super().__init__()
+        self.engagement_history: Deque[int] = deque(maxlen=10)  # Last 10 scores
+        self.reaction_velocity: Deque[float] = deque(maxlen=10)  # Reactions per second
+        self.last_alert_time: Dict[str, datetime] = {}  # Prevent alert spam
+        self.last_ai_enhancement: Optional[datetime] = None
+        self.ai_cache: Dict[str, Tuple[datetime, Dict]] = {}  # Cache AI insights
+    
+    def clear(self):
+        super().clear()
+        self.engagement_history.clear()
+        self.reaction_velocity.clear()
+        self.last_alert_time.clear()
+        self.last_ai_enhancement = None
+        self.ai_cache.clear()
+    
+    def export(self) -> Dict[str, Any]:
+        return {
+            "engagement_history": list(self.engagement_history),
+            "reaction_velocity": list(self.reaction_velocity),
+            "last_alert_time": {key: value.isoformat() for key, value in self.last_alert_time.items()},
+            "last_ai_enhancement": self.last_ai_enhancement.isoformat() if self.last_ai_enhancement else None
+        }
+    
+    def load(self, state: Dict[str, Any]):
+        self.engagement_history.extend(state.get("engagement_history", []))
+        self.reaction_velocity.extend(state.get("reaction_velocity", []))
+        self.last_alert_time.update(
+            {key: datetime.fromisoformat(value) for key, value in state.get("last_alert_time", {}).items()}
+        )
+        if state.get("last_ai_enhancement"):
+            self.last_ai_enhancement = datetime.fromisoformat(state["last_ai_enhancement"])
 
 class PacingAgent(BaseAgent):
     """
@@ -30,18 +68,11 @@ class PacingAgent(BaseAgent):
             "show_code_interest": 6
         }
         
-        # Historical tracking for trend analysis
-        self.engagement_history = []  # Last 10 scores
-        self.reaction_velocity = []  # Reactions per second
-        self.last_alert_time = {}  # Prevent alert spam
+        # Histories, cooldown timestamps and the AI cache live in each room's PacingContext
         self.alert_cooldown = 15  # seconds
-        
-        # AI Enhancement tracking
-        self.last_ai_enhancement = None
         self.ai_enhancement_cooldown = 10  # Only enhance every 10s
-        self.ai_cache = {}  # Cache AI insights
         
-    async def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze(self, data: Dict[str, Any], context: PacingContext) -> Dict[str, Any]:
         """
         HYBRID ANALYSIS - Best of both worlds:
         1. INSTANT rule-based analysis (<50ms) - ALWAYS runs
@@ -64,8 +95,8 @@ class PacingAgent(BaseAgent):
         )
         
         # STEP 2: Calculate velocity and trends (still instant)
-        velocity = self._calculate_reaction_velocity(recent_reactions)
-        trend = self._calculate_engagement_trend()
+        velocity = self._calculate_reaction_velocity(context, recent_reactions)
+        trend = self._calculate_engagement_trend(context)
         
         # STEP 3: Enhance with velocity insights
         instant_result["reaction_velocity"] = velocity
@@ -75,6 +106,7 @@ class PacingAgent(BaseAgent):
         
         # STEP 4: Smart alerts with cooldown
         instant_result["alerts"] = self._generate_smart_alerts(
+            context,
             reaction_counts, 
             thresholds,
             velocity
@@ -88,6 +120,7 @@ class PacingAgent(BaseAgent):
         
         # STEP 6: Decide if we should enhance with AI
         should_use_ai = self._should_enhance_with_ai(
+            context,
             reaction_counts, 
             instant_result
         )
@@ -95,21 +128,21 @@ class PacingAgent(BaseAgent):
         if should_use_ai:
             # Run AI enhancement in parallel (non-blocking)
             asyncio.create_task(
-                self._enhance_with_ai_async(instant_result, reaction_counts, recent_reactions)
+                self._enhance_with_ai_async(context, instant_result, reaction_counts, recent_reactions)
             )
             instant_result["ai_enhancement"] = "running"
         else:
             instant_result["ai_enhancement"] = "not_needed"
         
         # Update history
-        self._update_history(instant_result["engagement_score"])
+        self._update_history(context, instant_result["engagement_score"])
         
         # Store analysis
-        self._store_analysis(instant_result)
+        self._store_analysis(context, instant_result)
         
         return instant_result
     
-    def _should_enhance_with_ai(self, counts: Dict[str, int], result: Dict) -> bool:
+    def _should_enhance_with_ai(self, context: PacingContext, counts: Dict[str, int], result: Dict) -> bool:
         """
         Smart decision: when to use expensive AI
         Only use AI when:
@@ -131,8 +164,8 @@ class PacingAgent(BaseAgent):
             return False
         
         # Check cooldown
-        if self.last_ai_enhancement:
-            elapsed = (datetime.now() - self.last_ai_enhancement).total_seconds()
+        if context.last_ai_enhancement:
+            elapsed = (datetime.now() - context.last_ai_enhancement).total_seconds()
             if elapsed < self.ai_enhancement_cooldown:
                 return False
         
@@ -142,6 +175,7 @@ class PacingAgent(BaseAgent):
     
     async def _enhance_with_ai_async(
         self, 
+        context: PacingContext,
         base_result: Dict, 
         counts: Dict[str, int],
         recent_reactions: List
@@ -151,15 +185,17 @@ class PacingAgent(BaseAgent):
         Provides nuanced insights that rules can't capture
         """
         try:
-            self.last_ai_enhancement = datetime.now()
+            context.last_ai_enhancement = datetime.now()
             
             # Check cache first
             cache_key = self._get_ai_cache_key(counts)
-            if cache_key in self.ai_cache:
-                cached_time, cached_result = self.ai_cache[cache_key]
+            if cache_key in context.ai_cache:
+                cached_time, cached_result = context.ai_cache[cache_key]
                 if (datetime.now() - cached_time).total_seconds() < 30:
+                    CACHE_LOOKUPS.labels("pacing_ai", "hit").inc()
                     print("🎯 Using cached AI insight")
                     return cached_result
+            CACHE_LOOKUPS.labels("pacing_ai", "miss").inc()
             
             # Call Gemini for nuanced analysis
             ai_result = await gemini_service.analyze_pacing(
@@ -180,16 +216,16 @@ class PacingAgent(BaseAgent):
                 }
                 
                 # Update cache
-                self.ai_cache[cache_key] = (datetime.now(), ai_result)
+                context.ai_cache[cache_key] = (datetime.now(), ai_result)
                 
                 # Clear old cache entries
-                if len(self.ai_cache) > 20:
+                if len(context.ai_cache) > 20:
                     oldest_keys = sorted(
-                        self.ai_cache.keys(),
-                        key=lambda k: self.ai_cache[k][0]
+                        context.ai_cache.keys(),
+                        key=lambda k: context.ai_cache[k][0]
                     )[:10]
                     for k in oldest_keys:
-                        del self.ai_cache[k]
+                        del context.ai_cache[k]
                 
                 print("✅ AI enhancement completed")
             
@@ -476,7 +512,7 @@ class PacingAgent(BaseAgent):
         
         return scores
     
-    def _calculate_reaction_velocity(self, reactions: List[Dict]) -> Dict[str, Any]:
+    def _calculate_reaction_velocity(self, context: PacingContext, reactions: List[Dict]) -> Dict[str, Any]:
         """
         Calculate reaction velocity (reactions per second)
         Indicates engagement intensity
@@ -515,15 +551,14 @@ class PacingAgent(BaseAgent):
             else:
                 intensity = "low"
             
-            # Track velocity history for trend
-            self.reaction_velocity.append(rate)
-            if len(self.reaction_velocity) > 10:
-                self.reaction_velocity = self.reaction_velocity[-10:]
+            # Track velocity history for trend (ring buffer)
+            context.reaction_velocity.append(rate)
+            history = list(context.reaction_velocity)
             
             # Determine trend
-            if len(self.reaction_velocity) >= 3:
-                recent_avg = sum(self.reaction_velocity[-3:]) / 3
-                older_avg = sum(self.reaction_velocity[:-3]) / max(1, len(self.reaction_velocity) - 3)
+            if len(history) >= 3:
+                recent_avg = sum(history[-3:]) / 3
+                older_avg = sum(history[:-3]) / max(1, len(history) - 3)
                 
                 if recent_avg > older_avg * 1.3:
                     trend = "accelerating"
@@ -562,14 +597,14 @@ class PacingAgent(BaseAgent):
         else:
             return "➡️ Low/steady engagement"
     
-    def _calculate_engagement_trend(self) -> Dict[str, Any]:
+    def _calculate_engagement_trend(self, context: PacingContext) -> Dict[str, Any]:
         """
         Analyze trend from historical engagement scores
         """
-        if len(self.engagement_history) < 3:
+        if len(context.engagement_history) < 3:
             return {"direction": "unknown", "confidence": 0, "trend": "insufficient_data"}
         
-        recent = self.engagement_history[-5:]
+        recent = list(context.engagement_history)[-5:]
         
         # Linear regression (simple)
         n = len(recent)
@@ -599,14 +634,13 @@ class PacingAgent(BaseAgent):
             "data_points": n
         }
     
-    def _update_history(self, score: int):
-        """Update engagement score history"""
-        self.engagement_history.append(score)
-        if len(self.engagement_history) > 10:
-            self.engagement_history = self.engagement_history[-10:]
+    def _update_history(self, context: PacingContext, score: int):
+        """Update engagement score history (bounded by the deque)"""
+        context.engagement_history.append(score)
     
     def _generate_smart_alerts(
         self, 
+        context: PacingContext,
         counts: Dict[str, int], 
         thresholds: Dict[str, int],
         velocity: Dict[str, Any]
@@ -624,9 +658,9 @@ class PacingAgent(BaseAgent):
         
         # Check cooldowns
         def can_alert(alert_type: str) -> bool:
-            if alert_type not in self.last_alert_time:
+            if alert_type not in context.last_alert_time:
                 return True
-            elapsed = (now - self.last_alert_time[alert_type]).total_seconds()
+            elapsed = (now - context.last_alert_time[alert_type]).total_seconds()
             return elapsed > self.alert_cooldown
         
         # Critical alerts (always show)
@@ -639,7 +673,7 @@ class PacingAgent(BaseAgent):
                 "action": "STOP and clarify immediately",
                 "priority": 1
             })
-            self.last_alert_time["im_lost"] = now
+            context.last_alert_time["im_lost"] = now
         
         # Warning alerts (with cooldown)
         if slow_down >= thresholds["slow_down_critical"] and can_alert("slow_down"):
@@ -651,7 +685,7 @@ class PacingAgent(BaseAgent):
                 "action": "Reduce speaking speed by 25%",
                 "priority": 2
             })
-            self.last_alert_time["slow_down"] = now
+            context.last_alert_time["slow_down"] = now
         
         # Info alerts (with cooldown)
         if show_code >= thresholds["show_code_demand"] and can_alert("show_code"):
@@ -663,7 +697,7 @@ class PacingAgent(BaseAgent):
                 "action": "Perfect time for live coding",
                 "priority": 3
             })
-            self.last_alert_time["show_code"] = now
+            context.last_alert_time["show_code"] = now
         
         if speed_up >= thresholds["speed_up_threshold"] and can_alert("speed_up"):
             alerts.append({
@@ -674,7 +708,7 @@ class PacingAgent(BaseAgent):
                 "action": "Audience ready for faster pace",
                 "priority": 4
             })
-            self.last_alert_time["speed_up"] = now
+            context.last_alert_time["speed_up"] = now
         
         # Velocity-based alert
         if velocity["intensity"] == "high" and velocity["trend"] == "accelerating":
@@ -687,13 +721,13 @@ class PacingAgent(BaseAgent):
                     "action": "Great time for Q&A or interaction",
                     "priority": 5
                 })
-                self.last_alert_time["velocity_high"] = now
+                context.last_alert_time["velocity_high"] = now
         
         # Sort by priority
         alerts.sort(key=lambda x: x["priority"])
         
         return alerts
     
-    async def get_pacing_trend(self) -> Dict[str, Any]:
+    async def get_pacing_trend(self, context: PacingContext) -> Dict[str, Any]:
         """Get detailed pacing trend analysis"""
-        return self._calculate_engagement_trend()
\ No newline at end of file
+        return self._calculate_engagement_trend(context)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, AgentContext
 from typing import Dict, Any, List, Set
 import sys
 import os
@@ -7,6 +7,19 @@ from services.gemini_service import gemini_service
 import re
 from collections import defaultdict
 
+class QAGrouperContext(AgentContext):
+    """Per-room Q&A grouping state: analysis history and text similarity cache"""
+    
+    similarity_cache_size = 1000
+    
+    def __init__(self):
+        super().__init__()
+        self.similarity_cache: Dict[str, float] = {}
+    
+    def clear(self):
+        super().clear()
+        self.similarity_cache.clear()
+
 class QAGrouperAgent(BaseAgent):
     """
     ULTRA-OPTIMIZED Q&A Grouper Agent
@@ -107,11 +120,8 @@ class QAGrouperAgent(BaseAgent):
                 'priority_boost': 0.1
             }
         }
-        
-        # Cache for similarity calculations
-        self._similarity_cache = {}
     
-    async def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze(self, data: Dict[str, Any], context: QAGrouperContext) -> Dict[str, Any]:
         """
         Hybrid clustering approach:
         - Fast local clustering for <5 questions
@@ -138,7 +148,7 @@ class QAGrouperAgent(BaseAgent):
             result = await self._smart_gemini_clustering(filtered_questions)
         
         # STEP 3: Enrich themes with metadata
-        result = self._enrich_and_score_themes(result, filtered_questions)
+        result = self._enrich_and_score_themes(context, result, filtered_questions)
         
         # STEP 4: Generate insights
         for theme in result.get("themes", []):
@@ -152,7 +162,7 @@ class QAGrouperAgent(BaseAgent):
             "filtered_out": len(questions) - len(filtered_questions)
         })
         
-        self._store_analysis(result)
+        self._store_analysis(context, result)
         return result
     
     def _advanced_filter(self, questions: List[Dict]) -> List[Dict]:
@@ -447,7 +457,7 @@ Respond with ONLY valid JSON (no markdown, no explanations):
         }
         return mapping.get(topic, 'other')
     
-    def _enrich_and_score_themes(self, result: Dict, all_questions: List[Dict]) -> Dict:
+    def _enrich_and_score_themes(self, context: QAGrouperContext, result: Dict, all_questions: List[Dict]) -> Dict:
         """
         Enrich themes with full question data and recalculate scores
         """
@@ -461,14 +471,14 @@ Respond with ONLY valid JSON (no markdown, no explanations):
             matched_questions = []
             for example in examples:
                 for q in all_questions:
-                    if self._text_similarity(example, q.get("text", "")) > 0.7:
+                    if self._text_similarity(context, example, q.get("text", "")) > 0.7:
                         matched_questions.append(q)
                         break
             
             # If no matches found (Gemini used different text), find best matches
             if not matched_questions:
                 for q in all_questions:
-                    if any(self._text_similarity(ex, q.get("text", "")) > 0.5 for ex in examples):
+                    if any(self._text_similarity(context, ex, q.get("text", "")) > 0.5 for ex in examples):
                         matched_questions.append(q)
             
             # Recalculate metrics
@@ -485,15 +495,15 @@ Respond with ONLY valid JSON (no markdown, no explanations):
         result["themes"] = enriched_themes
         return result
     
-    def _text_similarity(self, text1: str, text2: str) -> float:
+    def _text_similarity(self, context: QAGrouperContext, text1: str, text2: str) -> float:
         """
         Fast text similarity calculation
         Uses Jaccard similarity on word sets
         """
         # Check cache
         cache_key = f"{hash(text1)}:{hash(text2)}"
-        if cache_key in self._similarity_cache:
-            return self._similarity_cache[cache_key]
+        if cache_key in context.similarity_cache:
+            return context.similarity_cache[cache_key]
         
         t1 = text1.lower().strip()
         t2 = text2.lower().strip()
@@ -519,11 +529,11 @@ Respond with ONLY valid JSON (no markdown, no explanations):
         similarity = intersection / union if union > 0 else 0.0
         
         # Cache result
-        self._similarity_cache[cache_key] = similarity
+        context.similarity_cache[cache_key] = similarity
         
         # Clear cache if too large
-        if len(self._similarity_cache) > 1000:
-            self._similarity_cache.clear()
+        if len(context.similarity_cache) > context.similarity_cache_size:
+            context.similarity_cache.clear()
         
         return similarity
     
@@ -704,12 +714,12 @@ Respond with ONLY valid JSON (no markdown, no explanations):
             "quality_score": 0
         }
     
-    async def get_top_questions(self, limit: int = 5) -> List[Dict[str, Any]]:
+    async def get_top_questions(self, context: QAGrouperContext, limit: int = 5) -> List[Dict[str, Any]]:
         """Get top priority questions across all themes"""
-        if not self.last_analysis:
+        if not context.last_analysis:
             return []
         
-        result = self.last_analysis.get("result", {})
+        result = context.last_analysis.get("result", {})
         themes = result.get("themes", [])
         
         top_questions = []
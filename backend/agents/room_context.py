@@ -0,0 +1,51 @@
+from typing import Any, Dict
+
+from services.memory import deep_sizeof
+
+from .pacing_agent import PacingContext
+from .qa_grouper_agent import QAGrouperContext
+from .sentiment_agent import SentimentContext
+
+
+class RoomAgentContext:
+    """
+    All agent state for one room, owned by its RoomManager
+    - The agents are shared, stateless engines; every call gets the room's context,
+      so one room's cooldowns, caches and trends never leak into another's
+    - Histories are fixed-size ring buffers, caches are bounded
+    """
+
+    def __init__(self):
+        self.pacing = PacingContext()
+        self.qa_grouper = QAGrouperContext()
+        self.sentiment = SentimentContext()
+
+    def _contexts(self) -> Dict[str, Any]:
+        return {"pacing": self.pacing, "qa_grouper": self.qa_grouper, "sentiment": self.sentiment}
+
+    def clear(self):
+        """Free histories and caches (room deleted)"""
+        for context in self._contexts().values():
+            context.clear()
+
+    def trim(self):
+        """Drop what can be rebuilt (caches, analysis histories); trend rings are kept"""
+        for context in self._contexts().values():
+            context.analysis_history.clear()
+        self.pacing.ai_cache.clear()
+        self.qa_grouper.similarity_cache.clear()
+        self.sentiment.gemini_cache.clear()
+
+    def export(self) -> Dict[str, Any]:
+        return {name: context.export() for name, context in self._contexts().items()}
+
+    def load(self, state: Dict[str, Any]):
+        for name, context in self._contexts().items():
+            if state.get(name):
+                context.load(state[name])
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Approximate bytes held per agent context"""
+        footprint = {name: deep_sizeof(context) for name, context in self._contexts().items()}
+        footprint["total"] = sum(footprint.values())
+        return footprint
@@ -1,20 +1,52 @@
-from .base_agent import BaseAgent
-from typing import Dict, Any, List, Tuple
+from .base_agent import BaseAgent, AgentContext
+from typing import Dict, Any, List, Tuple, Deque, Optional
+from collections import deque
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from services.gemini_service import gemini_service
+from services.metrics import CACHE_LOOKUPS
 import asyncio
 from datetime import datetime
 import re
 
+class SentimentContext(AgentContext):
+    """Per-room sentiment state: sentiment ring buffer, Gemini cooldown and cache"""
+    
+    max_history = 30
+    
+    def __init__(self):
+        super().__init__()
+        self.sentiment_history: Deque[Dict[str, Any]] = deque(maxlen=self.max_history)
+        self.last_gemini_call: Optional[datetime] = None
+        self.gemini_cache: Dict[int, Dict] = {}
+    
+    def clear(self):
+        super().clear()
+        self.sentiment_history.clear()
+        self.last_gemini_call = None
+        self.gemini_cache.clear()
+    
+    def export(self) -> Dict[str, Any]:
+        return {
+            "sentiment_history": [
+                {**entry, "timestamp": entry["timestamp"].isoformat()} for entry in self.sentiment_history
+            ],
+            "last_gemini_call": self.last_gemini_call.isoformat() if self.last_gemini_call else None
+        }
+    
+    def load(self, state: Dict[str, Any]):
+        self.sentiment_history.extend(
+            {**entry, "timestamp": datetime.fromisoformat(entry["timestamp"])}
+            for entry in state.get("sentiment_history", [])
+        )
+        if state.get("last_gemini_call"):
+            self.last_gemini_call = datetime.fromisoformat(state["last_gemini_call"])
+
 class SentimentAgent(BaseAgent):
     def __init__(self):
         super().__init__("Sentiment Agent")
         
-        self.sentiment_history = []
-        self.max_history = 30
-        
         self.emotion_patterns = {
             'excited': {
                 'keywords': ['amazing', 'awesome', 'love', 'great', 'excellent', 'perfect', 
@@ -68,11 +100,9 @@ class SentimentAgent(BaseAgent):
             'low': ['interesting', 'curious', 'later', 'eventually']
         }
         
-        self.last_gemini_call = None
         self.gemini_cooldown = 10
-        self.gemini_cache = {}
     
-    async def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze(self, data: Dict[str, Any], context: SentimentContext) -> Dict[str, Any]:
         questions = data.get("questions", [])
         reaction_counts = data.get("reaction_counts", {})
         recent_reactions = data.get("recent_reactions", [])
@@ -90,19 +120,19 @@ class SentimentAgent(BaseAgent):
         
         should_use_gemini = (
             len(questions) >= 3 and 
-            self._should_call_gemini() and
+            self._should_call_gemini(context) and
             combined.get('confidence', 0) < 80
         )
         
         if should_use_gemini:
             try:
-                gemini_enhancement = await self._smart_gemini_enhancement(questions[-5:], combined)
+                gemini_enhancement = await self._smart_gemini_enhancement(context, questions[-5:], combined)
                 if gemini_enhancement:
                     combined = self._merge_gemini_insights(combined, gemini_enhancement)
             except Exception as e:
                 print(f"⚠️ Gemini enhancement failed: {e}")
         
-        trend = self._calculate_sentiment_trend()
+        trend = self._calculate_sentiment_trend(context)
         combined["trend"] = trend
         
         combined["recommendations"] = self._generate_smart_recommendations(
@@ -117,8 +147,8 @@ class SentimentAgent(BaseAgent):
             "analysis_timestamp": datetime.now().isoformat()
         })
         
-        self._update_history(combined)
-        self._store_analysis(combined)
+        self._update_history(context, combined)
+        self._store_analysis(context, combined)
         
         return combined
     
@@ -351,19 +381,21 @@ class SentimentAgent(BaseAgent):
         else:
             return "😐 Neutral"
     
-    def _should_call_gemini(self) -> bool:
-        if not self.last_gemini_call:
+    def _should_call_gemini(self, context: SentimentContext) -> bool:
+        if not context.last_gemini_call:
             return True
         
-        elapsed = (datetime.now() - self.last_gemini_call).total_seconds()
+        elapsed = (datetime.now() - context.last_gemini_call).total_seconds()
         return elapsed > self.gemini_cooldown
     
-    async def _smart_gemini_enhancement(self, recent_messages: List[Dict], local_analysis: Dict) -> Dict[str, Any]:
+    async def _smart_gemini_enhancement(self, context: SentimentContext, recent_messages: List[Dict], local_analysis: Dict) -> Dict[str, Any]:
         message_texts = tuple(q.get("text", "") for q in recent_messages)
         cache_key = hash(message_texts)
         
-        if cache_key in self.gemini_cache:
-            return self.gemini_cache[cache_key]
+        if cache_key in context.gemini_cache:
+            CACHE_LOOKUPS.labels("sentiment_ai", "hit").inc()
+            return context.gemini_cache[cache_key]
+        CACHE_LOOKUPS.labels("sentiment_ai", "miss").inc()
         
         combined_text = " | ".join([q.get("text", "") for q in recent_messages])
         local_emotion = local_analysis.get("dominant_emotion", "neutral")
@@ -391,7 +423,7 @@ Respond ONLY with valid JSON:
 }}"""
         
         try:
-            self.last_gemini_call = datetime.now()
+            context.last_gemini_call = datetime.now()
             
             response = await gemini_service.generate_text(
                 prompt,
@@ -403,12 +435,12 @@ Respond ONLY with valid JSON:
             parsed = gemini_service._extract_json_from_response(response)
             
             if parsed and 'emotion' in parsed:
-                self.gemini_cache[cache_key] = parsed
+                context.gemini_cache[cache_key] = parsed
                 
-                if len(self.gemini_cache) > 50:
-                    keys = list(self.gemini_cache.keys())
+                if len(context.gemini_cache) > 50:
+                    keys = list(context.gemini_cache.keys())
                     for old_key in keys[:-25]:
-                        del self.gemini_cache[old_key]
+                        del context.gemini_cache[old_key]
                 
                 return parsed
             
@@ -446,20 +478,17 @@ Respond ONLY with valid JSON:
                 }
             }
     
-    def _update_history(self, analysis: Dict):
-        self.sentiment_history.append({
+    def _update_history(self, context: SentimentContext, analysis: Dict):
+        context.sentiment_history.append({
             "timestamp": datetime.now(),
             "sentiment": analysis.get("overall_sentiment", "neutral"),
             "emotion": analysis.get("dominant_emotion", "neutral"),
             "confidence": analysis.get("confidence", 0),
             "urgency": analysis.get("urgency_level", "low")
         })
-        
-        if len(self.sentiment_history) > self.max_history:
-            self.sentiment_history = self.sentiment_history[-self.max_history:]
     
-    def _calculate_sentiment_trend(self) -> Dict[str, Any]:
-        if len(self.sentiment_history) < 3:
+    def _calculate_sentiment_trend(self, context: SentimentContext) -> Dict[str, Any]:
+        if len(context.sentiment_history) < 3:
             return {
                 "trend": "insufficient_data",
                 "direction": "➡️ Unknown",
@@ -467,7 +496,7 @@ Respond ONLY with valid JSON:
             }
         
         sentiment_map = {"positive": 1, "neutral": 0, "negative": -1}
-        recent = self.sentiment_history[-10:]
+        recent = list(context.sentiment_history)[-10:]
         scores = [sentiment_map.get(s["sentiment"], 0) for s in recent]
         
         first_half = scores[:len(scores)//2]
@@ -1,14 +1,40 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from typing import List, Dict, Set, Optional, Tuple, Deque
 from datetime import datetime, timedelta
+from collections import deque
 import json
 import asyncio
+import hashlib
+import itertools
+import time
 import os
+import uuid
 
 from agents.pacing_agent import PacingAgent
 from agents.qa_grouper_agent import QAGrouperAgent
 from agents.sentiment_agent import SentimentAgent
+from agents.room_context import RoomAgentContext
+from services.question_ranking import QuestionRanking
+from services.wire_protocol import negotiate_codec, json_codec
+from services.backplane import Backplane, create_backplane
+from services.snapshots import SnapshotStore, FrozenRoom
+from services.event_archive import EventArchive, SessionArchive
+from services.rate_limit import RateLimiter, ConnectionLimits
+from services.analysis_scheduler import AnalysisScheduler
+from services.analysis_pool import AnalysisPool, URGENCY_PERIODIC, URGENCY_URGENT
+from services.timer_wheel import TimerWheel
+from services.idle_index import IdleIndex
+from services.records import ReactionLog, Question, Poll, epoch_time, stored_user_id
+from services.memory import MemoryBudget, deep_sizeof, tracemalloc_diff
+from services.handler_timing import HandlerTimings, HANDLER, BROADCAST
+from services.metrics import registry, CACHE_LOOKUPS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.loop_lag import LoopLagMonitor
+from services.task_context import tag_task, inherit_task_tags
+from services.profiler import SamplingProfiler, collapsed_text
+from services.internal_auth import INTERNAL_TOKEN_HEADER, internal_token, is_internal_caller
+from services.sharding import valid_room_code
+from services.gemini_service import gemini_service
 
 app = FastAPI(
     title="Real-Time Feedback API with AI Agents",
@@ -29,34 +55,323 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stateless engines shared by every room; per-room state lives in RoomManager.agent_context
 pacing_agent = PacingAgent()
 qa_grouper_agent = QAGrouperAgent()
 sentiment_agent = SentimentAgent()
 
+# Every room's analyses run here: at most AI_WORKERS at once, periodic work paused while Gemini is saturated
+analysis_pool = AnalysisPool(
+    workers=int(os.getenv("AI_WORKERS", "4")),
+    max_queue=int(os.getenv("AI_QUEUE_SIZE", "100")),
+    saturated=lambda: bool(gemini_service and gemini_service.is_saturated())
+)
+
+# Poll expiry, analysis ticks, heartbeats and idle cleanup share one timing wheel
+timer_wheel = TimerWheel()
+
+# Per-message-type handler and broadcast timing (off unless HANDLER_TIMING_SAMPLE_RATE > 0)
+handler_timings = HandlerTimings.from_env()
+
+# Loop lag histogram plus a watchdog thread recording what blocked the loop (LOOP_BLOCK_THRESHOLD)
+loop_lag_monitor = LoopLagMonitor.from_env()
+
+# Time-boxed stack sampling of the loop thread (POST /admin/profile); idle unless asked
+sampling_profiler = SamplingProfiler()
+
+# Prometheus metrics (GET /metrics): moved where each event happens, never recomputed by a scrape
+EVENTS = registry.counter("feedback_events_total", "Audience and presenter events accepted from this worker's sockets", ("type",))
+CONNECTIONS = registry.gauge("feedback_connections", "Open WebSocket connections on this worker", ("role",))
+OUTBOUND_QUEUED = registry.gauge("feedback_outbound_queued_frames", "Frames waiting in connection send queues")
+OUTBOUND_FRAMES = registry.counter("feedback_outbound_frames_total", "Outbound frames by outcome (sent/conflated/dropped)", ("outcome",))
+BROADCAST_SECONDS = registry.histogram("feedback_broadcast_seconds", "Local fan-out time per broadcast: role variants, encoding, enqueueing", ("type",))
+BROADCAST_BYTES = registry.counter("feedback_broadcast_bytes_total", "Bytes queued by broadcasts, summed over recipients")
+AI_ANALYSES = registry.counter("feedback_ai_analyses_total", "Room analysis passes by outcome (ok/stale/timeout/error)", ("outcome",))
+AI_ANALYSIS_SECONDS = registry.histogram("feedback_ai_analysis_seconds", "Duration of a room analysis pass")
+AGENT_RUNS = registry.counter("feedback_agent_runs_total", "Agent analyses by agent and outcome", ("agent", "outcome"))
+AGENT_SECONDS = registry.histogram("feedback_agent_seconds", "Duration of one agent analysis", ("agent",))
+
+_queued_frames = OUTBOUND_QUEUED.labels()
+_frames_sent = OUTBOUND_FRAMES.labels("sent")
+_frames_conflated = OUTBOUND_FRAMES.labels("conflated")
+_frames_dropped = OUTBOUND_FRAMES.labels("dropped")
+_view_cache_hits = CACHE_LOOKUPS.labels("view", "hit")
+_view_cache_misses = CACHE_LOOKUPS.labels("view", "miss")
+
+# How often each room checks its sockets, and how long one send may block before the peer counts as dead
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "15"))
+SEND_STALL_TIMEOUT = float(os.getenv("SEND_STALL_TIMEOUT", "60"))
+
+CONNECTION_ROLES = ("presenter", "audience", "observer")
+
+# Client message types with a handler; anything else is timed as "unknown"
+CLIENT_MESSAGE_TYPES = {
+    "reaction", "question", "upvote_question", "create_poll", "vote_poll",
+    "get_stats", "subscribe", "unsubscribe", "request_ai_analysis", "ping"
+}
+
+# Message types routed to a subset of roles (plus explicit subscribers); others go to everyone
+MESSAGE_CHANNELS = {
+    "ai_insights": ("presenter", "observer"),
+    "top_questions": ("presenter", "observer"),
+}
+
+# Heavy fields a role never renders, stripped before fan-out
+ROLE_STRIPPED_FIELDS = {
+    "audience": {
+        "reaction_counts": ("heatmap_data",),
+    },
+}
+
+# Latest-state frames: a client that falls behind only needs the newest one.
+# Everything else (individual reactions, questions, polls, votes, replies) is delivered
+# in order or not at all.
+CONFLATED_MESSAGE_TYPES = {"reaction_counts", "stats", "ai_insights", "top_questions", "rate_limited"}
+
+async def timed_agent(room_code: str, agent: str, analysis) -> Dict:
+    """Await one agent's analyze() and record its duration and outcome"""
+    tag_task(room_code=room_code, agent=agent)
+    started = time.perf_counter()
+    try:
+        result = await analysis
+    except Exception:
+        AGENT_RUNS.labels(agent, "error").inc()
+        raise
+    finally:
+        AGENT_SECONDS.labels(agent).observe(time.perf_counter() - started)
+    AGENT_RUNS.labels(agent, "ok").inc()
+    return result
+
+class ClientConnection:
+    """
+    Per-socket state kept next to the raw WebSocket
+    - Outbound frames go through a bounded queue drained by the connection's own writer task,
+      so a stalled socket never blocks a broadcast
+    - Conflated types keep one slot each (latest frame wins, original position kept)
+    - A client with more than `max_queue` frames pending is disconnected (1013) to resync
+    - A send blocked for longer than the stall timeout marks a dead peer (see RoomManager heartbeat)
+    """
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, websocket: WebSocket, codec=json_codec, role: str = "audience", max_queue: int = 256):
+        self.id = next(ClientConnection._ids)
+        self.websocket = websocket
+        self.codec = codec
+        self.role = role
+        self.connected_at = datetime.now()
+        
+        self.max_queue = max_queue
+        self._queue: Deque[Tuple[Optional[str], object]] = deque()  # (message_type, frame or None = conflated slot)
+        self._latest: Dict[str, object] = {}
+        self._wakeup = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._on_send_error = None
+        self._send_started: Optional[float] = None
+        self.closed = False
+        self.last_frame_bytes = 0
+        self.outbound = {"sent": 0, "conflated": 0, "dropped": 0, "max_depth": 0}
+        self.limits = ConnectionLimits()
+    
+    def start_writer(self, on_send_error=None):
+        self._on_send_error = on_send_error
+        if not self._writer_task:
+            self._writer_task = asyncio.create_task(self._write_loop())
+    
+    def stop_writer(self):
+        self.closed = True
+        if self._writer_task:
+            self._writer_task.cancel()
+        self.outbound["dropped"] += len(self._queue)
+        _frames_dropped.inc(len(self._queue))
+        _queued_frames.dec(len(self._queue))
+        self._queue.clear()
+        self._latest.clear()
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+    
+    def queued_frames(self) -> List:
+        """Encoded frames waiting to be sent (broadcast frames are shared with other connections)"""
+        return [frame for _, frame in self._queue if frame is not None] + list(self._latest.values())
+    
+    def queued_bytes(self) -> int:
+        return sum(len(frame) for frame in self.queued_frames())
+    
+    async def send_message(self, message: dict):
+        self.enqueue(self.codec.encode(message), message.get("type"))
+    
+    async def send_frame(self, frame, message_type: Optional[str] = None):
+        """Queue an already-encoded frame (str for JSON, bytes for binary codecs)"""
+        self.enqueue(frame, message_type)
+    
+    def enqueue(self, frame, message_type: Optional[str] = None) -> bool:
+        if self.closed:
+            self.outbound["dropped"] += 1
+            _frames_dropped.inc()
+            return False
+        
+        if message_type in CONFLATED_MESSAGE_TYPES:
+            if message_type in self._latest:
+                self._latest[message_type] = frame
+                self.outbound["conflated"] += 1
+                _frames_conflated.inc()
+                return True
+            self._latest[message_type] = frame
+            self._queue.append((message_type, None))
+        else:
+            self._queue.append((message_type, frame))
+        _queued_frames.inc()
+        
+        depth = len(self._queue)
+        if depth > self.outbound["max_depth"]:
+            self.outbound["max_depth"] = depth
+        if depth > self.max_queue:
+            print(f"🐢 Client {self.id} is {depth} frames behind, disconnecting")
+            self._fail(close_code=1013)
+            return False
+        
+        self._wakeup.set()
+        return True
+    
+    async def _write_loop(self):
+        tag_task(activity="send", message_type=None)  # Room code comes from the socket's handler task
+        try:
+            while True:
+                while not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                
+                message_type, frame = self._queue.popleft()
+                _queued_frames.dec()
+                if frame is None:
+                    frame = self._latest.pop(message_type)
+                
+                self._send_started = time.monotonic()
+                if self.codec.binary:
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                self._send_started = None
+                self.outbound["sent"] += 1
+                _frames_sent.inc()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error sending to client {self.id}: {e}")
+            self._fail()
+    
+    def stalled_for(self, now: float) -> float:
+        """Seconds the current send has been blocked (0 when idle or sending freely)"""
+        return now - self._send_started if self._send_started is not None else 0.0
+    
+    def _fail(self, close_code: Optional[int] = None):
+        if self.closed:
+            return
+        self.stop_writer()
+        if close_code:
+            asyncio.create_task(self._close_quietly(close_code))
+        if self._on_send_error:
+            self._on_send_error(self)
+    
+    async def _close_quietly(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+    
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "role": self.role,
+            "codec": self.codec.name,
+            "connected_at": self.connected_at.isoformat(),
+            "queue_depth": self.queue_depth,
+            **self.outbound,
+            "rate_limited": self.limits.rejected
+        }
+    
+    async def receive_message(self) -> dict:
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        raw = message.get("bytes") if message.get("bytes") is not None else message.get("text")
+        self.last_frame_bytes = len(raw) if raw else 0
+        return self.codec.decode(raw)
+
 class RoomManager:
-    def __init__(self, room_code: str):
+    # Sections of the stats view that can be pushed independently to subscribers
+    STATS_SECTIONS = (
+        "counts",
+        "heatmap_data",
+        "questions",
+        "top_questions",
+        "active_poll",
+        "active_connections",
+        "ai_insights"
+    )
+    
+    def __init__(self, room_code: str, manager: "GlobalConnectionManager" = None):
         self.room_code = room_code
-        self.active_connections: List[WebSocket] = []
-        self.reactions_buffer: List[Dict] = []
-        self.questions: List[Dict] = []
-        self.active_poll: Dict = None
+        self.manager = manager
+        self.channel = f"room:{room_code}"
+        self.rate_limiter = RateLimiter.from_env()
+        self.restored_from_snapshot = False
+        self.remote_connections: Dict[str, int] = {}  # worker_id -> sockets on that worker
+        self.active_connections: List[ClientConnection] = []
+        self.connections_by_role: Dict[str, List[ClientConnection]] = {role: [] for role in CONNECTION_ROLES}
+        self.subscribers: Set[ClientConnection] = set()
+        self.reactions = ReactionLog(room_code, capacity=300)
+        self.questions: List[Question] = []
+        self.questions_by_id: Dict[str, Question] = {}
+        self.question_ranking = QuestionRanking(top_k=5)
+        self._pushed_top_questions: List[Tuple[str, int]] = []  # (id, upvotes) as last pushed
+        self.active_poll: Optional[Poll] = None
         self.created_at = datetime.now()
+        self.archive_session = str(int(self.created_at.timestamp()))
+        self._archive: Optional[SessionArchive] = None
         
         self.last_pacing_analysis = None
         self.last_qa_analysis = None
         self.last_sentiment_analysis = None
         self.last_ai_run = None
-        self.ai_analysis_task = None
+        self.agent_context = RoomAgentContext()
+        self.analysis_scheduler = AnalysisScheduler(
+            self.run_ai_analysis,
+            pool=analysis_pool,
+            key=room_code,
+            last_run=lambda: self.last_ai_run.timestamp() if self.last_ai_run else 0.0
+        )
+        self._insights_input_version = -1
         self.ai_analysis_interval = 8
         
+        # Timer wheel handles: periodic ones run while this worker has sockets in the room
+        self._analysis_timer = None
+        self._heartbeat_timer = None
+        self._poll_timer = None
+        
         self.heatmap_buckets = self._initialize_heatmap_buckets()
         self.last_heatmap_update = datetime.now()
         
+        # Monotonic room version, bumped on every mutation
+        self.version = 0
+        self._dirty_sections: Set[str] = set()
+        self._push_handle = None
+        self.subscription_push_delay = 0.25  # Coalesce bursts into one delta
+        
+        # Lazily materialized, pre-encoded views: view -> (version, built_at, text, body, etag)
+        self._view_cache: Dict[str, Tuple] = {}
+        self.view_cache_max_age = 5.0  # Time-windowed counts still refresh when idle
+        self._memory_usage: Optional[Tuple[int, Dict[str, int]]] = None  # (version, breakdown)
+        
         self.metrics = {
             "total_reactions": 0,
             "total_questions": 0,
             "peak_connections": 0,
-            "ai_analyses_run": 0
+            "ai_analyses_run": 0,
+            "slow_client_disconnects": 0,
+            "memory_trims": 0
         }
     
     def _initialize_heatmap_buckets(self):
@@ -112,57 +427,376 @@ class RoomManager:
             for bucket in self.heatmap_buckets
         ]
     
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    async def connect(self, websocket: WebSocket, role: str = "audience") -> ClientConnection:
+        if role not in CONNECTION_ROLES:
+            role = "audience"
+        codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=codec.subprotocol)
+        connection = ClientConnection(websocket, codec, role)
+        connection.start_writer(self._on_send_error)
+        self.active_connections.append(connection)
+        self.connections_by_role[role].append(connection)
+        CONNECTIONS.labels(role).inc()
         
         if len(self.active_connections) > self.metrics["peak_connections"]:
             self.metrics["peak_connections"] = len(self.active_connections)
         
-        print(f"✓ Client connected to room {self.room_code}. Total: {len(self.active_connections)}")
+        print(f"✓ {role.capitalize()} connected to room {self.room_code}. Total: {len(self.active_connections)}")
+        self.mark_dirty("active_connections")
+        self._publish_membership()
         
-        if not self.ai_analysis_task or self.ai_analysis_task.done():
-            self.ai_analysis_task = asyncio.create_task(self._periodic_ai_analysis())
+        if self._analysis_timer is None:
+            self._analysis_timer = timer_wheel.schedule_repeating(self.ai_analysis_interval, self._on_analysis_tick)
+            self._heartbeat_timer = timer_wheel.schedule_repeating(HEARTBEAT_INTERVAL, self._check_heartbeats)
+        
+        return connection
     
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+    def disconnect(self, connection: ClientConnection):
+        self._drop_connection(connection)
         print(f"✗ Client disconnected from {self.room_code}. Remaining: {len(self.active_connections)}")
+        self.mark_dirty("active_connections")
+        self._publish_membership()
         
-        if len(self.active_connections) == 0 and self.ai_analysis_task:
-            self.ai_analysis_task.cancel()
+        if len(self.active_connections) == 0:
+            self.stop_timers()
+            if self.manager:
+                self.manager.schedule_hibernation(self.room_code)
     
-    async def broadcast(self, message: dict, exclude: WebSocket = None):
-        disconnected = []
-        for connection in self.active_connections:
-            if connection == exclude:
-                continue
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Error broadcasting: {e}")
-                disconnected.append(connection)
+    def stop_timers(self):
+        """Cancel the periodic timers and pending analysis (the room has no local sockets)"""
+        self.analysis_scheduler.cancel()
+        analysis_pool.forget(self.room_code)
+        for timer in (self._analysis_timer, self._heartbeat_timer):
+            if timer:
+                timer.cancel()
+        self._analysis_timer = None
+        self._heartbeat_timer = None
+    
+    def cancel_tasks(self):
+        """Cancel everything still scheduled for the room (it is being frozen or deleted)"""
+        self.stop_timers()
+        if self._poll_timer:
+            self._poll_timer.cancel()
+            self._poll_timer = None
+        if self._push_handle:
+            self._push_handle.cancel()
+            self._push_handle = None
+    
+    def freeze(self) -> FrozenRoom:
+        self.cancel_tasks()
+        return FrozenRoom.freeze(self.room_code, self.export_state())
+    
+    def resume_poll_timer(self):
+        """Re-arm the active poll's expiry after a thaw (fires at once if it ran out meanwhile)"""
+        poll = self.active_poll
+        if poll and poll.active and not self._poll_timer:
+            remaining = poll.started_at + poll.duration - time.time()
+            self._poll_timer = timer_wheel.schedule(max(0.0, remaining), self._expire_poll, poll.id)
+    
+    def _check_heartbeats(self):
+        """Drop sockets whose writer is stuck in one send, i.e. half-open peers"""
+        now = time.monotonic()
+        for connection in list(self.active_connections):
+            if connection.stalled_for(now) > SEND_STALL_TIMEOUT:
+                print(f"💔 Client {connection.id} in {self.room_code} stopped reading, disconnecting")
+                connection._fail(close_code=1011)
+    
+    def _on_send_error(self, connection: ClientConnection):
+        if connection.outbound["dropped"]:
+            self.metrics["slow_client_disconnects"] += 1
+        self._drop_connection(connection)
+    
+    def _drop_connection(self, connection: ClientConnection):
+        connection.stop_writer()
+        if connection in self.active_connections:
+            self.active_connections.remove(connection)
+            CONNECTIONS.labels(connection.role).dec()
+        role_connections = self.connections_by_role.get(connection.role, [])
+        if connection in role_connections:
+            role_connections.remove(connection)
+        self.subscribers.discard(connection)
+    
+    async def broadcast(self, message: dict, exclude: ClientConnection = None):
+        """Fan out locally and relay to the room's sockets on other workers"""
+        started = time.perf_counter()
+        queued_bytes = await self._fan_out(message, exclude)
+        elapsed = time.perf_counter() - started
         
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+        message_type = message.get("type")
+        BROADCAST_SECONDS.labels(message_type).observe(elapsed)
+        BROADCAST_BYTES.inc(queued_bytes)
+        if handler_timings.rate:
+            handler_timings.record(BROADCAST, self.room_code, message_type, queued_bytes,
+                                   elapsed if handler_timings.sample() else None)
+        self._publish("broadcast", message=message)
+    
+    async def _fan_out(self, message: dict, exclude: ClientConnection = None) -> int:
+        """
+        Role-aware fan-out to this worker's sockets (returns the bytes queued)
+        - Channelled message types only reach their roles plus explicit subscribers
+        - Each role gets its own (possibly slimmed) variant, encoded once per codec
+        """
+        message_type = message.get("type")
+        channel = MESSAGE_CHANNELS.get(message_type)
+        queued_bytes = 0
+        
+        for role in channel or CONNECTION_ROLES:
+            connections = [conn for conn in self.connections_by_role[role] if conn is not exclude]
+            if connections:
+                queued_bytes += await self._send_to(connections, self._message_for_role(message, role))
+        
+        if channel and self.subscribers:
+            extra = [conn for conn in self.subscribers if conn.role not in channel and conn is not exclude]
+            if extra:
+                queued_bytes += await self._send_to(extra, message)
+        return queued_bytes
+    
+    def _message_for_role(self, message: dict, role: str) -> dict:
+        stripped = ROLE_STRIPPED_FIELDS.get(role, {}).get(message.get("type"))
+        if not stripped:
+            return message
+        return {key: value for key, value in message.items() if key not in stripped}
+    
+    async def _send_to(self, connections: List[ClientConnection], message: dict) -> int:
+        # Encode once per codec, not once per socket; each writer task does the actual send
+        message_type = message.get("type")
+        frames = {}
+        queued_bytes = 0
+        for connection in connections:
+            codec = connection.codec
+            if codec.name not in frames:
+                frames[codec.name] = codec.encode(message)
+            connection.enqueue(frames[codec.name], message_type)
+            queued_bytes += len(frames[codec.name])
+        return queued_bytes
+    
+    def get_outbound_stats(self) -> Dict:
+        connections = self.active_connections
+        return {
+            "queued_frames": sum(conn.queue_depth for conn in connections),
+            "max_queue_depth": max((conn.queue_depth for conn in connections), default=0),
+            "conflated": sum(conn.outbound["conflated"] for conn in connections),
+            "dropped": sum(conn.outbound["dropped"] for conn in connections),
+            "slow_client_disconnects": self.metrics["slow_client_disconnects"]
+        }
+    
+    # === Backplane (multi-worker) ===
+    
+    @property
+    def worker_id(self) -> Optional[str]:
+        return self.manager.worker_id if self.manager else None
+    
+    def _publish(self, op: str, **data):
+        if self.manager:
+            self.manager.backplane.publish(self.channel, {"op": op, **data}, self.manager.worker_id)
+    
+    def _publish_membership(self):
+        self._publish("membership", worker=self.worker_id, count=len(self.active_connections))
+    
+    def total_connections(self) -> int:
+        return len(self.active_connections) + sum(self.remote_connections.values())
+    
+    def is_analysis_leader(self) -> bool:
+        """Only one worker (lowest id with sockets) runs the periodic analysis"""
+        me = self.worker_id or ""
+        return all(me <= worker for worker, count in self.remote_connections.items() if count > 0)
     
-    async def _periodic_ai_analysis(self):
-        while len(self.active_connections) > 0:
+    async def handle_backplane_event(self, event: Dict):
+        """Apply a mutation or relay published by another worker"""
+        op = event.get("op")
+        
+        if op == "broadcast":
+            await self._fan_out(event["message"])
+        elif op == "reaction":
+            reaction = event["reaction"]
+            timestamp = epoch_time(reaction["timestamp"])
+            self._apply_reaction(reaction["type"], timestamp, stored_user_id(reaction.get("user_id"), timestamp))
+        elif op == "question":
+            self._apply_question(Question.from_dict(event["question"]))
+        elif op == "upvote":
+            self._apply_upvote(event["question_id"], event["user_id"])
+        elif op == "poll":
+            self._apply_poll(Poll.from_dict(event["poll"]))
+        elif op == "vote":
+            self._apply_vote(event["poll_id"], event["user_id"], event["vote"])
+        elif op == "poll_close":
+            self._apply_poll_close(event["poll_id"])
+        elif op == "ai_insights":
+            self._apply_ai_insights(event["pacing"], event["qa"], event["sentiment"])
+        elif op == "membership":
+            if event["count"] > 0:
+                self.remote_connections[event["worker"]] = event["count"]
+            else:
+                self.remote_connections.pop(event["worker"], None)
+            self.mark_dirty("active_connections")
+        elif op == "sync_request":
+            if self.active_connections:
+                self._publish_membership()
+                if self.is_analysis_leader():
+                    self._publish("sync_state", state=self.export_state())
+        elif op == "sync_state":
+            self.load_state(event["state"])
+    
+    @property
+    def archive(self) -> Optional[SessionArchive]:
+        """This session's columnar event log (opened on first event)"""
+        if self._archive is None and self.manager and self.manager.event_archive:
+            self._archive = self.manager.event_archive.open_session(self.room_code, self.archive_session)
+        return self._archive
+    
+    def _archive_event(self, kind: str, text: Optional[str] = None):
+        """Called by the local entry points only: relayed events are archived by the worker that took them"""
+        archive = self.archive
+        if archive:
+            archive.append(kind, text)
+    
+    def export_state(self) -> Dict:
+        """JSON-safe copy of the replicated room state"""
+        return {
+            "room_code": self.room_code,
+            "created_at": self.created_at.isoformat(),
+            "version": self.version,
+            "questions": [question.to_dict() for question in self.questions],
+            "reactions_buffer": self.reactions.export(),
+            "active_poll": self.active_poll.to_dict() if self.active_poll else None,
+            "heatmap_buckets": [{**bucket, "time": bucket["time"].isoformat()} for bucket in self.heatmap_buckets],
+            "last_heatmap_update": self.last_heatmap_update.isoformat(),
+            "metrics": self.metrics,
+            "last_pacing_analysis": self.last_pacing_analysis,
+            "last_qa_analysis": self.last_qa_analysis,
+            "last_sentiment_analysis": self.last_sentiment_analysis,
+            "last_ai_run": self.last_ai_run.isoformat() if self.last_ai_run else None,
+            "agent_context": self.agent_context.export(),
+            "archive_session": self.archive_session
+        }
+    
+    def load_state(self, state: Dict):
+        """Adopt an exported state, keeping anything added locally in the meantime"""
+        remote_questions = [Question.from_dict(q) for q in state.get("questions", [])]
+        remote_ids = {q.id for q in remote_questions}
+        local_only = [q for q in self.questions if q.id not in remote_ids]
+        
+        self.questions = []
+        self.questions_by_id = {}
+        self.question_ranking = QuestionRanking(top_k=self.question_ranking.top_k)
+        for question in remote_questions + local_only:
+            self._index_question(question, replay_upvotes=True)
+        
+        self.reactions.load(state.get("reactions_buffer", []))
+        if state.get("active_poll"):
+            self.active_poll = Poll.from_dict(state["active_poll"])
+        self.created_at = min(self.created_at, datetime.fromisoformat(state["created_at"]))
+        if self._archive is None and str(state.get("archive_session") or "").isdigit():
+            self.archive_session = state["archive_session"]  # Keep appending to the same session
+        self.heatmap_buckets = [
+            {**bucket, "time": datetime.fromisoformat(bucket["time"])}
+            for bucket in state.get("heatmap_buckets", [])
+        ] or self.heatmap_buckets
+        if state.get("last_heatmap_update"):
+            self.last_heatmap_update = datetime.fromisoformat(state["last_heatmap_update"])
+        for key, value in state.get("metrics", {}).items():
+            self.metrics[key] = max(self.metrics.get(key, 0), value)
+        
+        self.last_pacing_analysis = state.get("last_pacing_analysis") or self.last_pacing_analysis
+        self.last_qa_analysis = state.get("last_qa_analysis") or self.last_qa_analysis
+        self.last_sentiment_analysis = state.get("last_sentiment_analysis") or self.last_sentiment_analysis
+        if state.get("last_ai_run"):
+            self.last_ai_run = datetime.fromisoformat(state["last_ai_run"])
+        if state.get("agent_context") and not self.agent_context.pacing.analysis_history:
+            self.agent_context.load(state["agent_context"])  # Only into a context that has not analysed yet
+        
+        self.version = max(self.version, state.get("version", 0))
+        self.mark_dirty(*self.STATS_SECTIONS)
+    
+    def subscribe(self, connection: ClientConnection):
+        self.subscribers.add(connection)
+    
+    def unsubscribe(self, connection: ClientConnection):
+        self.subscribers.discard(connection)
+    
+    def mark_dirty(self, *sections: str):
+        """Record a mutation: bump the room version and queue a delta push"""
+        self.version += 1
+        self._dirty_sections.update(sections)
+        self._view_cache.clear()
+        if self.manager:
+            self.manager.note_activity(self.room_code)
+        
+        if self._push_handle is None and self.subscribers:
             try:
-                await asyncio.sleep(self.ai_analysis_interval)
-                
-                if self._should_run_analysis():
-                    await self.run_ai_analysis()
-                else:
-                    print(f"⏭️ Skipping AI analysis for {self.room_code} (insufficient new data)")
-                
-            except asyncio.CancelledError:
-                print(f"🛑 AI analysis task cancelled for {self.room_code}")
-                break
-            except Exception as e:
-                print(f"Error in periodic AI analysis: {e}")
-                await asyncio.sleep(5)
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._push_handle = loop.call_later(
+                self.subscription_push_delay,
+                lambda: asyncio.create_task(self._push_subscription_delta())
+            )
+    
+    async def _push_subscription_delta(self):
+        self._push_handle = None
+        sections, self._dirty_sections = self._dirty_sections, set()
+        subscribers = list(self.subscribers)
+        if not sections or not subscribers:
+            return
+        
+        changes = {}
+        for section in sections:
+            changes.update(self._build_section(section))
+        
+        await self._send_to(subscribers, {
+            "type": "stats_delta",
+            "room_code": self.room_code,
+            "version": self.version,
+            "changes": changes
+        })
+    
+    def _build_section(self, section: str) -> Dict:
+        if section == "counts":
+            return {"counts": self.get_reaction_counts()}
+        if section == "heatmap_data":
+            return {"heatmap_data": self.get_heatmap_data()}
+        if section == "questions":
+            return {
+                "total_questions": len(self.questions),
+                "recent_questions": [question.to_dict() for question in self.questions[-10:]]
+            }
+        if section == "top_questions":
+            return {"top_questions": self.get_top_questions()}
+        if section == "active_poll":
+            return {"active_poll": self.active_poll.to_dict() if self.active_poll and self.active_poll.active else None}
+        if section == "active_connections":
+            return {"active_connections": self.total_connections()}
+        if section == "ai_insights":
+            return {
+                "ai_insights": {
+                    "pacing": self.last_pacing_analysis,
+                    "qa_grouping": self.last_qa_analysis,
+                    "sentiment": self.last_sentiment_analysis
+                }
+            }
+        return {}
+    
+    def build_stats_snapshot(self) -> Dict:
+        """Full stats view, as answered to get_stats and to new subscribers"""
+        snapshot = {
+            "type": "stats",
+            "room_code": self.room_code,
+            "version": self.version,
+            "recent_reactions": self.get_recent_reactions(60)
+        }
+        for section in self.STATS_SECTIONS:
+            snapshot.update(self._build_section(section))
+        return snapshot
+    
+    def _on_analysis_tick(self):
+        """Timer wheel callback, every ai_analysis_interval seconds while connected"""
+        if not self.is_analysis_leader():
+            return
+        
+        if self._should_run_analysis():
+            self.analysis_scheduler.request(URGENCY_PERIODIC)
+        else:
+            print(f"⏭️ Skipping AI analysis for {self.room_code} (insufficient new data)")
     
     def _should_run_analysis(self) -> bool:
         if not self.last_ai_run:
@@ -172,18 +806,23 @@ class RoomManager:
         if time_since_last < 5:
             return False
         
-        recent_reactions = self.get_recent_reactions(30)
-        recent_questions = [q for q in self.questions if 
-                          (datetime.now() - datetime.fromisoformat(q['timestamp'])).total_seconds() < 30]
+        now = time.time()
+        recent_reactions = sum(self.get_reaction_counts(30).values())
+        recent_questions = [q for q in self.questions if now - q.timestamp < 30]
         
         return (
-            len(recent_reactions) >= 2 or 
+            recent_reactions >= 2 or 
             len(recent_questions) >= 1 or 
             time_since_last > 30
         )
     
     async def run_ai_analysis(self):
+        """One analysis pass; call through analysis_scheduler.request() rather than directly"""
+        started = time.perf_counter()
+        outcome = "error"
         try:
+            tag_task(room_code=self.room_code, agent="analysis", message_type=None)
+            input_version = self.version
             self.last_ai_run = datetime.now()
             self.metrics["ai_analyses_run"] += 1
             
@@ -191,7 +830,7 @@ class RoomManager:
             
             reaction_counts = self.get_reaction_counts(60)
             recent_reactions = self.get_recent_reactions(60)
-            questions_data = self.questions[-20:]
+            questions_data = [question.to_dict() for question in self.questions[-20:]]
             
             tasks = []
             
@@ -200,11 +839,11 @@ class RoomManager:
                 "recent_reactions": recent_reactions,
                 "time_window": 60
             }
-            tasks.append(pacing_agent.analyze(pacing_data))
+            tasks.append(timed_agent(self.room_code, "pacing", pacing_agent.analyze(pacing_data, self.agent_context.pacing)))
             
             if len(self.questions) >= 3:
                 qa_data = {"questions": questions_data}
-                tasks.append(qa_grouper_agent.analyze(qa_data))
+                tasks.append(timed_agent(self.room_code, "qa_grouper", qa_grouper_agent.analyze(qa_data, self.agent_context.qa_grouper)))
             else:
                 tasks.append(asyncio.create_task(self._placeholder_qa_result()))
             
@@ -214,7 +853,7 @@ class RoomManager:
                     "reaction_counts": reaction_counts,
                     "recent_reactions": recent_reactions
                 }
-                tasks.append(sentiment_agent.analyze(sentiment_data))
+                tasks.append(timed_agent(self.room_code, "sentiment", sentiment_agent.analyze(sentiment_data, self.agent_context.sentiment)))
             else:
                 tasks.append(asyncio.create_task(self._placeholder_sentiment_result()))
             
@@ -223,9 +862,28 @@ class RoomManager:
                 timeout=10.0
             )
             
-            self.last_pacing_analysis = results[0] if not isinstance(results[0], Exception) else None
-            self.last_qa_analysis = results[1] if not isinstance(results[1], Exception) else None
-            self.last_sentiment_analysis = results[2] if not isinstance(results[2], Exception) else None
+            if input_version < self._insights_input_version:
+                outcome = "stale"
+                print(f"⏭️ Discarding stale AI analysis for {self.room_code}")
+                return
+            self._insights_input_version = input_version
+            
+            self._apply_ai_insights(
+                results[0] if not isinstance(results[0], Exception) else None,
+                results[1] if not isinstance(results[1], Exception) else None,
+                results[2] if not isinstance(results[2], Exception) else None
+            )
+            self._archive_event("ai_insights", json.dumps({
+                "pacing_status": (self.last_pacing_analysis or {}).get("pacing_status"),
+                "overall_sentiment": (self.last_sentiment_analysis or {}).get("overall_sentiment"),
+                "total_themes": (self.last_qa_analysis or {}).get("total_themes")
+            }))
+            self._publish(
+                "ai_insights",
+                pacing=self.last_pacing_analysis,
+                qa=self.last_qa_analysis,
+                sentiment=self.last_sentiment_analysis
+            )
             
             insights_data = {
                 "pacing": self.last_pacing_analysis,
@@ -239,12 +897,24 @@ class RoomManager:
                 "timestamp": datetime.now().isoformat()
             })
             
+            outcome = "ok"
             print(f"✓ AI Analysis completed for {self.room_code} ({self.metrics['ai_analyses_run']} total)")
             
         except asyncio.TimeoutError:
+            outcome = "timeout"
             print(f"⏰ AI Analysis timeout for {self.room_code}")
         except Exception as e:
             print(f"❌ AI Analysis error for {self.room_code}: {e}")
+        finally:
+            AI_ANALYSES.labels(outcome).inc()
+            AI_ANALYSIS_SECONDS.observe(time.perf_counter() - started)
+    
+    def _apply_ai_insights(self, pacing: Optional[Dict], qa: Optional[Dict], sentiment: Optional[Dict]):
+        self.last_pacing_analysis = pacing
+        self.last_qa_analysis = qa
+        self.last_sentiment_analysis = sentiment
+        # Windowed counts drift with time, so refresh them on every analysis tick too
+        self.mark_dirty("ai_insights", "counts")
     
     async def _placeholder_qa_result(self):
         return {
@@ -266,157 +936,545 @@ class RoomManager:
         }
     
     def add_reaction(self, reaction_type: str, user_id: str = None):
-        reaction = {
-            "type": reaction_type,
-            "timestamp": datetime.now().isoformat(),
-            "user_id": user_id or f"anon-{datetime.now().timestamp()}",
-            "room_code": self.room_code
-        }
-        self.reactions_buffer.append(reaction)
-        self.metrics["total_reactions"] += 1
-        
-        self._update_heatmap_bucket(reaction_type)
-        
-        if len(self.reactions_buffer) > 300:
-            self.reactions_buffer = self.reactions_buffer[-300:]
+        position = self._apply_reaction(reaction_type, time.time(), user_id)
+        self._archive_event(reaction_type)
+        EVENTS.labels("reaction").inc()
+        reaction = self.reactions.to_dict(position)
+        self._publish("reaction", reaction=reaction)
         
         if reaction_type == "im_lost" and self.get_reaction_counts(10).get("im_lost", 0) >= 3:
-            asyncio.create_task(self.run_ai_analysis())
+            self.analysis_scheduler.request(URGENCY_URGENT)
         
         return reaction
     
+    def _apply_reaction(self, reaction_type: str, timestamp: float, user_id: Optional[str]) -> int:
+        position = self.reactions.append(reaction_type, timestamp, user_id)
+        self.metrics["total_reactions"] += 1
+        
+        self._update_heatmap_bucket(reaction_type)
+        self.mark_dirty("counts", "heatmap_data")
+        return position
+    
     def add_question(self, question_text: str, user_id: str = None):
-        question = {
-            "id": f"q-{self.room_code}-{len(self.questions) + 1}-{datetime.now().timestamp()}",
-            "text": question_text,
-            "timestamp": datetime.now().isoformat(),
-            "user_id": user_id or f"anon-{datetime.now().timestamp()}",
-            "upvotes": 0,
-            "upvoted_by": [],
-            "room_code": self.room_code
-        }
-        self.questions.append(question)
-        self.metrics["total_questions"] += 1
+        now = time.time()
+        question = Question(f"q-{self.room_code}-{len(self.questions) + 1}-{now}", question_text, now, user_id, self.room_code)
+        self._apply_question(question)
+        self._archive_event("question", question.text)
+        EVENTS.labels("question").inc()
+        question_data = question.to_dict()
+        self._publish("question", question=question_data)
         
-        if len(self.questions) > 100:
-            self.questions = self.questions[-100:]
+        self.analysis_scheduler.request()
         
-        asyncio.create_task(self.run_ai_analysis())
+        return question_data
+    
+    def _apply_question(self, question: Question):
+        if question.id in self.questions_by_id:
+            return
+        self._index_question(question)
+        self.metrics["total_questions"] += 1
+        self.mark_dirty("questions", "top_questions")
         
-        return question
+        if len(self.questions) > 100:
+            self._evict_oldest_questions(len(self.questions) - 100)
+    
+    def _evict_oldest_questions(self, count: int):
+        for evicted in self.questions[:count]:
+            self.questions_by_id.pop(evicted.id, None)
+            self.question_ranking.remove(evicted.id)
+        self.questions = self.questions[count:]
+        if count > 0 and self.active_connections:
+            # An evicted question may have been in the pushed top-K (a no-op if the caller already pushed)
+            asyncio.create_task(self.push_top_questions(relay=False))
+    
+    def _index_question(self, question: Question, replay_upvotes: bool = False):
+        self.questions.append(question)
+        self.questions_by_id[question.id] = question
+        if replay_upvotes:
+            # Upvote times are not kept, so restored upvotes count from the question's timestamp
+            self.question_ranking.add(question.id, question.timestamp)
+            for _ in range(question.upvotes):
+                self.question_ranking.upvote(question.id, question.timestamp)
+        else:
+            self.question_ranking.add(question.id)
     
     def upvote_question(self, question_id: str, user_id: str):
-        for question in self.questions:
-            if question["id"] == question_id:
-                if user_id not in question.get("upvoted_by", []):
-                    question["upvotes"] = question.get("upvotes", 0) + 1
-                    if "upvoted_by" not in question:
-                        question["upvoted_by"] = []
-                    question["upvoted_by"].append(user_id)
-                    return question
+        question = self._apply_upvote(question_id, user_id)
+        if question:
+            self._archive_event("upvote", question_id)
+            EVENTS.labels("upvote").inc()
+            self._publish("upvote", question_id=question_id, user_id=user_id)
+            return question.to_dict()
+        return None
+    
+    def _apply_upvote(self, question_id: str, user_id: str) -> Optional[Question]:
+        question = self.questions_by_id.get(question_id)
+        if question and user_id not in question.upvoted_by:
+            question.upvotes += 1
+            question.upvoted_by.append(user_id)
+            self.question_ranking.upvote(question_id)
+            self.mark_dirty("questions", "top_questions")
+            return question
         return None
     
+    def get_top_questions(self) -> List[Dict]:
+        now = datetime.now().timestamp()
+        return [
+            {
+                **self.questions_by_id[question_id].to_dict(),
+                "hot_score": round(self.question_ranking.hot_score(question_id, now), 3)
+            }
+            for question_id in self.question_ranking.top_ids()
+            if question_id in self.questions_by_id
+        ]
+    
+    def top_questions_changed(self) -> bool:
+        """True (once) when the top-K membership, order or upvote counts moved since the last push"""
+        top = [
+            (question_id, self.questions_by_id[question_id].upvotes)
+            for question_id in self.question_ranking.top_ids()
+            if question_id in self.questions_by_id
+        ]
+        if top == self._pushed_top_questions:
+            return False
+        self._pushed_top_questions = top
+        return True
+    
+    async def push_top_questions(self, relay: bool = True):
+        """Broadcast top_questions if it changed; relay=False for changes local to this worker (trims)"""
+        if not self.top_questions_changed():
+            return
+        message = {"type": "top_questions", "data": self.get_top_questions()}
+        if relay:
+            await self.broadcast(message)
+        else:
+            await self._fan_out(message)
+    
     def create_poll(self, poll_text: str, duration: int = 30):
-        poll_id = f"poll-{self.room_code}-{datetime.now().timestamp()}"
-        poll = {
-            "id": poll_id,
-            "text": poll_text,
-            "active": True,
-            "yes_votes": 0,
-            "no_votes": 0,
-            "voted_users": [],
-            "started_at": datetime.now().isoformat(),
-            "duration": duration,
-            "room_code": self.room_code
-        }
+        now = time.time()
+        poll = Poll(f"poll-{self.room_code}-{now}", poll_text, now, duration, self.room_code)
+        self._apply_poll(poll)
+        self._archive_event("poll_created", poll.text)
+        EVENTS.labels("poll").inc()
+        poll_data = poll.to_dict()
+        self._publish("poll", poll=poll_data)
+        # The creating worker owns expiry; other workers follow its poll_close
+        self._poll_timer = timer_wheel.schedule(duration, self._expire_poll, poll.id)
+        return poll_data
+    
+    def _apply_poll(self, poll: Poll):
+        if self._poll_timer:
+            self._poll_timer.cancel()  # Superseded poll: its expiry must not fire
+            self._poll_timer = None
         self.active_poll = poll
+        self.mark_dirty("active_poll")
+    
+    def vote_poll(self, poll_id: str, user_id: str, vote: str) -> Optional[Dict]:
+        poll = self._apply_vote(poll_id, user_id, vote)
+        if poll:
+            self._archive_event(f"vote_{vote}", poll_id)
+            EVENTS.labels("vote").inc()
+            self._publish("vote", poll_id=poll_id, user_id=user_id, vote=vote)
+            return poll.to_dict()
+        return None
+    
+    def _apply_vote(self, poll_id: str, user_id: str, vote: str) -> Optional[Poll]:
+        poll = self.active_poll
+        if not poll or poll.id != poll_id or not poll.active:
+            return None
+        if user_id in poll.voted_users:
+            return None
+        
+        if vote == "yes":
+            poll.yes_votes += 1
+        else:
+            poll.no_votes += 1
+        poll.voted_users.append(user_id)
+        
+        self.mark_dirty("active_poll")
         return poll
     
-    def get_recent_reactions(self, seconds: int = 30):
-        now = datetime.now()
-        recent = []
-        for reaction in self.reactions_buffer:
-            try:
-                timestamp = datetime.fromisoformat(reaction["timestamp"])
-                diff = (now - timestamp).total_seconds()
-                if diff <= seconds:
-                    recent.append(reaction)
-            except:
-                continue
-        return recent
-    
-    def get_reaction_counts(self, seconds: int = 30):
-        recent = self.get_recent_reactions(seconds)
-        counts = {
-            "speed_up": 0,
-            "slow_down": 0,
-            "show_code": 0,
-            "im_lost": 0
-        }
-        for reaction in recent:
-            reaction_type = reaction["type"]
-            if reaction_type in counts:
-                counts[reaction_type] += 1
-        return counts
+    def close_poll(self, poll_id: str) -> Optional[Dict]:
+        poll = self._apply_poll_close(poll_id)
+        if poll:
+            self._archive_event("poll_closed", poll_id)
+            self._publish("poll_close", poll_id=poll_id)
+            return poll.to_dict()
+        return None
+    
+    async def _expire_poll(self, poll_id: str):
+        self._poll_timer = None
+        closed_poll = self.close_poll(poll_id)
+        if closed_poll:
+            await self.broadcast({
+                "type": "poll_closed",
+                "data": closed_poll
+            })
+    
+    def _apply_poll_close(self, poll_id: str) -> Optional[Poll]:
+        if self.active_poll and self.active_poll.id == poll_id:
+            self.active_poll.active = False
+            self.mark_dirty("active_poll")
+            return self.active_poll
+        return None
+    
+    def get_recent_reactions(self, seconds: int = 30) -> List[Dict]:
+        return self.reactions.recent(seconds)
+    
+    def get_reaction_counts(self, seconds: int = 30) -> Dict[str, int]:
+        return self.reactions.counts(seconds)
     
     def get_stats(self):
         return {
             "room_code": self.room_code,
-            "active_connections": len(self.active_connections),
+            "active_connections": self.total_connections(),
+            "connections_by_role": {role: len(conns) for role, conns in self.connections_by_role.items()},
+            "outbound": self.get_outbound_stats(),
+            "rate_limited": self.rate_limiter.rejected,
+            "analysis_scheduler": self.analysis_scheduler.metrics,
+            "analysis_schedule_lag": analysis_pool.room_lag.get(self.room_code),
+            "agent_context_bytes": self.agent_context.memory_footprint(),
+            "memory": self.memory_usage(),
             "metrics": self.metrics,
             "created_at": self.created_at.isoformat(),
             "age_minutes": (datetime.now() - self.created_at).total_seconds() / 60,
             "ai_analyses_run": self.metrics["ai_analyses_run"]
         }
+    
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Approximate bytes held by this room, per structure
+        Measured once per room version. `total` is room state only: outbound
+        queues are re-read every call, reported on their own and left out, since
+        trimming the room cannot free them (the writers and max_queue do)
+        """
+        if self._memory_usage is None or self._memory_usage[0] != self.version:
+            seen = set()
+            usage = {
+                "reactions": self.reactions.memory_bytes(),
+                "questions": deep_sizeof(self.questions, seen) + deep_sizeof(self.questions_by_id, seen)
+                             + deep_sizeof(self.question_ranking, seen),
+                "poll": deep_sizeof(self.active_poll, seen),
+                "heatmap": deep_sizeof(self.heatmap_buckets, seen),
+                "insights": deep_sizeof(
+                    (self.last_pacing_analysis, self.last_qa_analysis, self.last_sentiment_analysis), seen
+                ),
+                "agent_context": self.agent_context.memory_footprint()["total"],
+                "view_cache": deep_sizeof(self._view_cache, seen)
+            }
+            self._memory_usage = (self.version, usage)
+        
+        usage = dict(self._memory_usage[1])
+        usage["total"] = sum(usage.values())
+        usage["outbound_queues"] = self.outbound_queue_bytes()
+        return usage
+    
+    def outbound_queue_bytes(self) -> int:
+        """Bytes of queued frames, each shared broadcast frame counted once however many sockets hold it"""
+        seen = set()
+        total = 0
+        for connection in self.active_connections:
+            for frame in connection.queued_frames():
+                if id(frame) not in seen:
+                    seen.add(id(frame))
+                    total += len(frame)
+        return total
+    
+    def reduce_memory(self, target: int) -> int:
+        """
+        Shed room state until it is under `target` bytes; returns bytes reclaimed
+        Rebuildable data goes first (view cache, agent caches and histories),
+        then the older half of the reactions, then the older half of the questions.
+        Outbound queues are not part of the measure: none of these steps frees them
+        """
+        before = self.memory_usage()["total"]
+        usage = before
+        steps = (
+            self._view_cache.clear,
+            self.agent_context.trim,
+            lambda: self.reactions.drop_oldest(len(self.reactions) // 2),
+            lambda: self._evict_oldest_questions(len(self.questions) // 2)
+        )
+        for step in steps:
+            if usage <= target:
+                break
+            step()
+            self._memory_usage = None
+            usage = self.memory_usage()["total"]
+        
+        if usage < before:
+            self.metrics["memory_trims"] += 1
+            self.mark_dirty("counts", "questions", "top_questions")
+        return before - usage
+    
+    def get_ai_insights(self):
+        return {
+            "room_code": self.room_code,
+            "pacing_analysis": self.last_pacing_analysis,
+            "qa_analysis": self.last_qa_analysis,
+            "sentiment_analysis": self.last_sentiment_analysis,
+            "last_analysis_time": self.last_ai_run.isoformat() if self.last_ai_run else None,
+            "total_analyses": self.metrics["ai_analyses_run"]
+        }
+    
+    def _build_view(self, view: str) -> Dict:
+        if view == "stats":
+            return self.build_stats_snapshot()
+        if view == "room_stats":
+            return self.get_stats()
+        if view == "ai_insights":
+            return self.get_ai_insights()
+        raise ValueError(f"Unknown view: {view}")
+    
+    def _cached_view_entry(self, key: str) -> Optional[Tuple]:
+        cached = self._view_cache.get(key)
+        if cached and cached[0] == self.version and time.monotonic() - cached[1] < self.view_cache_max_age:
+            _view_cache_hits.inc()
+            return cached
+        _view_cache_misses.inc()
+        return None
+    
+    def get_encoded_view(self, view: str) -> Tuple[str, bytes, str]:
+        """
+        Return (json_text, json_bytes, etag) for a read view
+        Built once per room version and shared by every WS/HTTP reader
+        until the next mutation invalidates it
+        """
+        cached = self._cached_view_entry(view)
+        if cached:
+            return cached[2], cached[3], cached[4]
+        
+        now = time.monotonic()
+        payload = self._build_view(view)
+        text = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        body = text.encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self._view_cache[view] = (self.version, now, text, body, etag)
+        return text, body, etag
+    
+    def get_view_frame(self, view: str, codec) -> object:
+        """Cached view encoded for a connection's wire codec"""
+        if not codec.binary:
+            return self.get_encoded_view(view)[0]
+        
+        key = f"{view}:{codec.name}"
+        cached = self._cached_view_entry(key)
+        if cached:
+            return cached[2]
+        
+        frame = codec.encode(self._build_view(view))
+        self._view_cache[key] = (self.version, time.monotonic(), frame)
+        return frame
 
 class GlobalConnectionManager:
-    def __init__(self):
+    def __init__(self, backplane: Backplane = None, worker_id: str = None):
         self.rooms: Dict[str, RoomManager] = {}
-        self._cleanup_task = None
+        self.worker_id = worker_id or os.getenv("WORKER_ID") or f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.backplane = backplane or create_backplane(os.getenv("BACKPLANE_URL"))
+        self.snapshots = SnapshotStore.from_env()
+        self.event_archive = EventArchive.from_env(self.worker_id)
+        self.memory_budget = MemoryBudget.from_env()
+        self._memory_timer = None
+        
+        # Idle rooms: frozen once their deadline passes (ROOM_IDLE_TTL after the last
+        # activity, HIBERNATE_GRACE after the last local socket left), evicted HIBERNATE_TTL later
+        self.hibernated: Dict[str, FrozenRoom] = {}
+        self.room_idle_ttl = float(os.getenv("ROOM_IDLE_TTL", "300"))
+        self.hibernate_grace = float(os.getenv("HIBERNATE_GRACE", "30"))
+        self.hibernate_ttl = float(os.getenv("HIBERNATE_TTL", str(2 * 3600)))
+        self.idle_rooms = IdleIndex(timer_wheel, self._on_room_idle)
+        self._in_grace: Set[str] = set()  # Unattended rooms on the HIBERNATE_GRACE deadline
+        self.frozen_rooms = IdleIndex(timer_wheel, self.evict_hibernated)
+        self.hibernation_metrics = {"hibernated": 0, "revived": 0, "evicted": 0}
+        self._frozen_bytes = 0
     
-    def start_cleanup_task(self):
-        if not self._cleanup_task:
-            self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
+    def start_maintenance_timers(self):
+        if not self._memory_timer:
+            self._memory_timer = timer_wheel.schedule_repeating(self.memory_budget.interval, self.enforce_memory_budget)
     
-    async def _periodic_cleanup(self):
-        while True:
-            try:
-                await asyncio.sleep(300)
-                self.cleanup_empty_rooms()
-            except Exception as e:
-                print(f"Error in cleanup task: {e}")
+    def enforce_memory_budget(self):
+        return self.memory_budget.enforce(self.rooms.values())
     
     def create_room(self, room_code: str) -> RoomManager:
         if room_code not in self.rooms:
-            self.rooms[room_code] = RoomManager(room_code)
+            room = RoomManager(room_code, self)
+            self.rooms[room_code] = room
+            self.idle_rooms.touch(room_code, self.room_idle_ttl)
+            asyncio.create_task(self._attach_room(room))
             print(f"🏠 Room created: {room_code}")
         return self.rooms[room_code]
     
+    async def _attach_room(self, room: RoomManager):
+        """Join the room's backplane channel and ask other workers for its state"""
+        await self.backplane.subscribe(room.channel, self.worker_id, room.handle_backplane_event)
+        room._publish("sync_request")
+    
     def get_room(self, room_code: str) -> RoomManager:
         if room_code not in self.rooms:
+            if room_code in self.hibernated:
+                return self.revive_room(room_code)
             return self.create_room(room_code)
         return self.rooms[room_code]
     
+    async def get_or_restore_room(self, room_code: str) -> RoomManager:
+        """
+        get_room for a connecting socket: stops a pending hibernation, thaws a
+        frozen room, or restores a room that is not live yet from its snapshot
+        """
+        self.note_activity(room_code)
+        if room_code in self.rooms or room_code in self.hibernated:
+            return self.get_room(room_code)
+        if not self.snapshots or not self.snapshots.has_snapshot(room_code):
+            return self.get_room(room_code)
+        
+        state = await self.snapshots.load(room_code)
+        room = self.get_room(room_code)
+        if state and not room.restored_from_snapshot:
+            room.load_state(state)
+            room.restored_from_snapshot = True
+            print(f"💾 Room restored from snapshot: {room_code}")
+        return room
+    
     def room_exists(self, room_code: str) -> bool:
-        return room_code in self.rooms
+        return room_code in self.rooms or room_code in self.hibernated
+    
+    def note_activity(self, room_code: str):
+        """Push a live room's idle deadline back (O(1), called on every mutation)"""
+        room = self.rooms.get(room_code)
+        if room is None:
+            return
+        if room.active_connections:
+            self._in_grace.discard(room_code)
+        elif room_code in self._in_grace:
+            return  # Relayed events must not stretch the grace period to ROOM_IDLE_TTL
+        self.idle_rooms.touch(room_code, self.room_idle_ttl)
+    
+    def schedule_hibernation(self, room_code: str):
+        """Freeze the room if it is still without local sockets after the grace period"""
+        if room_code in self.rooms:
+            self._in_grace.add(room_code)
+            self.idle_rooms.touch(room_code, self.hibernate_grace)
+    
+    def _on_room_idle(self, room_code: str):
+        room = self.rooms.get(room_code)
+        if room and room.active_connections:
+            self._in_grace.discard(room_code)
+            self.idle_rooms.touch(room_code, self.room_idle_ttl)  # Quiet but attended: keep it live
+        else:
+            self.hibernate_room(room_code)
+    
+    def hibernate_room(self, room_code: str):
+        """Swap an idle live room for its frozen form"""
+        room = self.rooms.get(room_code)
+        if not room or room.active_connections:
+            return
+        
+        del self.rooms[room_code]
+        self.idle_rooms.discard(room_code)
+        self._in_grace.discard(room_code)
+        frozen = room.freeze()
+        self.hibernated[room_code] = frozen
+        self._frozen_bytes += len(frozen.blob)
+        self.frozen_rooms.touch(room_code, self.hibernate_ttl)
+        self._detach_room(room)
+        self.hibernation_metrics["hibernated"] += 1
+        print(f"💤 Room hibernated: {room_code} ({len(frozen.blob)} bytes)")
+    
+    def revive_room(self, room_code: str) -> RoomManager:
+        """Rebuild a live room from its frozen form (one decode + load_state)"""
+        frozen = self.hibernated.pop(room_code)
+        self.frozen_rooms.discard(room_code)
+        self._frozen_bytes -= len(frozen.blob)
+        
+        room = self.create_room(room_code)
+        room.load_state(frozen.thaw())
+        room.restored_from_snapshot = True  # Newer than anything on disk
+        room.resume_poll_timer()
+        if not room.active_connections:
+            self.schedule_hibernation(room_code)  # Revived by a read: freeze again unless a socket joins
+        self.hibernation_metrics["revived"] += 1
+        print(f"☀️ Room revived: {room_code}")
+        return room
+    
+    def evict_hibernated(self, room_code: str):
+        frozen = self.hibernated.pop(room_code, None)
+        if frozen:
+            self._frozen_bytes -= len(frozen.blob)
+            self.hibernation_metrics["evicted"] += 1
+            print(f"🗑️ Hibernated room evicted: {room_code}")
     
     def delete_room(self, room_code: str):
+        frozen = self.hibernated.pop(room_code, None)
+        if frozen:
+            self._frozen_bytes -= len(frozen.blob)
+            self.frozen_rooms.discard(room_code)
+        
         if room_code in self.rooms:
             room = self.rooms[room_code]
             if len(room.active_connections) == 0:
                 del self.rooms[room_code]
+                self.idle_rooms.discard(room_code)
+                self._in_grace.discard(room_code)
+                room.cancel_tasks()
+                self._detach_room(room)
                 print(f"🗑️ Room deleted: {room_code}")
     
-    def cleanup_empty_rooms(self):
-        empty_rooms = [code for code, room in self.rooms.items() 
-                      if len(room.active_connections) == 0]
-        for code in empty_rooms:
-            self.delete_room(code)
-        if empty_rooms:
-            print(f"🧹 Cleaned {len(empty_rooms)} empty rooms")
+    def _detach_room(self, room: RoomManager):
+        """Leave the backplane channel, snapshot the room and close its archive session"""
+        asyncio.create_task(self.backplane.unsubscribe(room.channel, self.worker_id))
+        asyncio.create_task(self._retire_room(room))
+        handler_timings.forget(room.room_code)
+        if self.event_archive:
+            asyncio.create_task(self.event_archive.close_session(room.room_code, room.archive_session))
+    
+    async def _retire_room(self, room: RoomManager):
+        """Snapshot a deleted or hibernated room, then free its agent histories and caches"""
+        if self.snapshots:
+            await self.snapshots.save_room(room)
+        room.agent_context.clear()
+    
+    def get_hibernation_stats(self) -> Dict:
+        return {
+            "hibernated_rooms": len(self.hibernated),
+            "frozen_bytes": self._frozen_bytes,
+            "idle_ttl_seconds": self.room_idle_ttl,
+            "grace_seconds": self.hibernate_grace,
+            "ttl_seconds": self.hibernate_ttl,
+            "idle_index": self.idle_rooms.get_stats(),
+            **self.hibernation_metrics
+        }
+    
+    async def release_room(self, room_code: str) -> int:
+        """Drop a room that now belongs to another shard; its clients reconnect there"""
+        room = self.rooms.get(room_code)
+        if not room:
+            self.delete_room(room_code)  # Frozen copy, if any
+            return 0
+        
+        connections = list(room.active_connections)
+        for connection in connections:
+            try:
+                await connection.websocket.close(code=1012)  # Service restart: client retries
+            except Exception:
+                pass
+            room.disconnect(connection)
+        
+        self.delete_room(room_code)
+        return len(connections)
 
 global_manager = GlobalConnectionManager()
 
+registry.gauge_function(
+    "feedback_rooms", "Rooms on this worker by state (active/hibernated)",
+    lambda: {("active",): len(global_manager.rooms), ("hibernated",): len(global_manager.hibernated)},
+    ("state",)
+)
+registry.gauge_function("feedback_analysis_queue_depth", "Room analyses waiting for a worker", lambda: analysis_pool.queue_depth)
+registry.gauge_function("feedback_analysis_active", "Room analyses running", lambda: analysis_pool.active)
+registry.gauge_function("feedback_room_memory_bytes", "Room state bytes at the last memory check",
+                        lambda: global_manager.memory_budget.metrics["rooms_bytes"])
+registry.add_collector(handler_timings.prometheus_lines)
+
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Real-Time Feedback API with AI Agents Started!")
@@ -425,8 +1483,26 @@ async def startup_event():
     print("  - Q&A Grouper Agent (Gemini)")
     print("  - Sentiment Agent (Gemini)")
     print("📡 WebSocket endpoint: ws://localhost:8000/ws/{room_code}")
+    print(f"🔀 Worker {global_manager.worker_id} using {type(global_manager.backplane).__name__}")
     
-    global_manager.start_cleanup_task()
+    inherit_task_tags(asyncio.get_running_loop())
+    await global_manager.backplane.start()
+    timer_wheel.start()
+    global_manager.start_maintenance_timers()
+    analysis_pool.start()
+    loop_lag_monitor.start()
+    if global_manager.snapshots:
+        global_manager.snapshots.start(global_manager)
+        print(f"💾 Snapshots every {global_manager.snapshots.interval:.0f}s in {global_manager.snapshots.directory}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if global_manager.snapshots:
+        written = await global_manager.snapshots.save_all(global_manager.rooms.values())
+        print(f"💾 Saved {written} room snapshots")
+    if global_manager.event_archive:
+        await global_manager.event_archive.flush_all()
+        global_manager.event_archive.close()
 
 @app.get("/")
 async def root():
@@ -458,172 +1534,360 @@ async def health_check():
         "total_rooms": len(global_manager.rooms),
         "total_connections": total_connections,
         "total_ai_analyses": total_analyses,
-        "ai_agents_active": True
+        "ai_agents_active": True,
+        "analysis_pool": analysis_pool.get_stats(),
+        "timers": timer_wheel.get_stats(),
+        "memory": global_manager.memory_budget.get_stats(),
+        "hibernation": global_manager.get_hibernation_stats(),
+        "backplane": {"type": type(global_manager.backplane).__name__, **global_manager.backplane.get_stats()},
+        "loop_lag": loop_lag_monitor.get_stats(),
+        "snapshots": global_manager.snapshots.metrics if global_manager.snapshots else None
     }
 
+async def handle_client_message(room: RoomManager, connection: ClientConnection, message_type: Optional[str], data: Dict):
+    """One inbound WebSocket message, after rate limiting"""
+    if message_type == "reaction":
+        reaction_type = data.get("reaction")
+        user_id = data.get("user_id")
+        
+        if reaction_type in ["speed_up", "slow_down", "show_code", "im_lost"]:
+            reaction = room.add_reaction(reaction_type, user_id)
+            
+            # The event itself is never conflated (feeds, participants); the aggregate is
+            await room.broadcast({
+                "type": "reaction",
+                "data": reaction
+            })
+            await room.broadcast({
+                "type": "reaction_counts",
+                "counts": room.get_reaction_counts(),
+                "heatmap_data": room.get_heatmap_data()
+            })
+    
+    elif message_type == "question":
+        question_text = data.get("text")
+        user_id = data.get("user_id")
+        
+        if question_text and question_text.strip():
+            question = room.add_question(question_text, user_id)
+            
+            await room.broadcast({
+                "type": "question",
+                "data": question
+            })
+            await room.push_top_questions()
+    
+    elif message_type == "upvote_question":
+        question_id = data.get("question_id")
+        user_id = data.get("user_id")
+        
+        if question_id and user_id:
+            updated_question = room.upvote_question(question_id, user_id)
+            
+            if updated_question:
+                await room.broadcast({
+                    "type": "question_upvote",
+                    "data": updated_question
+                })
+                await room.push_top_questions()
+    
+    elif message_type == "create_poll":
+        poll_text = data.get("text", "Do you agree?")
+        duration = data.get("duration", 30)
+        if not isinstance(duration, (int, float)) or duration <= 0:
+            duration = 30
+        
+        poll = room.create_poll(poll_text, duration)
+        
+        await room.broadcast({
+            "type": "poll_created",
+            "data": poll
+        })
+    
+    elif message_type == "vote_poll":
+        poll_id = data.get("poll_id")
+        user_id = data.get("user_id")
+        vote = data.get("vote")
+        
+        if poll_id and vote in ["yes", "no"]:
+            updated_poll = room.vote_poll(poll_id, user_id, vote)
+            
+            if updated_poll:
+                await room.broadcast({
+                    "type": "poll_vote",
+                    "data": updated_poll
+                })
+    
+    elif message_type == "get_stats":
+        if data.get("version") == room.version:
+            await connection.send_message({
+                "type": "not_modified",
+                "version": room.version
+            })
+        else:
+            await connection.send_frame(room.get_view_frame("stats", connection.codec), "stats")
+    
+    elif message_type == "subscribe":
+        room.subscribe(connection)
+        await connection.send_frame(room.get_view_frame("stats", connection.codec), "stats")
+    
+    elif message_type == "unsubscribe":
+        room.unsubscribe(connection)
+    
+    elif message_type == "request_ai_analysis":
+        room.analysis_scheduler.request(URGENCY_URGENT)
+    
+    elif message_type == "ping":
+        await connection.send_message({
+            "type": "pong",
+            "timestamp": datetime.now().isoformat()
+        })
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """This worker's metrics in the Prometheus text format (app.supervisor merges all workers')"""
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+def checked_room_code(room_code: str) -> str:
+    """Upper-cased room code from a path parameter; 400 for anything else"""
+    checked = valid_room_code(room_code)
+    if checked is None:
+        raise HTTPException(status_code=400, detail="Invalid room code")
+    return checked
+
 @app.websocket("/ws/{room_code}")
 async def websocket_endpoint(websocket: WebSocket, room_code: str):
-    room_code = room_code.upper()
-    room = global_manager.get_room(room_code)
+    room_code = valid_room_code(room_code)
+    if room_code is None:
+        await websocket.close(code=1008)  # Before accept: the handshake is refused
+        return
+    tags = tag_task(room_code=room_code)  # Read by the loop watchdog; inherited by the writer task
+    room = await global_manager.get_or_restore_room(room_code)
     
-    await room.connect(websocket)
+    connection = await room.connect(websocket, websocket.query_params.get("role", "audience"))
     
     try:
-        await websocket.send_json({
+        await connection.send_message({
             "type": "connected",
             "message": f"Connected to room {room_code}",
             "room_code": room_code,
+            "role": connection.role,
             "timestamp": datetime.now().isoformat()
         })
         
         while True:
-            data = await websocket.receive_json()
+            data = await connection.receive_message()
             message_type = data.get("type")
+            if not isinstance(message_type, str):
+                message_type = "unknown"  # {"type": []} is valid JSON but no dict key; ignored like any unknown type
+            user_id = data.get("user_id")
+            timed_type = message_type if message_type in CLIENT_MESSAGE_TYPES else "unknown"
+            tags["message_type"] = timed_type
             
-            if message_type == "reaction":
-                reaction_type = data.get("reaction")
-                user_id = data.get("user_id")
-                
-                if reaction_type in ["speed_up", "slow_down", "show_code", "im_lost"]:
-                    reaction = room.add_reaction(reaction_type, user_id)
-                    
-                    await room.broadcast({
-                        "type": "reaction",
-                        "data": reaction,
-                        "counts": room.get_reaction_counts(),
-                        "heatmap_data": room.get_heatmap_data()
-                    })
-            
-            elif message_type == "question":
-                question_text = data.get("text")
-                user_id = data.get("user_id")
-                
-                if question_text and question_text.strip():
-                    question = room.add_question(question_text, user_id)
-                    
-                    await room.broadcast({
-                        "type": "question",
-                        "data": question
+            # Enforced before any room mutation or broadcast
+            retry_after = room.rate_limiter.check(
+                connection.limits, message_type, user_id if isinstance(user_id, str) else None
+            )
+            if retry_after is not None:
+                if room.rate_limiter.is_abusive(connection.limits):
+                    print(f"🚫 Closing flooding client {connection.id} in {room_code}")
+                    await connection.websocket.close(code=1008)
+                    raise WebSocketDisconnect(1008)
+                if room.rate_limiter.should_notify(connection.limits, message_type):
+                    await connection.send_message({
+                        "type": "rate_limited",
+                        "message_type": message_type,
+                        "retry_after": round(retry_after, 2)
                     })
+                continue
             
-            elif message_type == "upvote_question":
-                question_id = data.get("question_id")
-                user_id = data.get("user_id")
-                
-                if question_id and user_id:
-                    updated_question = room.upvote_question(question_id, user_id)
-                    
-                    if updated_question:
-                        await room.broadcast({
-                            "type": "question_upvote",
-                            "data": updated_question
-                        })
-            
-            elif message_type == "create_poll":
-                poll_text = data.get("text", "Do you agree?")
-                duration = data.get("duration", 30)
-                
-                poll = room.create_poll(poll_text, duration)
-                
-                await room.broadcast({
-                    "type": "poll_created",
-                    "data": poll
-                })
-                
-                async def auto_close():
-                    await asyncio.sleep(duration)
-                    if room.active_poll and room.active_poll.get("id") == poll["id"]:
-                        room.active_poll["active"] = False
-                        await room.broadcast({
-                            "type": "poll_closed",
-                            "data": room.active_poll
-                        })
-                
-                asyncio.create_task(auto_close())
-            
-            elif message_type == "vote_poll":
-                poll_id = data.get("poll_id")
-                user_id = data.get("user_id")
-                vote = data.get("vote")
-                
-                if poll_id and vote in ["yes", "no"] and room.active_poll:
-                    if room.active_poll.get("id") == poll_id and room.active_poll.get("active"):
-                        if user_id not in room.active_poll.get("voted_users", []):
-                            if vote == "yes":
-                                room.active_poll["yes_votes"] = room.active_poll.get("yes_votes", 0) + 1
-                            else:
-                                room.active_poll["no_votes"] = room.active_poll.get("no_votes", 0) + 1
-                            
-                            room.active_poll["voted_users"].append(user_id)
-                            
-                            await room.broadcast({
-                                "type": "poll_vote",
-                                "data": room.active_poll
-                            })
-            
-            elif message_type == "get_stats":
-                await websocket.send_json({
-                    "type": "stats",
-                    "counts": room.get_reaction_counts(),
-                    "total_questions": len(room.questions),
-                    "recent_questions": room.questions[-10:],
-                    "recent_reactions": room.get_recent_reactions(60),
-                    "active_connections": len(room.active_connections),
-                    "active_poll": room.active_poll if room.active_poll and room.active_poll.get("active") else None,
-                    "room_code": room_code,
-                    "heatmap_data": room.get_heatmap_data(),
-                    "ai_insights": {
-                        "pacing": room.last_pacing_analysis,
-                        "qa_grouping": room.last_qa_analysis,
-                        "sentiment": room.last_sentiment_analysis
-                    }
-                })
-            
-            elif message_type == "request_ai_analysis":
-                asyncio.create_task(room.run_ai_analysis())
-            
-            elif message_type == "ping":
-                await websocket.send_json({
-                    "type": "pong",
-                    "timestamp": datetime.now().isoformat()
-                })
+            if handler_timings.rate:
+                started = time.perf_counter() if handler_timings.sample() else None
+                await handle_client_message(room, connection, message_type, data)
+                handler_timings.record(
+                    HANDLER, room_code, timed_type,
+                    connection.last_frame_bytes, time.perf_counter() - started if started is not None else None
+                )
+            else:
+                await handle_client_message(room, connection, message_type, data)
     
     except WebSocketDisconnect:
-        room.disconnect(websocket)
-        if len(room.active_connections) == 0:
-            global_manager.delete_room(room_code)
+        room.disconnect(connection)  # The last one out schedules hibernation
     except Exception as e:
         print(f"❌ WebSocket error in {room_code}: {e}")
-        room.disconnect(websocket)
+        room.disconnect(connection)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def cached_view_response(room: RoomManager, view: str, request: Request) -> Response:
+    _, body, etag = room.get_encoded_view(view)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @app.get("/api/rooms/{room_code}/stats")
-async def get_room_stats(room_code: str):
-    room_code = room_code.upper()
+async def get_room_stats(room_code: str, request: Request):
+    room_code = checked_room_code(room_code)
     
     if not global_manager.room_exists(room_code):
         return {"error": "Room not found"}, 404
     
     room = global_manager.get_room(room_code)
-    return room.get_stats()
+    return cached_view_response(room, "room_stats", request)
 
 @app.get("/api/rooms/{room_code}/ai-insights")
-async def get_ai_insights(room_code: str):
-    room_code = room_code.upper()
+async def get_ai_insights(room_code: str, request: Request):
+    room_code = checked_room_code(room_code)
     
     if not global_manager.room_exists(room_code):
         return {"error": "Room not found"}, 404
     
     room = global_manager.get_room(room_code)
+    return cached_view_response(room, "ai_insights", request)
+
+@app.get("/api/rooms/{room_code}/connections")
+async def get_room_connections(room_code: str):
+    """Per-connection outbound queue depth and conflation/drop counters"""
+    room_code = checked_room_code(room_code)
     
+    if not global_manager.room_exists(room_code):
+        return {"error": "Room not found"}, 404
+    
+    room = global_manager.get_room(room_code)
     return {
         "room_code": room_code,
-        "pacing_analysis": room.last_pacing_analysis,
-        "qa_analysis": room.last_qa_analysis,
-        "sentiment_analysis": room.last_sentiment_analysis,
-        "last_analysis_time": room.last_ai_run.isoformat() if room.last_ai_run else None,
-        "total_analyses": room.metrics["ai_analyses_run"]
+        "outbound": room.get_outbound_stats(),
+        "connections": [connection.describe() for connection in room.active_connections]
+    }
+
+@app.get("/api/rooms/{room_code}/timeline")
+async def get_room_timeline(
+    room_code: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: float = 60.0,
+    kinds: Optional[str] = None,
+    session: Optional[str] = None,
+    with_questions: bool = False
+):
+    """
+    Event counts per kind over a time range, from the session archive
+    start/end are epoch seconds (default: whole session), resolution is the bucket width in seconds
+    """
+    room_code = checked_room_code(room_code)
+    
+    if not global_manager.event_archive:
+        return {"error": "Event archive disabled"}, 404
+    
+    room = global_manager.rooms.get(room_code)
+    if room and session in (None, room.archive_session):
+        archive = room.archive
+    else:
+        archive = global_manager.event_archive.find_session(room_code, session)
+    if not archive:
+        return {"error": "Room not found"}, 404
+    
+    timeline = await archive.timeline(start, end, resolution, kinds.split(",") if kinds else None)
+    timeline["room_code"] = room_code
+    timeline["sessions"] = global_manager.event_archive.list_sessions(room_code)
+    
+    if with_questions:
+        timeline["questions"] = await asyncio.to_thread(
+            archive.strings_in_range, "question", timeline["start"], timeline["end"]
+        )
+    
+    return timeline
+
+# === Internal shard endpoints (called by app.supervisor, never proxied) ===
+
+INTERNAL_TOKEN = internal_token()
+
+def require_internal_caller(request: Request):
+    """The supervisor's X-Internal-Token (INTERNAL_TOKEN, or the random one logged at startup)"""
+    if not is_internal_caller(INTERNAL_TOKEN, request.headers.get(INTERNAL_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/internal/rooms", dependencies=[Depends(require_internal_caller)])
+async def list_hosted_rooms():
+    return {"worker_id": global_manager.worker_id, "rooms": [*global_manager.rooms, *global_manager.hibernated]}
+
+@app.get("/internal/rooms/{room_code}/state", dependencies=[Depends(require_internal_caller)])
+async def export_room_state(room_code: str):
+    room_code = checked_room_code(room_code)
+    
+    if not global_manager.room_exists(room_code):
+        return Response(status_code=404)
+    if room_code in global_manager.hibernated:
+        return global_manager.hibernated[room_code].thaw()  # Moving shards: no need to revive it here
+    
+    return global_manager.get_room(room_code).export_state()
+
+@app.put("/internal/rooms/{room_code}/state", dependencies=[Depends(require_internal_caller)])
+async def import_room_state(room_code: str, request: Request):
+    room = global_manager.get_room(checked_room_code(room_code))
+    room.load_state(await request.json())
+    return {"status": "imported", "room_code": room.room_code}
+
+@app.post("/internal/rooms/{room_code}/release", dependencies=[Depends(require_internal_caller)])
+async def release_room(room_code: str):
+    closed = await global_manager.release_room(checked_room_code(room_code))
+    return {"status": "released", "closed_connections": closed}
+
+# === Admin endpoints (per worker, blocked by app.supervisor and guarded like /internal) ===
+
+@app.get("/admin/memory/tracemalloc", dependencies=[Depends(require_internal_caller)])
+async def tracemalloc_snapshot_diff(seconds: float = 10.0, limit: int = 10):
+    """Allocations made and still alive over a `seconds` window, grouped by subsystem"""
+    seconds = min(max(seconds, 0.1), 60.0)
+    return await tracemalloc_diff(seconds, min(max(limit, 1), 50))
+
+@app.get("/admin/handlers", dependencies=[Depends(require_internal_caller)])
+async def get_handler_timings(room_code: Optional[str] = None, top: int = 10):
+    """Count, payload bytes and latency histogram per message type (process-wide, or one room)"""
+    return handler_timings.get_stats(room_code.upper() if room_code else None, min(max(top, 1), 100))
+
+@app.post("/admin/handlers/sampling", dependencies=[Depends(require_internal_caller)])
+async def set_handler_sampling(rate: float, reset: bool = False):
+    """Fraction of messages to time (0 switches the instrumentation off); reset clears the figures"""
+    handler_timings.set_rate(rate)
+    if reset:
+        handler_timings.reset()
+    return {"sample_rate": handler_timings.rate, "reset": reset}
+
+@app.get("/admin/loop/incidents", dependencies=[Depends(require_internal_caller)])
+async def get_loop_incidents(room_code: Optional[str] = None, limit: int = 20):
+    """Recent event-loop blocks with the loop thread's stack and the room/message type/agent running"""
+    return {
+        "loop_lag": loop_lag_monitor.get_stats(),
+        "incidents": loop_lag_monitor.get_incidents(room_code.upper() if room_code else None, min(max(limit, 1), 100))
     }
 
+@app.post("/admin/profile", dependencies=[Depends(require_internal_caller)])
+async def profile_event_loop(
+    seconds: float = 10.0,
+    interval: float = 0.005,
+    room_code: Optional[str] = None,
+    lines: bool = False,
+    format: str = "collapsed"
+):
+    """Sample the loop thread's stack for `seconds`; collapsed stacks (flame graph input) or JSON"""
+    profile = await sampling_profiler.profile(
+        max(seconds, 0.1), min(max(interval, 0.001), 1.0), room_code.upper() if room_code else None, lines
+    )
+    if profile is None:
+        return Response(status_code=409, content="A profile is already running\n", media_type="text/plain")
+    if format == "json":
+        return profile
+    return Response(collapsed_text(profile), media_type="text/plain", headers={
+        "X-Profile-Samples": str(profile["samples"]),
+        "X-Profile-Idle-Samples": str(profile["idle_samples"])
+    })
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
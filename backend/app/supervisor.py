@@ -0,0 +1,472 @@
+"""
+Sharded multi-process server (room affinity)
+
+Starts N uvicorn workers on loopback ports and a front proxy on the public
+port. Every room code is owned by exactly one worker (consistent hashing),
+so `/ws/{room_code}` upgrades and `/api/rooms/{room_code}/*` requests are
+piped to that worker and each room stays single-writer and in memory.
+Room-less routes (`/`, `/health`) are spread round-robin. `/metrics` merges
+every worker's metrics (labelled `worker`) with the supervisor's own. Worker-only
+routes (`/internal/*`, `/admin/*`) are never proxied (matched on the decoded,
+normalized path); workers only serve them with the X-Internal-Token the
+supervisor hands them (INTERNAL_TOKEN, or a random one per run, logged at
+startup). The supervisor's own `/_supervisor/*` API takes the same token.
+
+Adding a worker (POST /_supervisor/workers with the token) swaps in the new
+ring, copies the state of every room that moved to its new owner and closes
+the old sockets with 1012 so clients reconnect through the proxy.
+
+Usage (from backend/):
+    python -m app.supervisor --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, escape_label
+from services.internal_auth import INTERNAL_TOKEN_HEADER, header_value, internal_token, is_internal_caller
+from services.sharding import HashRing, normalize_path, room_code_from_path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MAX_HEADER_BYTES = 64 * 1024
+PIPE_CHUNK_BYTES = 64 * 1024
+
+
+class WorkerProcess:
+    def __init__(self, worker_id: str, port: int, internal_token: str, host: str = "127.0.0.1"):
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.internal_token = internal_token
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at: Optional[float] = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", self.host, "--port", str(self.port), "--log-level", "warning"
+            ],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "WORKER_ID": self.worker_id, "INTERNAL_TOKEN": self.internal_token}
+        )
+        self.started_at = time.time()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    async def wait_ready(self, timeout: float = 20.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise RuntimeError(f"Worker {self.worker_id} exited during startup")
+            try:
+                status, _ = await self.request("GET", "/health")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(0.2)
+        raise TimeoutError(f"Worker {self.worker_id} not ready after {timeout}s")
+
+    def stop(self):
+        if self.is_alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    async def request(self, method: str, path: str, body=None, parse_json: bool = True) -> Tuple[int, object]:
+        """http_request to this worker, authenticated for its /internal and /admin routes"""
+        return await http_request(
+            self.host, self.port, method, path, body, parse_json,
+            headers={INTERNAL_TOKEN_HEADER: self.internal_token}
+        )
+
+    def describe(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "port": self.port,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.is_alive()
+        }
+
+
+async def http_request(host: str, port: int, method: str, path: str, body=None, parse_json: bool = True,
+                       headers: Optional[Dict[str, str]] = None) -> Tuple[int, object]:
+    """Minimal one-shot HTTP/1.1 JSON request to a worker (parse_json=False returns the body text)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Connection: close\r\n"
+            "Content-Type: application/json\r\n"
+            f"{extra}"
+            f"Content-Length: {len(payload)}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+
+    header, _, content = raw.partition(b"\r\n\r\n")
+    status = int(header.split(b" ", 2)[1])
+    if not parse_json:
+        return status, content.decode("utf-8")
+    return status, json.loads(content) if content else None
+
+
+def merge_metrics(pages: Dict[str, str]) -> List[str]:
+    """
+    Merge Prometheus text pages from several workers: every sample gets a
+    `worker` label and samples of one family stay together under a single
+    HELP/TYPE header, as the format requires
+    """
+    families: Dict[str, Dict] = {}
+    for worker_id, page in pages.items():
+        worker_label = f'worker="{escape_label(worker_id)}"'
+        family = None
+        for line in page.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                name = line.split(" ", 3)[2]
+                family = families.setdefault(name, {"header": {}, "samples": []})
+                family["header"].setdefault(line[2:6], line)
+                continue
+            if not line or line.startswith("#") or family is None:
+                continue
+            name, _, value = line.rpartition(" ")
+            if "{" in name:
+                name = name[:-1] + "," + worker_label + "}"
+            else:
+                name = name + "{" + worker_label + "}"
+            family["samples"].append(f"{name} {value}")
+
+    lines = []
+    for family in families.values():
+        lines.extend(family["header"][key] for key in ("HELP", "TYPE") if key in family["header"])
+        lines.extend(family["samples"])
+    return lines
+
+
+def force_connection_close(head: bytes) -> bytes:
+    """Rewrite a request head so the connection carries one request (one routing decision)"""
+    lines = head[:-4].split(b"\r\n")
+    kept = [lines[0]] + [
+        line for line in lines[1:]
+        if line.split(b":", 1)[0].strip().lower() not in (b"connection", b"keep-alive")
+    ]
+    return b"\r\n".join(kept + [b"Connection: close"]) + b"\r\n\r\n"
+
+
+def is_upgrade_request(head: bytes) -> bool:
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"upgrade" and value.strip().lower() == b"websocket":
+            return True
+    return False
+
+
+class ShardSupervisor:
+    def __init__(
+        self,
+        workers: int = 2,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        base_port: int = 8100,
+        virtual_nodes: int = 128
+    ):
+        self.host = host
+        self.port = port
+        self.base_port = base_port
+        self.initial_workers = workers
+        self.internal_token = internal_token()
+
+        self.workers: Dict[str, WorkerProcess] = {}
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self._round_robin = itertools.count()
+        self._rebalance_lock = asyncio.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._monitor_task: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "proxied_requests": 0,
+            "proxied_websockets": 0,
+            "rebalances": 0,
+            "moved_rooms": 0,
+            "worker_restarts": 0
+        }
+
+    async def start(self):
+        spawned = [self._spawn_worker() for _ in range(self.initial_workers)]
+        await asyncio.gather(*(worker.wait_ready() for worker in spawned))
+        for worker in spawned:
+            self.ring.add_node(worker.worker_id)
+
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        self._monitor_task = asyncio.create_task(self._monitor_workers())
+        print(f"🧭 Supervisor listening on {self.host}:{self.port} with {len(self.workers)} workers")
+
+    async def serve_forever(self):
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:  # Windows
+                pass
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for worker in self.workers.values():
+            worker.stop()
+        print("🛑 Supervisor stopped")
+
+    def _spawn_worker(self) -> WorkerProcess:
+        index = len(self.workers)
+        worker = WorkerProcess(f"worker-{index}", self.base_port + index, self.internal_token)
+        worker.start()
+        self.workers[worker.worker_id] = worker
+        return worker
+
+    async def add_worker(self) -> Dict:
+        """Grow the ring by one worker and migrate the rooms it now owns"""
+        async with self._rebalance_lock:
+            worker = self._spawn_worker()
+            await worker.wait_ready()
+
+            previous_ring = self.ring
+            new_ring = previous_ring.copy()
+            new_ring.add_node(worker.worker_id)
+            self.ring = new_ring  # New connections route to the new owners from here on
+
+            moved = await self._migrate_rooms(previous_ring, new_ring)
+            self.metrics["rebalances"] += 1
+            self.metrics["moved_rooms"] += len(moved)
+            print(f"⚖️ Added {worker.worker_id}; moved {len(moved)} rooms")
+            return {"added": worker.describe(), "moved_rooms": moved}
+
+    async def _migrate_rooms(self, previous_ring: HashRing, new_ring: HashRing) -> List[str]:
+        moved = []
+        for worker_id in previous_ring.nodes:
+            source = self.workers[worker_id]
+            try:
+                status, listing = await source.request("GET", "/internal/rooms")
+            except OSError as e:
+                print(f"❌ Could not list rooms on {worker_id}: {e}")
+                continue
+            if status != 200:
+                print(f"❌ Could not list rooms on {worker_id}: HTTP {status}")
+                continue
+
+            for room_code in listing.get("rooms", []):
+                owner_id = new_ring.node_for(room_code)
+                if owner_id == worker_id:
+                    continue
+                target = self.workers[owner_id]
+                try:
+                    status, state = await source.request("GET", f"/internal/rooms/{room_code}/state")
+                    if status == 200:
+                        # load_state merges, so clients that already reconnected keep their events
+                        await target.request("PUT", f"/internal/rooms/{room_code}/state", state)
+                    await source.request("POST", f"/internal/rooms/{room_code}/release")
+                    moved.append(room_code)
+                except OSError as e:
+                    print(f"❌ Failed to move room {room_code} from {worker_id} to {owner_id}: {e}")
+        return moved
+
+    async def _monitor_workers(self):
+        """Restart crashed workers on the same port (their rooms start empty)"""
+        while True:
+            try:
+                await asyncio.sleep(2)
+                for worker in list(self.workers.values()):
+                    if not worker.is_alive():
+                        print(f"♻️ Restarting crashed {worker.worker_id}")
+                        worker.start()
+                        self.metrics["worker_restarts"] += 1
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in worker monitor: {e}")
+
+    def owner_of(self, room_code: str) -> WorkerProcess:
+        return self.workers[self.ring.node_for(room_code.upper())]
+
+    # === Proxy ===
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        try:
+            method, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+        except ValueError:
+            await self._respond(writer, 400, {"error": "Bad request"})
+            return
+        path = normalize_path(target.split("?", 1)[0])
+
+        if path.startswith("/_supervisor/"):
+            await self._handle_admin(method, path, header_value(head, INTERNAL_TOKEN_HEADER), writer)
+            return
+        if path == "/metrics":
+            await self._respond_text(writer, 200, await self.collect_metrics(), METRICS_CONTENT_TYPE)
+            return
+        if path in ("/internal", "/admin") or path.startswith(("/internal/", "/admin/")):
+            await self._respond(writer, 404, {"detail": "Not Found"})
+            return
+
+        room_code = room_code_from_path(path)
+        if room_code:
+            worker = self.owner_of(room_code)
+        else:
+            nodes = self.ring.nodes
+            worker = self.workers[nodes[next(self._round_robin) % len(nodes)]]
+
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(worker.host, worker.port)
+        except OSError:
+            await self._respond(writer, 502, {"error": f"Worker {worker.worker_id} unavailable"})
+            return
+
+        if is_upgrade_request(head):
+            self.metrics["proxied_websockets"] += 1
+        else:
+            head = force_connection_close(head)
+            self.metrics["proxied_requests"] += 1
+
+        upstream_writer.write(head)
+        pipes = [
+            asyncio.create_task(self._pipe(reader, upstream_writer)),
+            asyncio.create_task(self._pipe(upstream_reader, writer))
+        ]
+        await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        for task in pipes:
+            task.cancel()
+        upstream_writer.close()
+        writer.close()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                chunk = await reader.read(PIPE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def _handle_admin(self, method: str, path: str, token: Optional[str], writer: asyncio.StreamWriter):
+        if not is_internal_caller(self.internal_token, token):
+            await self._respond(writer, 403, {"error": "Forbidden"})
+            return
+
+        if path == "/_supervisor/workers" and method == "GET":
+            await self._respond(writer, 200, {
+                "workers": [worker.describe() for worker in self.workers.values()],
+                "ring": self.ring.nodes,
+                "virtual_nodes": self.ring.virtual_nodes,
+                "metrics": self.metrics
+            })
+        elif path == "/_supervisor/workers" and method == "POST":
+            await self._respond(writer, 200, await self.add_worker())
+        elif path.startswith("/_supervisor/route/") and method == "GET":
+            room_code = path.rsplit("/", 1)[-1].upper()
+            await self._respond(writer, 200, {"room_code": room_code, **self.owner_of(room_code).describe()})
+        else:
+            await self._respond(writer, 404, {"detail": "Not Found"})
+
+    async def collect_metrics(self) -> str:
+        """Every live worker's /metrics, merged, plus the supervisor's counters"""
+        workers = [worker for worker in self.workers.values() if worker.is_alive()]
+        responses = await asyncio.gather(
+            *(worker.request("GET", "/metrics", parse_json=False) for worker in workers),
+            return_exceptions=True
+        )
+        pages = {
+            worker.worker_id: response[1]
+            for worker, response in zip(workers, responses)
+            if not isinstance(response, BaseException) and response[0] == 200
+        }
+
+        lines = merge_metrics(pages)
+        lines += [
+            "# HELP feedback_supervisor_workers Workers by state (ring = receiving rooms, scraped = answered /metrics)",
+            "# TYPE feedback_supervisor_workers gauge",
+            f'feedback_supervisor_workers{{state="ring"}} {len(self.ring.nodes)}',
+            f'feedback_supervisor_workers{{state="scraped"}} {len(pages)}'
+        ]
+        for key, value in self.metrics.items():
+            lines += [
+                f"# HELP feedback_supervisor_{key}_total Supervisor {key.replace('_', ' ')}",
+                f"# TYPE feedback_supervisor_{key}_total counter",
+                f"feedback_supervisor_{key}_total {value}"
+            ]
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    async def _respond(cls, writer: asyncio.StreamWriter, status: int, body: Dict):
+        await cls._respond_text(writer, status, json.dumps(body), "application/json")
+
+    @staticmethod
+    async def _respond_text(writer: asyncio.StreamWriter, status: int, text: str, content_type: str):
+        payload = text.encode("utf-8")
+        reasons = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 502: "Bad Gateway"}
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--base-port", type=int, default=8100, help="Workers listen on base-port, base-port+1, ...")
+    parser.add_argument("--virtual-nodes", type=int, default=128)
+    args = parser.parse_args()
+
+    supervisor = ShardSupervisor(args.workers, args.host, args.port, args.base_port, args.virtual_nodes)
+    asyncio.run(supervisor.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+AI agent microbenchmarks: the CPU paths that run on every analysis pass
+
+Times, per fixture size (N reactions and N questions):
+- pacing.analyze          PacingAgent.analyze (rules, velocity, trend, alerts)
+- qa.analyze              QAGrouperAgent.analyze on the local path (filter,
+                          fast_local clustering, enrichment, insights)
+- qa.fast_local           QAGrouperAgent._fast_local_clustering alone
+- qa.enrich               QAGrouperAgent._enrich_and_score_themes alone
+- sentiment.analyze       SentimentAgent.analyze (messages, reactions, recommendations)
+- gemini.keyword_sentiment / gemini.cluster_fallback / gemini.rule_pacing /
+  gemini.extract_json     the GeminiService fallbacks used when the API fails
+
+The model is never called: GEMINI_OFFLINE=1 is set, the pacing and sentiment
+AI cooldowns are kept active and Q&A clustering stays local, so only the
+agents' own work is measured (on a ref without the offline stand-in the
+model is swapped for one that raises, so nothing can reach the network). Each case is looped until a run takes
+>= --min-time seconds (like timeit), repeated --repeat times; the median and
+best time per call are reported; comparisons use the best time, which is
+the least sensitive to other load on the machine.
+
+Fixtures:
+- recorded (default): benchmarks/fixtures/DEMO-1792376773.json, a 90s
+  session of 30 scripted audience sockets taken through a live server and
+  its event archive. --record ROOM [--session ID] converts another archived
+  session (ARCHIVE_DIR) into benchmarks/fixtures/ROOM-SESSION.json, and
+  --fixture PATH runs on it. A recording shorter than a size is repeated;
+  upvotes are not linked to questions in the archive, so they start at 0
+- synthetic (--synthetic, or when no recorded fixture is present): seeded
+  reactions and questions mixing every topic, noise and emotion the agents
+  look for
+
+Comparing commits:
+- --save results.json stores the timings with the commit they ran on
+- --compare results.json prints the ratio to a saved run and exits with
+  status 1 if any case is more than --threshold times slower
+- --baseline-ref REF checks REF out in a temporary git worktree, runs this
+  script against it and compares. Older layouts are handled (agent state on
+  the agent instead of a per-room context, no offline stand-in); a case
+  whose method does not exist on REF is skipped and shows as "new"
+
+Usage (from backend/):
+    python benchmarks/agent_benchmark.py [--sizes 10 100 1000 10000] [--cases qa sentiment]
+        [--fixture PATH | --synthetic | --record ROOM [--session ID]] [--repeat 5] [--min-time 0.2]
+        [--save results.json] [--compare baseline.json | --baseline-ref main] [--threshold 1.25]
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+DEFAULT_FIXTURE = FIXTURE_DIR / "DEMO-1792376773.json"
+
+REACTION_TYPES = ["speed_up", "slow_down", "show_code", "im_lost"]
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+QUESTION_TEMPLATES = [
+    "How do I refresh the JWT token when the session expires?",
+    "Getting a 401 error from the login endpoint, what am I missing?",
+    "Can you show how the REST api handles webhook retries?",
+    "Which database schema works best with postgres and the orm?",
+    "Is there a free tier or does the pricing plan need a credit card?",
+    "The deploy to kubernetes keeps failing, is docker required?",
+    "Why is the dashboard so slow, is there a cache for the metrics?",
+    "I'm lost, can you explain the setup and install steps again?",
+    "What testing framework do you use, jest or pytest with mocks?",
+    "Could you clarify how the react component updates the form state?",
+    "This is awesome, really excited to try the new analytics export!",
+    "I'm confused, the config example in the docs does not match the code",
+    "Help! The server crashed with an exception and a huge stacktrace",
+    "How does the latency compare when scaling to more cpu cores?",
+    "thanks",
+    "lol nice",
+]
+
+
+def synthetic_fixture(seed: int = 7) -> Dict:
+    """Recipe for a seeded session; expanded to any size by build_inputs"""
+    return {"source": f"synthetic (seed {seed})", "seed": seed, "reactions": None, "questions": None}
+
+
+def load_fixture(path: Path) -> Dict:
+    with open(path) as f:
+        fixture = json.load(f)
+    if not fixture.get("reactions") and not fixture.get("questions"):
+        raise SystemExit(f"❌ {path} has no reactions or questions")
+    fixture.setdefault("source", path.name)
+    return fixture
+
+
+def record_fixture(room_code: str, session_id: Optional[str], archive_dir: str) -> Path:
+    """Copy one archived session's reactions and question texts into a fixture file"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from services.event_archive import EventArchive
+
+    archive = EventArchive(archive_dir)
+    session = archive.find_session(room_code, session_id)
+    if session is None:
+        raise SystemExit(f"❌ No archived session for room {room_code} under {archive_dir}")
+
+    reactions = [[timestamp, kind] for timestamp, kind in session.events(REACTION_TYPES)]
+    questions = [[q["timestamp"], q["text"]] for q in session.strings_in_range("question", 0, float("inf"), limit=10 ** 9)]
+    archive.close()
+
+    if not reactions and not questions:
+        raise SystemExit(f"❌ Session {room_code}/{session.session_id} has no reactions or questions")
+
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    path = FIXTURE_DIR / f"{room_code}-{session.session_id}.json"
+    with open(path, "w") as f:
+        json.dump({
+            "source": f"archive {room_code}/{session.session_id}",
+            "recorded_at": datetime.now().isoformat(),
+            "reactions": reactions,
+            "questions": questions
+        }, f, separators=(",", ":"))
+    print(f"✅ Recorded {len(reactions)} reactions and {len(questions)} questions to {path}")
+    return path
+
+
+def _tile(events: List[List], size: int) -> List[List]:
+    """The last `size` events, the recording repeated back in time if it is shorter"""
+    span = (events[-1][0] - events[0][0]) + 1.0
+    tiled = list(events)
+    shift = 0.0
+    while len(tiled) < size:
+        shift += span
+        tiled[:0] = [[timestamp - shift, value] for timestamp, value in events]
+    return tiled[-size:]
+
+
+def build_inputs(fixture: Dict, size: int, room_code: str = "BENCH1") -> Dict:
+    """Wire-shaped reaction and question dicts, as RoomManager hands them to the agents"""
+    now = time.time()
+    if fixture.get("reactions") is None:
+        rng = random.Random(f"{fixture['seed']}:{size}")
+        reaction_events = sorted(
+            [now - rng.uniform(0, 60), rng.choices(REACTION_TYPES, weights=[3, 2, 2, 1])[0]] for _ in range(size)
+        )
+        question_events = [
+            [now - (size - i) * 2.0, rng.choice(QUESTION_TEMPLATES) + ("" if rng.random() < 0.5 else f" (#{i})")]
+            for i in range(size)
+        ]
+        upvotes = [rng.randrange(6) for _ in range(size)]
+    else:
+        # Recorded sessions are shifted so their last event happened just now
+        reaction_events = _tile(fixture["reactions"], size) if fixture["reactions"] else []
+        question_events = _tile(fixture["questions"], size) if fixture["questions"] else []
+        last = max([e[0] for e in reaction_events[-1:] + question_events[-1:]])
+        reaction_events = [[timestamp - last + now, kind] for timestamp, kind in reaction_events]
+        question_events = [[timestamp - last + now, text] for timestamp, text in question_events]
+        upvotes = [0] * len(question_events)
+
+    reactions = [
+        {
+            "type": kind,
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "user_id": f"anon-{timestamp}",
+            "room_code": room_code
+        }
+        for timestamp, kind in reaction_events
+    ]
+    questions = [
+        {
+            "id": f"q-{room_code}-{i}-{timestamp}",
+            "text": text,
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "user_id": f"anon-{timestamp}",
+            "upvotes": votes,
+            "upvoted_by": [f"user_{j}" for j in range(votes)],
+            "room_code": room_code
+        }
+        for i, ((timestamp, text), votes) in enumerate(zip(question_events, upvotes))
+    ]
+    counts = {kind: 0 for kind in REACTION_TYPES}
+    for reaction in reactions:
+        counts[reaction["type"]] += 1
+    return {"reactions": reactions, "questions": questions, "counts": counts}
+
+
+class _UnreachableModel:
+    """Stands in for the live model on refs without GEMINI_OFFLINE: a call that slips through fails fast"""
+
+    def generate_content(self, *args, **kwargs):
+        raise RuntimeError("agent_benchmark never calls the model")
+
+
+def load_targets(backend_dir: Path) -> SimpleNamespace:
+    """Import the agents and the Gemini service from `backend_dir` (a checkout of any commit)"""
+    os.environ["GEMINI_OFFLINE"] = "1"
+    os.environ["GEMINI_OFFLINE_LATENCY_MS"] = "0"
+    os.environ.setdefault("GEMINI_API_KEY", "agent-benchmark")  # Older refs refuse to import without one
+    sys.path.insert(0, str(backend_dir))
+    with contextlib.redirect_stdout(io.StringIO()):
+        modules = {name: importlib.import_module(name) for name in (
+            "agents.pacing_agent", "agents.qa_grouper_agent", "agents.sentiment_agent", "services.gemini_service"
+        )}
+    gemini_module = modules["services.gemini_service"]
+    gemini = gemini_module.gemini_service
+    if not (hasattr(gemini_module, "OfflineModel") and isinstance(gemini.model, gemini_module.OfflineModel)):
+        gemini.model = _UnreachableModel()
+    return SimpleNamespace(
+        pacing=modules["agents.pacing_agent"],
+        qa=modules["agents.qa_grouper_agent"],
+        sentiment=modules["agents.sentiment_agent"],
+        gemini=gemini
+    )
+
+
+def model_reply(texts: List[str]) -> str:
+    """
+    A fenced themes reply shaped like the model's, for gemini.extract_json
+    Built here rather than by the ref's model so every commit parses the same text
+    """
+    groups: Dict[str, List[str]] = {}
+    for text in texts[-15:]:
+        words = [word for word in text.lower().replace("?", " ").split() if len(word) >= 4]
+        groups.setdefault(max(words, key=len) if words else "misc", []).append(text)
+    themes = [
+        {"name": f"{keyword.capitalize()} follow-ups", "count": len(items), "examples": items[:2],
+         "priority": "high" if len(items) > 2 else "medium", "reasoning": "Grouped by keyword", "category": "other"}
+        for keyword, items in sorted(groups.items(), key=lambda item: -len(item[1]))[:5]
+    ]
+    return "```json\n" + json.dumps({"themes": themes, "total_questions": len(texts[-15:]), "quality_score": 70}) + "\n```"
+
+
+def _optional_context(module, name: str):
+    """A per-room context from `module`, or None on refs that keep agent state on the agent"""
+    context_class = getattr(module, name, None)
+    return context_class() if context_class else None
+
+
+async def make_cases(targets: SimpleNamespace, inputs: Dict) -> Dict[str, Callable]:
+    """name -> zero-argument callable (sync or returning a coroutine) timing one call"""
+    reactions, questions, counts = inputs["reactions"], inputs["questions"], inputs["counts"]
+    texts = [q["text"] for q in questions]
+    cooldown_until = datetime.now() + timedelta(days=1)  # Keeps the AI cooldowns active
+
+    # Refs before per-room contexts keep this state on the agent and take analyze(data)
+    pacing_agent = targets.pacing.PacingAgent()
+    pacing_context = _optional_context(targets.pacing, "PacingContext")
+    pacing_state = pacing_context or pacing_agent
+    pacing_args = (pacing_context,) if pacing_context else ()
+    pacing_data = {"reaction_counts": counts, "recent_reactions": reactions, "time_window": 60}
+
+    async def pacing_analyze():
+        pacing_state.last_ai_enhancement = cooldown_until
+        return await pacing_agent.analyze(pacing_data, *pacing_args)
+
+    qa_agent = targets.qa.QAGrouperAgent()
+    qa_agent.min_questions_for_gemini = sys.maxsize  # Local clustering at every size
+    qa_context = _optional_context(targets.qa, "QAGrouperContext")
+    qa_args = (qa_context,) if qa_context else ()
+    qa_data = {"questions": questions}
+    filtered = qa_agent._advanced_filter(questions)
+    clustered = await qa_agent._fast_local_clustering(filtered)
+
+    sentiment_agent = targets.sentiment.SentimentAgent()
+    sentiment_context = _optional_context(targets.sentiment, "SentimentContext")
+    sentiment_state = sentiment_context or sentiment_agent
+    sentiment_args = (sentiment_context,) if sentiment_context else ()
+    sentiment_data = {"questions": questions, "reaction_counts": counts, "recent_reactions": reactions}
+
+    async def sentiment_analyze():
+        sentiment_state.last_gemini_call = cooldown_until
+        return await sentiment_agent.analyze(sentiment_data, *sentiment_args)
+
+    gemini = targets.gemini
+    joined_text = " | ".join(texts)
+    reply = model_reply(texts)
+
+    cases = {
+        "pacing.analyze": pacing_analyze,
+        "qa.analyze": lambda: qa_agent.analyze(qa_data, *qa_args),
+        "qa.fast_local": lambda: qa_agent._fast_local_clustering(filtered),
+        "qa.enrich": lambda: qa_agent._enrich_and_score_themes(*qa_args, dict(clustered), filtered),
+        "sentiment.analyze": sentiment_analyze,
+        "gemini.keyword_sentiment": lambda: gemini._keyword_sentiment_analysis(joined_text),
+        "gemini.cluster_fallback": lambda: gemini._semantic_clustering_fallback(texts),
+        "gemini.rule_pacing": lambda: gemini._rule_based_pacing(counts, sum(counts.values())),
+        "gemini.extract_json": lambda: gemini._extract_json_from_response(reply),
+    }
+    # Private helpers come and go between commits: time only those this ref has
+    required = {
+        "qa.enrich": (qa_agent, "_enrich_and_score_themes"),
+        "gemini.keyword_sentiment": (gemini, "_keyword_sentiment_analysis"),
+        "gemini.cluster_fallback": (gemini, "_semantic_clustering_fallback"),
+        "gemini.rule_pacing": (gemini, "_rule_based_pacing"),
+        "gemini.extract_json": (gemini, "_extract_json_from_response"),
+    }
+    return {name: fn for name, fn in cases.items() if name not in required or hasattr(*required[name])}
+
+
+async def _loop(fn: Callable, number: int) -> float:
+    gc.disable()  # Like timeit: a collection landing in one run skews it
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            result = fn()
+            if asyncio.iscoroutine(result):
+                await result
+        return time.perf_counter() - started
+    finally:
+        gc.enable()
+
+
+async def measure(fn: Callable, repeat: int, min_time: float) -> Dict:
+    number = 1
+    while True:
+        elapsed = await _loop(fn, number)
+        if elapsed >= min_time or number >= 10 ** 6:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    runs = [elapsed / number] + [await _loop(fn, number) / number for _ in range(repeat - 1)]
+    return {
+        "median_us": round(statistics.median(runs) * 1e6, 2),
+        "min_us": round(min(runs) * 1e6, 2),
+        "loops": number
+    }
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> Dict:
+    targets = load_targets(Path(args.backend_dir))
+    fixture = load_fixture(Path(args.fixture)) if args.fixture else synthetic_fixture(args.seed)
+    results: Dict[str, Dict] = {}
+
+    print(f"Fixture: {fixture['source']}")
+    print(f"{'case':<26} {'size':>6} {'median µs':>12} {'best µs':>12} {'loops':>8}")
+    print("-" * 68)
+    for size in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cases = await make_cases(targets, build_inputs(fixture, size))
+        for name, fn in cases.items():
+            if args.cases and not any(name.startswith(prefix) for prefix in args.cases):
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):  # Agents log every analysis
+                timing = await measure(fn, args.repeat, args.min_time)
+            results[f"{name}[{size}]"] = timing
+            print(f"{name:<26} {size:>6} {timing['median_us']:>12.1f} {timing['min_us']:>12.1f} {timing['loops']:>8}")
+
+    backend_dir = Path(args.backend_dir).resolve()
+    return {
+        "commit": _git("-C", str(backend_dir), "rev-parse", "--short", "HEAD") or "unknown",
+        "dirty": bool(_git("-C", str(backend_dir), "status", "--porcelain", ".")),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "fixture": fixture["source"],
+        "timestamp": datetime.now().isoformat(),
+        "results": results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print current/baseline ratios; True if nothing regressed past `threshold`"""
+    print(f"\nCompared with {baseline['commit']} ({baseline['fixture']}), threshold {threshold:.2f}x")
+    if baseline.get("fixture") != current.get("fixture"):
+        print("⚠️ Different fixtures: ratios are only indicative")
+    print(f"{'case (best µs)':<34} {'baseline':>12} {'now':>12} {'ratio':>7}")
+    print("-" * 68)
+    regressions = []
+    for key, timing in current["results"].items():
+        before = baseline["results"].get(key)
+        if not before:
+            print(f"{key:<34} {'-':>12} {timing['min_us']:>12.1f} {'new':>7}")
+            continue
+        ratio = timing["min_us"] / max(before["min_us"], 1e-3)
+        flag = " ❌" if ratio > threshold else (" ✅" if ratio < 1 / threshold else "")
+        print(f"{key:<34} {before['min_us']:>12.1f} {timing['min_us']:>12.1f} {ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(key)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {threshold:.2f}x: {', '.join(regressions)}")
+        return False
+    print("\n✅ No regressions")
+    return True
+
+
+def run_baseline_ref(args) -> Dict:
+    """Run this script in a throwaway worktree of `args.baseline_ref`"""
+    repo = _git("rev-parse", "--show-toplevel")
+    if not repo:
+        raise SystemExit("❌ --baseline-ref needs a git checkout")
+    backend_subdir = BACKEND_DIR.relative_to(repo)
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "baseline"
+        _git("worktree", "add", "--detach", str(worktree), args.baseline_ref)
+        if not worktree.exists():
+            raise SystemExit(f"❌ Could not check out {args.baseline_ref}")
+        try:
+            results_path = Path(tmp) / "baseline.json"
+            command = [
+                sys.executable, str(Path(__file__).resolve()),
+                "--backend-dir", str(worktree / backend_subdir),
+                "--save", str(results_path),
+                "--repeat", str(args.repeat), "--min-time", str(args.min_time), "--seed", str(args.seed),
+                "--sizes", *map(str, args.sizes)
+            ]
+            if args.cases:
+                command += ["--cases", *args.cases]
+            command += ["--fixture", str(Path(args.fixture).resolve())] if args.fixture else ["--synthetic"]
+            print(f"⏱️ Baseline run on {args.baseline_ref}...")
+            subprocess.run(command, check=True)
+            with open(results_path) as f:
+                return json.load(f)
+        finally:
+            _git("worktree", "remove", "--force", str(worktree))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", help="Only cases starting with these prefixes (e.g. qa gemini.rule)")
+    parser.add_argument("--fixture", help=f"Recorded fixture file (default: {DEFAULT_FIXTURE.name})")
+    parser.add_argument("--synthetic", action="store_true", help="Use the seeded synthetic fixture instead")
+    parser.add_argument("--record", metavar="ROOM", help="Record a fixture from the event archive and exit")
+    parser.add_argument("--session", help="Archive session id for --record (default: latest)")
+    parser.add_argument("--archive-dir", default=os.getenv("ARCHIVE_DIR", str(BACKEND_DIR / "archive")))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed run")
+    parser.add_argument("--save", help="Write results (with the commit) to this JSON file")
+    parser.add_argument("--compare", help="Saved results to compare against")
+    parser.add_argument("--baseline-ref", help="Git ref to benchmark in a worktree and compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    parser.add_argument("--backend-dir", default=str(BACKEND_DIR), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(args.record, args.session, args.archive_dir)
+        return
+    if args.synthetic:
+        args.fixture = None
+    elif not args.fixture and DEFAULT_FIXTURE.exists():
+        args.fixture = str(DEFAULT_FIXTURE)
+
+    baseline = run_baseline_ref(args) if args.baseline_ref else None
+    current = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Saved {len(current['results'])} timings for {current['commit']} to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if baseline and not compare(current, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
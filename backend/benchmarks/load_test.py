@@ -0,0 +1,397 @@
+"""
+WebSocket load harness: simulated audiences against the real server
+
+Opens `--rooms` rooms with `--audience` audience clients and `--presenters`
+presenters each. Audience clients send a scripted mix of reactions, questions,
+upvotes and poll votes at a Poisson rate; presenters subscribe to stats deltas
+and open a poll every `--poll-every` seconds. Reported:
+- broadcast delivery latency p50/p90/p99: server ingest timestamp of each
+  reaction/question frame to its arrival at an observing client (clocks must
+  be shared, i.e. the server runs on this machine)
+- messages per second sent and delivered
+- server CPU and resident memory per connection (from /proc, Linux)
+
+Only presenters and an `--observe` fraction of the audience decode frames;
+the others just count them, so one harness process can drive thousands of
+sockets. With --server spawn (default) or inprocess the server runs with the
+offline LLM stand-in (GEMINI_OFFLINE=1, see services/gemini_service.py) and
+without snapshots or the event archive; inprocess numbers include the clients.
+
+Usage (from backend/):
+    python benchmarks/load_test.py [--rooms 10] [--audience 100] [--presenters 1] [--duration 30]
+        [--rate 0.5] [--mix reaction=0.85,question=0.05,upvote=0.07,vote=0.03]
+        [--server spawn|inprocess|ws://host:port] [--server-pid PID] [--json results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from services.records import REACTION_TYPES
+
+QUESTION_TEMPLATES = (
+    "How does the cache invalidation work in step {n}?",
+    "Can you show the code for the auth middleware again?",
+    "Why is the connection pool limited to {n} sockets?",
+    "What happens when the JWT expires mid-request?",
+    "Is there a recording of the deployment part?",
+    "How would this scale to {n} thousand users?",
+)
+
+SERVER_ENV = {
+    "GEMINI_OFFLINE": "1",
+    "SNAPSHOT_DIR": "",
+    "ARCHIVE_DIR": "",
+}
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def proc_sample(pid: Optional[int]) -> Optional[Dict[str, float]]:
+    """CPU seconds and RSS bytes of a process (None off Linux or without a pid)"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"),
+        "rss_bytes": rss_kb * 1024
+    }
+
+
+class RoomScript:
+    """What the clients of one room know: recent question ids and the open poll"""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.question_ids = deque(maxlen=50)
+        self.poll_id: Optional[str] = None
+
+
+class Stats:
+    def __init__(self):
+        self.sent = Counter()
+        self.received_frames = 0
+        self.received = Counter()
+        self.latencies: List[float] = []
+        self.closed_by_server = Counter()
+        self.connect_errors = 0
+
+
+class SimClient:
+    def __init__(self, base_url: str, room: RoomScript, role: str, index: int, observe: bool, stats: Stats):
+        self.url = f"{base_url}/ws/{room.code}?role={role}"
+        self.room = room
+        self.role = role
+        self.user_id = f"load-{room.code}-{role}-{index}"
+        self.observe = observe or role == "presenter"
+        self.stats = stats
+        self.ws = None
+        self.measuring = False
+        self._tasks: List[asyncio.Task] = []
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_size=None, ping_interval=None, open_timeout=60)
+        self._tasks.append(asyncio.create_task(self._read()))
+        if self.role == "presenter":
+            await self.ws.send(json.dumps({"type": "subscribe"}))
+
+    async def _read(self):
+        stats = self.stats
+        try:
+            async for frame in self.ws:
+                now = time.time()
+                if not self.measuring:
+                    continue
+                stats.received_frames += 1
+                if not self.observe:
+                    continue
+
+                message = json.loads(frame)
+                message_type = message.get("type")
+                stats.received[message_type] += 1
+                data = message.get("data")
+                if message_type in ("reaction", "question") and data and data.get("timestamp"):
+                    stats.latencies.append(now - datetime.fromisoformat(data["timestamp"]).timestamp())
+                if message_type == "question" and data:
+                    self.room.question_ids.append(data["id"])
+                elif message_type == "poll_created" and data:
+                    self.room.poll_id = data["id"]
+        except ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code != 1000:
+                stats.closed_by_server[e.rcvd.code] += 1
+
+    def start(self, args, stop: asyncio.Event):
+        if self.role == "presenter":
+            self._tasks.append(asyncio.create_task(self._present(args, stop)))
+        else:
+            self._tasks.append(asyncio.create_task(self._audience(args, stop)))
+
+    async def _send(self, message: Dict):
+        try:
+            await self.ws.send(json.dumps(message))
+            self.stats.sent[message["type"]] += 1
+        except ConnectionClosed:
+            pass
+
+    async def _present(self, args, stop: asyncio.Event):
+        await asyncio.sleep(random.uniform(0, args.poll_every))
+        while not stop.is_set():
+            await self._send({"type": "create_poll", "text": "Should we do a live demo?", "duration": args.poll_every})
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), args.poll_every)
+
+    async def _audience(self, args, stop: asyncio.Event):
+        kinds, weights = zip(*args.mix.items())
+        sequence = 0
+        while not stop.is_set():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), random.expovariate(args.rate))
+                return
+            sequence += 1
+            kind = random.choices(kinds, weights)[0]
+            if kind == "reaction":
+                await self._send({"type": "reaction", "reaction": random.choice(REACTION_TYPES), "user_id": self.user_id})
+            elif kind == "question":
+                text = random.choice(QUESTION_TEMPLATES).format(n=sequence)
+                await self._send({"type": "question", "text": text, "user_id": self.user_id})
+            elif kind == "upvote" and self.room.question_ids:
+                question_id = random.choice(self.room.question_ids)
+                await self._send({"type": "upvote_question", "question_id": question_id, "user_id": self.user_id})
+            elif kind == "vote" and self.room.poll_id:
+                vote = random.choice(("yes", "no"))
+                await self._send({"type": "vote_poll", "poll_id": self.room.poll_id, "user_id": self.user_id, "vote": vote})
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self.ws:
+            with contextlib.suppress(Exception):
+                await self.ws.close()
+
+
+async def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server did not start listening on {host}:{port}")
+
+
+@contextlib.asynccontextmanager
+async def running_server(args):
+    """Yields (ws base url, server pid or None)"""
+    if args.server.startswith(("ws://", "wss://")):
+        yield args.server.rstrip("/"), args.server_pid
+        return
+
+    host, port = "127.0.0.1", args.port
+    if args.server == "spawn":
+        env = {**os.environ, **SERVER_ENV}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            await wait_for_port(host, port)
+            yield f"ws://{host}:{port}", process.pid
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        return
+
+    os.environ.update(SERVER_ENV)
+    import uvicorn
+    with contextlib.redirect_stdout(io.StringIO()):  # Per-connection log lines
+        from app.main import app
+        server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        task = asyncio.create_task(server.serve())
+        await wait_for_port(host, port)
+        try:
+            yield f"ws://{host}:{port}", os.getpid()
+        finally:
+            server.should_exit = True
+            await task
+
+
+async def run(args) -> Dict:
+    stats = Stats()
+    rooms = [RoomScript(f"LOAD{i:02d}") for i in range(args.rooms)]
+
+    async with running_server(args) as (base_url, pid):
+        baseline = proc_sample(pid)
+
+        clients = []
+        for room in rooms:
+            clients += [SimClient(base_url, room, "presenter", i, True, stats) for i in range(args.presenters)]
+            clients += [
+                SimClient(base_url, room, "audience", i, random.random() < args.observe, stats)
+                for i in range(args.audience)
+            ]
+
+        gate = asyncio.Semaphore(args.connect_concurrency)
+
+        async def connect(client):
+            async with gate:
+                try:
+                    await client.connect()
+                except Exception:
+                    stats.connect_errors += 1
+                    client.ws = None
+
+        connect_started = time.perf_counter()
+        await asyncio.gather(*(connect(client) for client in clients))
+        connect_seconds = time.perf_counter() - connect_started
+        clients = [client for client in clients if client.ws is not None]
+        await asyncio.sleep(1.0)
+        connected = proc_sample(pid)
+
+        stop = asyncio.Event()
+        for client in clients:
+            client.measuring = True
+            client.start(args, stop)
+        started = proc_sample(pid)
+        harness_started = time.process_time()
+        wall_started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - wall_started
+        harness_cpu = time.process_time() - harness_started
+        ended = proc_sample(pid)
+        await asyncio.sleep(1.0)  # Let in-flight broadcasts land
+        for client in clients:
+            client.measuring = False
+
+        await asyncio.gather(*(client.close() for client in clients))
+
+    connections = len(clients)
+    result = {
+        "rooms": args.rooms,
+        "connections": connections,
+        "connect_errors": stats.connect_errors,
+        "connect_seconds": round(connect_seconds, 2),
+        "duration_seconds": round(elapsed, 2),
+        "sent": dict(stats.sent),
+        "sent_per_second": round(sum(stats.sent.values()) / elapsed, 1),
+        "delivered_per_second": round(stats.received_frames / elapsed, 1),
+        "received_by_type": dict(stats.received),
+        "latency_samples": len(stats.latencies),
+        "latency_ms": {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ("p50", percentile(stats.latencies, 0.50)),
+                ("p90", percentile(stats.latencies, 0.90)),
+                ("p99", percentile(stats.latencies, 0.99)),
+                ("max", max(stats.latencies) if stats.latencies else None)
+            )
+        },
+        "closed_by_server": dict(stats.closed_by_server),
+        "harness_cpu_percent": round(harness_cpu / elapsed * 100, 1),
+        "server": None
+    }
+    if baseline and connected and started and ended and connections:
+        cpu = ended["cpu_seconds"] - started["cpu_seconds"]
+        result["server"] = {
+            "includes_clients": args.server == "inprocess",
+            "cpu_percent": round(cpu / elapsed * 100, 1),
+            "cpu_ms_per_connection_second": round(cpu * 1000 / (connections * elapsed), 3),
+            "rss_baseline_mb": round(baseline["rss_bytes"] / 2**20, 1),
+            "rss_end_mb": round(ended["rss_bytes"] / 2**20, 1),
+            "rss_kb_per_connection": round((connected["rss_bytes"] - baseline["rss_bytes"]) / 1024 / connections, 1)
+        }
+    return result
+
+
+def print_report(result: Dict):
+    print(f"\n{result['connections']} connections in {result['rooms']} rooms "
+          f"({result['connect_errors']} failed, connected in {result['connect_seconds']}s), "
+          f"{result['duration_seconds']}s measured")
+    print(f"  sent        {result['sent_per_second']:>10} msg/s   {result['sent']}")
+    print(f"  delivered   {result['delivered_per_second']:>10} msg/s")
+    latency = result["latency_ms"]
+    print(f"  latency ms  p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']} "
+          f"({result['latency_samples']} samples)")
+    if result["harness_cpu_percent"] > 80:
+        print(f"  ⚠️ harness CPU {result['harness_cpu_percent']}%: latencies include client-side queueing, "
+              f"lower --observe or split clients across processes")
+    if result["closed_by_server"]:
+        print(f"  closed by server (code: count) {result['closed_by_server']}")
+    server = result["server"]
+    if server:
+        note = " (incl. harness)" if server["includes_clients"] else ""
+        print(f"  server CPU  {server['cpu_percent']}%{note}, {server['cpu_ms_per_connection_second']} ms per connection-second")
+        print(f"  server RSS  {server['rss_baseline_mb']} MB idle -> {server['rss_end_mb']} MB, "
+              f"{server['rss_kb_per_connection']} KB per connection")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("reaction", "question", "upvote", "vote"):
+            raise argparse.ArgumentTypeError(f"Unknown message kind: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--audience", type=int, default=100, help="Audience clients per room")
+    parser.add_argument("--presenters", type=int, default=1, help="Presenters per room")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--rate", type=float, default=0.5, help="Messages per second per audience client")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("reaction=0.85,question=0.05,upvote=0.07,vote=0.03"))
+    parser.add_argument("--poll-every", type=float, default=20.0, help="Seconds between presenter polls")
+    parser.add_argument("--observe", type=float, default=0.1, help="Fraction of audience clients that decode frames")
+    parser.add_argument("--server", default="spawn", help="spawn, inprocess or a ws:// base URL")
+    parser.add_argument("--server-pid", type=int, help="Server pid for CPU/RSS when --server is a URL")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))  # One descriptor per simulated client
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Room memory benchmark: bytes held per room for N events
+
+Builds the same reactions and questions twice - as the per-event dicts the
+server used to keep (ISO timestamps, a room_code field in every record) and as
+the compact records in services/records.py (array-backed reaction columns,
+slotted questions, interned room codes, float timestamps) - and reports the
+memory traced for each. Both layouts carry the same user ids, drawn from an
+audience of distinct `user_<random>` ids like the audience page sends, with a
+fresh string per event as a decoded message would hold. Buffers are left unbounded so the
+per-event cost is visible; a live room keeps at most 300 reactions and 100
+questions, reported on the last line.
+
+Usage (from backend/):
+    python benchmarks/memory_benchmark.py [--events 1000 10000 100000] [--question-ratio 0.1] [--audience 200]
+"""
+import argparse
+import gc
+import random
+import string
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.records import REACTION_TYPES, ReactionLog, Question
+
+
+def audience_ids(size: int, seed: int = 7) -> List[str]:
+    """Distinct random suffixes, the part after `user_` in the audience page's ids"""
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + string.digits
+    suffixes = set()
+    while len(suffixes) < size:
+        suffixes.add("".join(rng.choices(alphabet, k=9)))
+    return sorted(suffixes)
+
+
+def user_id(audience: List[str], i: int) -> str:
+    # A new string per event, as each decoded message carries its own copy
+    return f"user_{audience[(i * 7919) % len(audience)]}"
+
+
+def build_legacy(room_code: str, reactions: int, questions: int, audience: List[str]):
+    start = time.time() - 3600
+    reaction_buffer = [
+        {
+            "type": REACTION_TYPES[i % 4],
+            "timestamp": datetime.fromtimestamp(start + i * 0.3).isoformat(),
+            "user_id": user_id(audience, i),
+            "room_code": room_code
+        }
+        for i in range(reactions)
+    ]
+    question_list = [
+        {
+            "id": f"q-{room_code}-{i + 1}-{start + i * 3}",
+            "text": f"How does step {i} interact with the caching layer?",
+            "timestamp": datetime.fromtimestamp(start + i * 3).isoformat(),
+            "user_id": user_id(audience, i),
+            "upvotes": 0,
+            "upvoted_by": [],
+            "room_code": room_code
+        }
+        for i in range(questions)
+    ]
+    return reaction_buffer, question_list
+
+
+def build_compact(room_code: str, reactions: int, questions: int, audience: List[str]):
+    start = time.time() - 3600
+    log = ReactionLog(room_code, capacity=max(1, reactions))
+    for i in range(reactions):
+        log.append(REACTION_TYPES[i % 4], start + i * 0.3, user_id(audience, i))
+    question_list = [
+        Question(f"q-{room_code}-{i + 1}-{start + i * 3}", f"How does step {i} interact with the caching layer?",
+                 start + i * 3, user_id(audience, i), room_code)
+        for i in range(questions)
+    ]
+    return log, question_list
+
+
+def traced_bytes(build, *args) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--question-ratio", type=float, default=0.1)
+    parser.add_argument("--audience", type=int, default=200, help="distinct user ids sending the events")
+    args = parser.parse_args()
+    audience = audience_ids(args.audience)
+
+    print(f"{'events':>8} {'dicts KiB':>10} {'records KiB':>12} {'dicts B/ev':>11} {'records B/ev':>13} {'saving':>7}")
+    print("-" * 66)
+    for events in args.events + [None]:
+        if events is None:
+            reactions, questions, label = 300, 100, "live*"
+            events = reactions + questions
+        else:
+            questions = int(events * args.question_ratio)
+            reactions = events - questions
+            label = str(events)
+
+        legacy = traced_bytes(build_legacy, "BENCH1", reactions, questions, audience)
+        compact = traced_bytes(build_compact, "BENCH1", reactions, questions, audience)
+        print(f"{label:>8} {legacy / 1024:>10.1f} {compact / 1024:>12.1f} "
+              f"{legacy / events:>11.0f} {compact / events:>13.0f} {1 - compact / legacy:>7.0%}")
+
+    print("\n* live room buffers: 300 reactions + 100 questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Room snapshot benchmark: save and restore time for large rooms
+
+Loads a RoomManager with N reactions and M questions (its reaction log is
+widened to hold them all; the live room trims its buffers, so this is a worst
+case) and reports:
+- export:   RoomManager.export_state(), rebuilding wire dicts from the compact records
+- pack:     encode_snapshot of the exported state
+  (export + pack is the time save_room spends on the event loop)
+- write:    compression + atomic file write (runs in a worker thread)
+- restore:  read + decompress + decode (worker thread)
+- rerank:   rebuilding the hot-question ranking from restored questions
+
+Usage (from backend/):
+    python benchmarks/snapshot_benchmark.py [--reactions 10000] [--questions 1000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.question_ranking import QuestionRanking
+from services.records import ReactionLog
+from services.snapshots import SnapshotStore, encode_snapshot, msgpack
+
+REACTION_TYPES = ["speed_up", "slow_down", "show_code", "im_lost"]
+
+
+def build_state(room_code: str, reactions: int, questions: int) -> dict:
+    start = datetime.now() - timedelta(hours=1)
+    return {
+        "room_code": room_code,
+        "created_at": start.isoformat(),
+        "version": reactions + questions,
+        "questions": [
+            {
+                "id": f"q-{room_code}-{i}-{start.timestamp() + i}",
+                "text": f"How does step {i} interact with the caching layer when the token expires?",
+                "timestamp": (start + timedelta(seconds=i * 3)).isoformat(),
+                "user_id": f"anon-{start.timestamp() + i}",
+                "upvotes": i % 7,
+                "upvoted_by": [f"user_{j}" for j in range(i % 7)],
+                "room_code": room_code
+            }
+            for i in range(questions)
+        ],
+        "reactions_buffer": [
+            {
+                "type": REACTION_TYPES[i % 4],
+                "timestamp": (start + timedelta(milliseconds=i * 300)).isoformat(),
+                "user_id": f"anon-{start.timestamp() + i / 1000}",
+                "room_code": room_code
+            }
+            for i in range(reactions)
+        ],
+        "active_poll": {
+            "id": f"poll-{room_code}-1",
+            "question": "Should we go deeper into caching?",
+            "yes_votes": 42, "no_votes": 17,
+            "voted_users": [f"user_{i}" for i in range(59)],
+            "started_at": start.isoformat(), "duration": 30, "active": False,
+            "room_code": room_code
+        },
+        "heatmap_buckets": [
+            {"time": (start + timedelta(minutes=5 * i)).isoformat(), "speed_up": i, "slow_down": 2,
+             "show_code": 3, "im_lost": 1, "total": i + 6}
+            for i in range(12)
+        ],
+        "last_heatmap_update": start.isoformat(),
+        "metrics": {"total_reactions": reactions, "total_questions": questions, "ai_analyses_run": 40},
+        "last_pacing_analysis": None,
+        "last_qa_analysis": None,
+        "last_sentiment_analysis": None,
+        "last_ai_run": None
+    }
+
+
+def populated_room(room_code: str, reactions: int, questions: int):
+    """A standalone RoomManager (no connection manager) holding the generated state"""
+    os.environ["GEMINI_OFFLINE"] = "1"
+    os.environ.setdefault("SNAPSHOT_DIR", "")
+    os.environ.setdefault("ARCHIVE_DIR", "")
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app.main import RoomManager
+        room = RoomManager(room_code)
+    room.reactions = ReactionLog(room_code, capacity=max(1, reactions))
+    room.load_state(build_state(room_code, reactions, questions))
+    return room
+
+
+def rebuild_ranking(questions) -> float:
+    started = time.perf_counter()
+    ranking = QuestionRanking(top_k=5)
+    for question in questions:
+        asked_at = datetime.fromisoformat(question["timestamp"]).timestamp()
+        ranking.add(question["id"], asked_at)
+        for _ in range(question.get("upvotes", 0)):
+            ranking.upvote(question["id"], asked_at)
+    ranking.top_ids()
+    return time.perf_counter() - started
+
+
+async def run(args):
+    room = populated_room("BENCH1", args.reactions, args.questions)
+    timings = {"export": [], "pack": [], "write": [], "restore": [], "rerank": []}
+    size = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(directory)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            state = room.export_state()
+            timings["export"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            body = encode_snapshot(state)
+            timings["pack"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            size = await asyncio.to_thread(store._write, room.room_code, body)
+            timings["write"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            restored = await store.load(room.room_code)
+            timings["restore"].append(time.perf_counter() - started)
+
+            timings["rerank"].append(rebuild_ranking(restored["questions"]))
+
+        # Unchanged version: the periodic pass skips the room entirely
+        await store.save_room(room)
+        started = time.perf_counter()
+        await store.save_room(room)
+        skip_us = (time.perf_counter() - started) * 1e6
+
+    print(f"Room: {len(room.reactions)} reactions, {len(room.questions)} questions "
+          f"({'msgpack' if msgpack else 'json'} + zlib)")
+    print(f"Snapshot size: {size / 1024:.1f} KiB\n")
+    print(f"{'phase':<10} {'median ms':>10} {'max ms':>10}")
+    print("-" * 32)
+    for phase, samples in timings.items():
+        print(f"{phase:<10} {statistics.median(samples) * 1000:>10.2f} {max(samples) * 1000:>10.2f}")
+    print(f"\nUnchanged room skip: {skip_us:.1f} µs")
+    print(f"✅ {args.repeat} repetitions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reactions", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Wire protocol benchmark: JSON vs MessagePack framing
+
+Reports bytes per frame and encode/decode CPU time for representative
+reaction, question and ai_insights frames.
+
+Usage (from backend/):
+    python benchmarks/wire_protocol_benchmark.py [--iterations 5000]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.wire_protocol import json_codec, msgpack_codec
+
+
+def sample_frames():
+    now = datetime.now()
+    room_code = "ABC123"
+
+    heatmap = [
+        {"time": f"-{i * 5}m" if i else "Now", "reactions": 12 - i, "speed_up": 3,
+         "slow_down": 2, "show_code": 4, "im_lost": 1}
+        for i in reversed(range(12))
+    ]
+
+    reaction_frame = {
+        "type": "reaction",
+        "data": {
+            "type": "show_code",
+            "timestamp": now.isoformat(),
+            "user_id": f"anon-{now.timestamp()}",
+            "room_code": room_code
+        },
+        "counts": {"speed_up": 5, "slow_down": 2, "show_code": 8, "im_lost": 1},
+        "heatmap_data": heatmap
+    }
+
+    question_frame = {
+        "type": "question",
+        "data": {
+            "id": f"q-{room_code}-17-{now.timestamp()}",
+            "text": "How do you handle token refresh when the JWT expires mid-request?",
+            "timestamp": now.isoformat(),
+            "user_id": f"anon-{now.timestamp()}",
+            "upvotes": 3,
+            "upvoted_by": ["user_a1", "user_b2", "user_c3"],
+            "room_code": room_code
+        }
+    }
+
+    theme_questions = [
+        {
+            "id": f"q-{room_code}-{i}-{(now - timedelta(seconds=i)).timestamp()}",
+            "text": f"Getting 401 on /api/auth after login, attempt {i}",
+            "timestamp": (now - timedelta(seconds=i * 7)).isoformat(),
+            "user_id": f"anon-{(now - timedelta(seconds=i)).timestamp()}",
+            "upvotes": i % 4,
+            "upvoted_by": [],
+            "room_code": room_code
+        }
+        for i in range(6)
+    ]
+
+    ai_insights_frame = {
+        "type": "ai_insights",
+        "data": {
+            "pacing": {
+                "agent": "Pacing Agent",
+                "pacing_status": "too_fast",
+                "alert_level": "warning",
+                "engagement_score": 35,
+                "predicted_trend": "declining",
+                "action_required": True,
+                "title": "⚠️ SLOW DOWN: Pace Too Fast",
+                "recommendation": "Reduce pace immediately. 8 requests to slow down.",
+                "reasoning": "Multiple slow-down requests (8/8)",
+                "suggested_actions": [
+                    "Reduce speaking speed by 25%",
+                    "Add 3-5 second pauses between concepts",
+                    "Repeat last key point",
+                    "Ask: 'Everyone following so far?'"
+                ],
+                "urgency": "high",
+                "reaction_velocity": {"rate": 0.42, "trend": "accelerating", "intensity": "medium"},
+                "velocity_trend": "📊 Growing engagement",
+                "trend_confidence": 70,
+                "alerts": [{
+                    "type": "warning", "icon": "⚠️", "title": "Slow Down",
+                    "message": "8 requests to reduce pace",
+                    "action": "Reduce speaking speed by 25%", "priority": 2
+                }],
+                "reaction_counts": {"speed_up": 1, "slow_down": 8, "show_code": 2, "im_lost": 1},
+                "total_reactions": 12,
+                "response_time": "instant",
+                "analysis_timestamp": now.isoformat(),
+                "ai_enhancement": "not_needed"
+            },
+            "qa_grouping": {
+                "status": "success",
+                "themes": [{
+                    "name": "API Authentication Errors",
+                    "count": len(theme_questions),
+                    "examples": [q["text"] for q in theme_questions[:3]],
+                    "priority": "high",
+                    "category": "errors",
+                    "questions": theme_questions,
+                    "question_count": len(theme_questions),
+                    "total_upvotes": 7,
+                    "avg_upvotes": 1.2,
+                    "confidence": 0.85,
+                    "insights": {
+                        "suggested_response": "Debug session: Troubleshoot API Authentication Errors together",
+                        "time_to_address": "IMMEDIATELY",
+                        "urgency": "high",
+                        "action": "Stop and debug with audience",
+                        "question_count": len(theme_questions),
+                        "avg_engagement": 1.2
+                    }
+                }],
+                "total_themes": 1,
+                "quality_score": 85,
+                "analysis_method": "fast_local",
+                "agent": "Q&A Grouper Agent",
+                "total_questions": 6,
+                "analyzed_questions": 6,
+                "filtered_out": 0
+            },
+            "sentiment": {
+                "overall_sentiment": "negative",
+                "dominant_emotion": "confused",
+                "confidence": 78,
+                "urgency_level": "high",
+                "audience_mood": "😕 Confused & Struggling",
+                "trend": {"trend": "declining", "direction": "↘️ Declining", "confidence": 82},
+                "recommendations": [
+                    "⚠️ HIGH PRIORITY: Messages show confusion. Provide concrete examples NOW.",
+                    "🤔 CONFUSION DETECTED: Consider quick recap or example."
+                ],
+                "agent": "Sentiment Agent",
+                "analyzed_messages": 6,
+                "analyzed_reactions": 12,
+                "data_quality": "high",
+                "analysis_timestamp": now.isoformat()
+            }
+        },
+        "timestamp": now.isoformat()
+    }
+
+    return {
+        "reaction": reaction_frame,
+        "question": question_frame,
+        "ai_insights": ai_insights_frame
+    }
+
+
+def measure(codec, message, iterations: int):
+    frame = codec.encode(message)
+    size = len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.decode(frame)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    return size, encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    codecs = [json_codec]
+    if msgpack_codec:
+        codecs.append(msgpack_codec)
+    else:
+        print("⚠️ msgpack not installed - reporting JSON only (pip install msgpack)\n")
+
+    print(f"{'frame':<12} {'codec':<8} {'bytes':>7} {'ratio':>6} {'encode µs':>10} {'decode µs':>10}")
+    print("-" * 58)
+
+    for frame_name, message in sample_frames().items():
+        baseline = None
+        for codec in codecs:
+            size, encode_us, decode_us = measure(codec, message, args.iterations)
+            baseline = baseline or size
+            print(f"{frame_name:<12} {codec.name:<8} {size:>7} {size / baseline:>6.2f} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+    print(f"\n✅ {args.iterations} iterations per measurement")
+
+
+if __name__ == "__main__":
+    main()
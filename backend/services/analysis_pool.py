@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Urgency levels: higher runs first
+URGENCY_PERIODIC = 0
+URGENCY_NORMAL = 1
+URGENCY_URGENT = 2
+
+Job = Callable[[], Awaitable[None]]
+
+
+class AnalysisPool:
+    """
+    Process-wide AI analysis scheduler shared by every room
+    - A fixed number of worker tasks bounds concurrent analyses (and LLM calls)
+    - Queue order: urgency first, then staleness (oldest last analysis first);
+      both are fixed at submit time, so the heap never needs re-sorting
+    - Admission control: periodic work is refused while the LLM is saturated,
+      and only urgent work is admitted once the queue is full
+    - A job whose `still_wanted` check fails when dequeued (its room was
+      hibernated or released meanwhile) is dropped without running
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, saturated: Optional[Callable[[], bool]] = None):
+        self.worker_count = workers
+        self.max_queue = max_queue
+        self._saturated = saturated or (lambda: False)
+
+        self._queue: List[Tuple[int, float, int, str, Job, Optional[Callable[[], bool]], float]] = []
+        self._items = asyncio.Semaphore(0)
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self.active = 0
+
+        self.room_lag: Dict[str, Dict[str, float]] = {}
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected_saturated": 0,
+            "rejected_queue_full": 0,
+            "dropped_cancelled": 0,
+            "max_lag_ms": 0.0
+        }
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def submit(self, key: str, job: Job, urgency: int = URGENCY_NORMAL, last_run: float = 0.0,
+               still_wanted: Optional[Callable[[], bool]] = None) -> bool:
+        """Queue one analysis; False if admission control refused it"""
+        if urgency <= URGENCY_PERIODIC and self._saturated():
+            self.metrics["rejected_saturated"] += 1
+            return False
+        if len(self._queue) >= self.max_queue and urgency < URGENCY_URGENT:
+            self.metrics["rejected_queue_full"] += 1
+            return False
+
+        heapq.heappush(self._queue, (-urgency, last_run, next(self._seq), key, job, still_wanted, time.monotonic()))
+        self.metrics["submitted"] += 1
+        self._items.release()
+        return True
+
+    async def _worker(self):
+        while True:
+            await self._items.acquire()
+            _, _, _, key, job, still_wanted, enqueued_at = heapq.heappop(self._queue)
+            if still_wanted is not None and not still_wanted():
+                self.metrics["dropped_cancelled"] += 1
+                continue
+            self._record_lag(key, time.monotonic() - enqueued_at)
+
+            self.active += 1
+            try:
+                await job()
+                self.metrics["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics["failed"] += 1
+                print(f"❌ Analysis job for {key} failed: {e}")
+            finally:
+                self.active -= 1
+
+    def _record_lag(self, key: str, lag: float):
+        lag_ms = round(lag * 1000, 1)
+        stats = self.room_lag.setdefault(key, {"last_ms": 0.0, "max_ms": 0.0, "avg_ms": 0.0, "runs": 0})
+        stats["runs"] += 1
+        stats["last_ms"] = lag_ms
+        stats["max_ms"] = max(stats["max_ms"], lag_ms)
+        stats["avg_ms"] = round(stats["avg_ms"] + (lag_ms - stats["avg_ms"]) / stats["runs"], 1)
+        self.metrics["max_lag_ms"] = max(self.metrics["max_lag_ms"], lag_ms)
+
+    def forget(self, key: str):
+        """Drop a room's lag stats once it stops analysing"""
+        self.room_lag.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        return {
+            "workers": self.worker_count,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "saturated": self._saturated(),
+            **self.metrics
+        }
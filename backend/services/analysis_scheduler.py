@@ -0,0 +1,142 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from services.analysis_pool import AnalysisPool, URGENCY_NORMAL, URGENCY_URGENT
+
+
+class AnalysisScheduler:
+    """
+    Single-flight, trailing-edge debounced runner for one room's AI analysis
+    - Triggers coalesce into at most one run in flight plus one queued rerun
+    - A run starts `debounce` seconds after the last trigger, but never later than
+      `max_delay` after the first pending one, so a burst yields one analysis of
+      its final state and a steady stream cannot starve it
+    - Runs never overlap and read room state when they start, so the result
+      built from the freshest input is always the one applied last
+    - With a pool, a due run is queued there (by urgency and staleness) instead
+      of starting immediately; it counts as in flight while queued
+    - cancel() bumps a generation: a run queued (or created) before it is
+      dropped when dequeued instead of analysing a hibernated or released room
+    """
+
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[None]],
+        debounce: float = 1.0,
+        max_delay: float = 4.0,
+        pool: Optional[AnalysisPool] = None,
+        key: str = "",
+        last_run: Optional[Callable[[], float]] = None
+    ):
+        self._run = run
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pool = pool
+        self.key = key
+        self._last_run = last_run or (lambda: 0.0)
+
+        self._pending = False
+        self._first_request: Optional[float] = None
+        self._last_request: Optional[float] = None
+        self._urgency = URGENCY_NORMAL
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = False
+        self._started = False
+        self._generation = 0
+
+        self.metrics = {
+            "requested": 0,
+            "coalesced": 0,
+            "runs": 0,
+            "reruns": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "last_duration_ms": 0.0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._in_flight
+
+    @property
+    def pending(self) -> bool:
+        return self._pending
+
+    def request(self, urgency: int = URGENCY_NORMAL):
+        """Ask for an analysis; cheap and safe to call on every event"""
+        now = time.monotonic()
+        self.metrics["requested"] += 1
+        if self._pending:
+            self.metrics["coalesced"] += 1
+            self._urgency = max(self._urgency, urgency)
+        else:
+            self._first_request = now
+            self._urgency = urgency
+        self._pending = True
+        self._last_request = now
+
+        if not self.running:
+            self._arm()
+        # Otherwise the in-flight run re-arms for the queued rerun when it finishes
+
+    def cancel(self):
+        """Drop pending triggers and any queued run (a run already started completes)"""
+        self._pending = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._generation += 1
+        if self._in_flight and not self._started:
+            # Still waiting in the pool (or for its task to start): it is dropped at dequeue
+            self._in_flight = False
+            self.metrics["cancelled"] += 1
+
+    def _is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _arm(self):
+        if self._timer:
+            self._timer.cancel()
+        if self._urgency >= URGENCY_URGENT:
+            delay = 0.0
+        else:
+            fire_at = min(self._last_request + self.debounce, self._first_request + self.max_delay)
+            delay = max(0.0, fire_at - time.monotonic())
+        self._timer = asyncio.get_running_loop().call_later(delay, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        if not self._pending or self.running:
+            return
+        self._pending = False
+        self._first_request = None
+        self._in_flight = True
+        self._started = False
+        generation = self._generation
+
+        if self._pool is None:
+            asyncio.create_task(self._execute(generation))
+        elif not self._pool.submit(
+            self.key, lambda: self._execute(generation), self._urgency, self._last_run(),
+            still_wanted=lambda: self._is_current(generation)
+        ):
+            # Refused by admission control: the next trigger or tick asks again
+            self._in_flight = False
+            self.metrics["rejected"] += 1
+
+    async def _execute(self, generation: int):
+        if not self._is_current(generation):
+            return  # Cancelled before it started; cancel() already released the slot
+        self._started = True
+        started = time.monotonic()
+        try:
+            await self._run()
+        finally:
+            self._in_flight = False
+            self._started = False
+            self.metrics["runs"] += 1
+            self.metrics["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            if self._pending:
+                self.metrics["reruns"] += 1
+                self._arm()
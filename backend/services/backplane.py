@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+Handler = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+class Backplane(ABC):
+    """
+    Pluggable pub/sub relay between worker processes
+    - Room events (reactions, questions, votes, insights, membership) are
+      published on a per-room channel
+    - Each worker only subscribes to the rooms it currently hosts
+    - Events are never delivered back to the worker that published them
+    """
+
+    async def start(self):
+        """Open connections (no-op for in-process backplanes)"""
+        pass
+
+    async def close(self):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+    @abstractmethod
+    def publish(self, channel: str, payload: Dict[str, Any], origin: str):
+        """Fire-and-forget publish, callable from sync code"""
+        pass
+
+    @abstractmethod
+    async def subscribe(self, channel: str, owner: str, handler: Handler):
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str, owner: str):
+        pass
+
+    @staticmethod
+    async def _dispatch(handler: Handler, payload: Dict[str, Any]):
+        try:
+            result = handler(payload)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            print(f"❌ Backplane handler error: {e}")
+
+
+class InProcessBackplane(Backplane):
+    """
+    Default backplane for a single process
+    Several GlobalConnectionManagers (workers) can share one instance, which
+    is how multi-worker behaviour is exercised without a broker. With only
+    one worker, publish() finds no foreign subscriber and costs nothing.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Dict[str, Handler]] = {}
+
+    def publish(self, channel: str, payload: Dict[str, Any], origin: str):
+        handlers = self._handlers.get(channel)
+        if not handlers:
+            return
+        targets = [handler for owner, handler in handlers.items() if owner != origin]
+        if not targets:
+            return
+
+        # Round-trip through JSON so workers never share mutable state
+        wire = json.dumps(payload)
+        loop = asyncio.get_running_loop()
+        for handler in targets:
+            loop.create_task(self._dispatch(handler, json.loads(wire)))
+
+    async def subscribe(self, channel: str, owner: str, handler: Handler):
+        self._handlers.setdefault(channel, {})[owner] = handler
+
+    async def unsubscribe(self, channel: str, owner: str):
+        handlers = self._handlers.get(channel)
+        if handlers:
+            handlers.pop(owner, None)
+            if not handlers:
+                del self._handlers[channel]
+
+
+# === Minimal RESP (Redis protocol) support ===
+
+def encode_command(*args: Union[str, bytes]) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def read_resp(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("RESP connection closed")
+    prefix, body = line[:1], line[1:-2]
+
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        raise RuntimeError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_resp(reader) for _ in range(count)]
+    raise RuntimeError(f"Unknown RESP type: {prefix!r}")
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane over the Redis PUBLISH/SUBSCRIBE protocol
+    Speaks RESP directly (no client library), so it works against a real
+    Redis server or the bundled MiniRedisServer stand-in.
+    - Publishes go through a bounded queue and one writer task that awaits
+      drain(), so a slow Redis cannot grow the transport buffer; publishes
+      beyond `max_pending` are dropped and counted
+    - If either connection drops, both are reopened with exponential backoff
+      and every hosted channel is subscribed again
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, max_pending: int = 10000,
+                 min_backoff: float = 0.5, max_backoff: float = 30.0):
+        self.host = host
+        self.port = port
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._outbox: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=max_pending)
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._handlers: Dict[str, Tuple[str, Handler]] = {}
+        self._dropping = False
+        self.metrics = {"published": 0, "dropped": 0, "reconnects": 0, "connected": False}
+
+    async def start(self):
+        # The first connection is made here so a wrong BACKPLANE_URL fails startup
+        connections = await self._connect()
+        print(f"📡 Backplane connected to redis://{self.host}:{self.port}")
+        self._task = asyncio.create_task(self._run(connections))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, channel: str, payload: Dict[str, Any], origin: str):
+        message = json.dumps({"origin": origin, "payload": payload})
+        try:
+            self._outbox.put_nowait(encode_command("PUBLISH", channel, message))
+        except asyncio.QueueFull:
+            self.metrics["dropped"] += 1
+            if not self._dropping:
+                self._dropping = True
+                print(f"⚠️ Backplane publish queue full ({self._outbox.maxsize}); dropping events")
+
+    async def subscribe(self, channel: str, owner: str, handler: Handler):
+        self._handlers[channel] = (owner, handler)
+        await self._send_subscription("SUBSCRIBE", channel)
+
+    async def unsubscribe(self, channel: str, owner: str):
+        if self._handlers.pop(channel, None):
+            await self._send_subscription("UNSUBSCRIBE", channel)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"pending": self._outbox.qsize(), "max_pending": self._outbox.maxsize, **self.metrics}
+
+    async def _send_subscription(self, command: str, channel: str):
+        if not self._sub_writer:
+            return  # Disconnected: the reconnect subscribes to every channel in _handlers
+        try:
+            self._sub_writer.write(encode_command(command, channel))
+            await self._sub_writer.drain()
+        except ConnectionError:
+            pass  # The reader notices too and reconnects
+
+    async def _connect(self):
+        pub_reader, pub_writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            sub_reader, sub_writer = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            pub_writer.close()
+            raise
+        if self._handlers:
+            sub_writer.write(encode_command("SUBSCRIBE", *self._handlers))
+            await sub_writer.drain()
+        return pub_reader, pub_writer, sub_reader, sub_writer
+
+    async def _run(self, connections):
+        """Serve one pair of connections at a time, reopening them when either drops"""
+        backoff = self.min_backoff
+        while True:
+            pub_reader, pub_writer, sub_reader, sub_writer = connections
+            self._sub_writer = sub_writer
+            self.metrics["connected"] = True
+            tasks = [
+                asyncio.create_task(self._write_publishes(pub_writer)),
+                asyncio.create_task(self._drain_replies(pub_reader)),
+                asyncio.create_task(self._read_messages(sub_reader))
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                error = next((task.exception() for task in done if task.exception()), None)
+                print(f"⚠️ Backplane connection to redis://{self.host}:{self.port} lost"
+                      + (f": {error}" if error else ""))
+            finally:
+                self._sub_writer = None
+                self.metrics["connected"] = False
+                for task in tasks:
+                    task.cancel()
+                for writer in (pub_writer, sub_writer):
+                    writer.close()
+
+            while True:
+                await asyncio.sleep(backoff)
+                try:
+                    connections = await self._connect()
+                    break
+                except OSError as e:
+                    backoff = min(backoff * 2, self.max_backoff)
+                    print(f"⚠️ Backplane reconnect failed ({e}); retrying in {backoff:.1f}s")
+            backoff = self.min_backoff
+            self.metrics["reconnects"] += 1
+            print(f"📡 Backplane reconnected to redis://{self.host}:{self.port} ({len(self._handlers)} channels)")
+
+    async def _write_publishes(self, writer: asyncio.StreamWriter):
+        while True:
+            message = await self._outbox.get()
+            writer.write(message)
+            await writer.drain()  # Back-pressure: the queue fills instead of the transport buffer
+            self.metrics["published"] += 1
+            self._dropping = False
+
+    async def _drain_replies(self, reader: asyncio.StreamReader):
+        while True:
+            try:
+                await read_resp(reader)
+            except RuntimeError as e:
+                print(f"❌ Backplane publish error: {e}")  # -ERR reply; the connection is fine
+
+    async def _read_messages(self, reader: asyncio.StreamReader):
+        while True:
+            reply = await read_resp(reader)
+            if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                continue  # subscribe/unsubscribe confirmations
+
+            channel = reply[1].decode()
+            registered = self._handlers.get(channel)
+            if not registered:
+                continue
+
+            owner, handler = registered
+            try:
+                message = json.loads(reply[2])
+            except ValueError:
+                continue  # Not one of ours
+            if message.get("origin") == owner:
+                continue
+            await self._dispatch(handler, message["payload"])
+
+
+class MiniRedisServer:
+    """
+    Local Redis-protocol stand-in for tests and multi-worker development
+    Supports PING, PUBLISH, SUBSCRIBE and UNSUBSCRIBE only.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6399):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: Dict[bytes, List[asyncio.StreamWriter]] = {}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"🧪 Mini Redis listening on {self.host}:{self.port}")
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await read_resp(reader)
+                if not isinstance(command, list) or not command:
+                    continue
+                name = command[0].upper()
+
+                if name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"PUBLISH":
+                    channel, data = command[1], command[2]
+                    receivers = self._subscribers.get(channel, [])
+                    for subscriber in receivers:
+                        subscriber.write(encode_command(b"message", channel, data))
+                    writer.write(f":{len(receivers)}\r\n".encode())
+                elif name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        subscribers = self._subscribers.setdefault(channel, [])
+                        if writer not in subscribers:
+                            subscribers.append(writer)
+                        writer.write(encode_command(b"subscribe", channel, b"1"))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in command[1:]:
+                        self._remove_subscriber(channel, writer)
+                        writer.write(encode_command(b"unsubscribe", channel, b"0"))
+                else:
+                    writer.write(f"-ERR unknown command '{name.decode()}'\r\n".encode())
+
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in list(self._subscribers):
+                self._remove_subscriber(channel, writer)
+            writer.close()
+
+    def _remove_subscriber(self, channel: bytes, writer: asyncio.StreamWriter):
+        subscribers = self._subscribers.get(channel)
+        if subscribers and writer in subscribers:
+            subscribers.remove(writer)
+            if not subscribers:
+                del self._subscribers[channel]
+
+
+def create_backplane(url: Optional[str] = None) -> Backplane:
+    """Build a backplane from BACKPLANE_URL (unset = in-process)"""
+    if not url or url == "memory://":
+        return InProcessBackplane()
+
+    parsed = urlparse(url)
+    if parsed.scheme == "redis":
+        return RedisBackplane(parsed.hostname or "127.0.0.1", parsed.port or 6379)
+
+    raise ValueError(f"❌ Unsupported BACKPLANE_URL: {url}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local Redis-protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+    asyncio.run(MiniRedisServer(args.host, args.port).serve_forever())
@@ -0,0 +1,343 @@
+import asyncio
+import math
+import mmap
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python scan over the mmapped columns instead
+    np = None
+
+# Append-only: the index is what gets stored in the kind column
+EVENT_KINDS = [
+    "speed_up", "slow_down", "show_code", "im_lost",
+    "question", "upvote", "poll_created", "vote_yes", "vote_no", "poll_closed",
+    "ai_insights"
+]
+KIND_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+NO_STRING = 0xFFFFFFFF
+MAX_TIMELINE_BUCKETS = 5000
+
+# Column files (native byte order, fixed width)
+TS_FILE = "ts.f64"          # float64 epoch seconds, non-decreasing
+KIND_FILE = "kind.u8"       # uint8 index into EVENT_KINDS
+REF_FILE = "ref.u32"        # uint32 index into the string table (NO_STRING = none)
+STRINGS_FILE = "strings.bin"
+STRING_OFFSETS_FILE = "strings.u64"  # uint64 end offset of each string
+
+
+class SessionArchive:
+    """
+    Columnar, append-only event log for one room session
+    - Each worker writes its own shard (`{session}/{writer_id}/`), so workers
+      sharing a room over the backplane never append to the same files;
+      reads merge every shard of the session
+    - Appends are buffered in typed arrays on the event loop and written in
+      batches by the archive's single IO thread (so batches stay in order)
+    - String refs are numbered per instance and offset by the shard's existing
+      string count, read on the IO thread at the first write: a session
+      reopened right after hibernation queues behind the previous instance's
+      last flush instead of racing it
+    - Repeated texts (e.g. upvoted question ids) share one string; the dedupe
+      table is cleared past `max_interned` entries, at the cost of storing a
+      repeat again
+    - Reads memory-map the column files; aggregations run over the mapped
+      arrays (numpy when installed) without building per-event objects
+    """
+
+    def __init__(self, session_dir: Path, writer_id: str, executor: ThreadPoolExecutor,
+                 flush_every: int = 256, flush_interval: float = 2.0, max_interned: int = 10000):
+        self.session_dir = session_dir
+        self.directory = session_dir / writer_id
+        self.session_id = session_dir.name
+        self._executor = executor
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_interned = max_interned
+        self._lock = Lock()
+
+        self._ts = array("d")
+        self._kinds = array("B")
+        self._refs = array("I")
+        self._strings: List[str] = []
+        self._interned: Dict[str, int] = {}
+        self._string_count = 0  # Strings interned by this instance
+        self._string_base: Optional[int] = None  # Strings already on disk; set on the IO thread
+        self._last_ts = 0.0
+        self._last_flush = time.monotonic()
+        self.events_appended = 0
+
+    def _existing_string_count(self) -> int:
+        path = self.directory / STRING_OFFSETS_FILE
+        return path.stat().st_size // 8 if path.exists() else 0
+
+    # === Writes ===
+
+    def append(self, kind: str, text: Optional[str] = None, timestamp: Optional[float] = None):
+        code = KIND_CODES.get(kind)
+        if code is None:
+            return
+
+        # Clamp so the timestamp column stays sorted (binary-searchable)
+        ts = max(timestamp if timestamp is not None else time.time(), self._last_ts)
+        self._last_ts = ts
+
+        self._ts.append(ts)
+        self._kinds.append(code)
+        self._refs.append(self._intern(text) if text is not None else NO_STRING)
+        self.events_appended += 1
+
+        if len(self._ts) >= self.flush_every or time.monotonic() - self._last_flush > self.flush_interval:
+            self._executor.submit(self._write_batch, self._take_pending())
+
+    def _intern(self, text: str) -> int:
+        index = self._interned.get(text)
+        if index is None:
+            if len(self._interned) >= self.max_interned:
+                self._interned.clear()
+            index = self._string_count
+            self._string_count += 1
+            self._interned[text] = index
+            self._strings.append(text)
+        return index
+
+    def _take_pending(self):
+        batch = (self._ts, self._kinds, self._refs, self._strings)
+        self._ts, self._kinds, self._refs, self._strings = array("d"), array("B"), array("I"), []
+        self._last_flush = time.monotonic()
+        return batch
+
+    def _write_batch(self, batch):
+        ts, kinds, refs, strings = batch
+        if not ts and not strings:
+            return
+        with self._lock:
+            if self._string_base is None:
+                # Every earlier batch for this shard ran before this one on the single IO thread
+                self._string_base = self._existing_string_count()
+            if self._string_base:
+                refs = array("I", (ref if ref == NO_STRING else ref + self._string_base for ref in refs))
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if strings:
+                offsets = array("Q")
+                with open(self.directory / STRINGS_FILE, "ab") as f:
+                    end = f.tell()
+                    for text in strings:
+                        data = text.encode("utf-8")
+                        f.write(data)
+                        end += len(data)
+                        offsets.append(end)
+                with open(self.directory / STRING_OFFSETS_FILE, "ab") as f:
+                    offsets.tofile(f)
+            for name, column in ((REF_FILE, refs), (KIND_FILE, kinds), (TS_FILE, ts)):
+                with open(self.directory / name, "ab") as f:
+                    column.tofile(f)
+
+    async def flush(self):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write_batch, self._take_pending())
+
+    # === Reads ===
+
+    async def timeline(self, start: Optional[float] = None, end: Optional[float] = None,
+                       resolution: float = 60.0, kinds: Optional[Sequence[str]] = None) -> Dict:
+        """Flush pending events, then aggregate on the IO thread"""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.aggregate, start, end, resolution, kinds
+        )
+
+    def _shard_dirs(self) -> List[Path]:
+        """Every writer's directory of this session (plus columns at the top level, if any)"""
+        if not self.session_dir.is_dir():
+            return []
+        shards = sorted(path for path in self.session_dir.iterdir() if path.is_dir())
+        return shards + ([self.session_dir] if (self.session_dir / TS_FILE).exists() else [])
+
+    def aggregate(self, start: Optional[float] = None, end: Optional[float] = None,
+                  resolution: float = 60.0, kinds: Optional[Sequence[str]] = None) -> Dict:
+        """
+        Event counts per kind in [start, end) bucketed by `resolution` seconds
+        Returns columnar series: {"buckets": [...], "series": {kind: [...]}}
+        """
+        kinds = [kind for kind in (kinds or EVENT_KINDS) if kind in KIND_CODES]
+        with self._lock, ExitStack() as stack:
+            shards = [stack.enter_context(self._mapped_columns(directory)) for directory in self._shard_dirs()]
+            total = sum(len(ts) for ts, _ in shards)
+            if start is None:
+                start = min((float(ts[0]) for ts, _ in shards if len(ts)), default=time.time())
+            if end is None:
+                end = max((float(ts[-1]) + 1e-6 for ts, _ in shards if len(ts)), default=start)
+
+            resolution = max(resolution, (end - start) / MAX_TIMELINE_BUCKETS, 1e-3)
+            bucket_count = max(1, math.ceil((end - start) / resolution))
+            matrix = [[0] * len(EVENT_KINDS) for _ in range(bucket_count)]
+            for ts, codes in shards:  # Counts add up across shards
+                for row, shard_row in zip(matrix, self._bucket_counts(ts, codes, start, end, resolution, bucket_count)):
+                    row[:] = [a + b for a, b in zip(row, shard_row)]
+
+        return {
+            "session": self.session_id,
+            "start": start,
+            "end": end,
+            "resolution": resolution,
+            "total_events": total,
+            "shards": len(shards),
+            "buckets": [start + i * resolution for i in range(bucket_count)],
+            "series": {kind: [row[KIND_CODES[kind]] for row in matrix] for kind in kinds},
+            "engine": "numpy" if np is not None else "python"
+        }
+
+    @staticmethod
+    def _bucket_counts(ts, codes, start, end, resolution, bucket_count) -> List[List[int]]:
+        width = len(EVENT_KINDS)
+        if np is not None:
+            lo, hi = (int(i) for i in np.searchsorted(ts, [start, end], side="left"))
+            slots = ((ts[lo:hi] - start) // resolution).astype(np.int64) * width + codes[lo:hi]
+            flat = np.bincount(slots, minlength=bucket_count * width)[:bucket_count * width]
+            return flat.reshape(bucket_count, width).tolist()
+
+        lo, hi = bisect_left(ts, start), bisect_left(ts, end)
+        matrix = [[0] * width for _ in range(bucket_count)]
+        for i in range(lo, hi):
+            matrix[int((ts[i] - start) // resolution)][codes[i]] += 1
+        return matrix
+
+    def events(self, kinds: Optional[Sequence[str]] = None) -> List[Tuple[float, str]]:
+        """(timestamp, kind) of every flushed event of `kinds` (default all), across shards, oldest first"""
+        wanted = {KIND_CODES[kind]: kind for kind in (kinds or EVENT_KINDS) if kind in KIND_CODES}
+        results = []
+        with self._lock:
+            for directory in self._shard_dirs():
+                with self._mapped_columns(directory) as (ts, codes):
+                    results += [(float(ts[i]), wanted[int(codes[i])]) for i in range(len(ts)) if int(codes[i]) in wanted]
+        results.sort()
+        return results
+
+    def strings_in_range(self, kind: str, start: float, end: float, limit: int = 100) -> List[Dict]:
+        """(timestamp, text) of events of one kind in a range, e.g. question texts, across shards"""
+        code = KIND_CODES[kind]
+        results = []
+        with self._lock:
+            for directory in self._shard_dirs():
+                with self._mapped_columns(directory, with_refs=True) as (ts, codes, refs, offsets, blob):
+                    lo, hi = bisect_left(ts, start), bisect_left(ts, end)
+                    found = 0
+                    for i in range(lo, hi):
+                        if codes[i] != code or refs[i] == NO_STRING:
+                            continue
+                        ref = refs[i]
+                        begin = offsets[ref - 1] if ref else 0
+                        results.append({"timestamp": float(ts[i]), "text": bytes(blob[begin:offsets[ref]]).decode("utf-8")})
+                        found += 1
+                        if found >= limit:
+                            break
+        results.sort(key=lambda item: item["timestamp"])
+        return results[:limit]
+
+    @contextmanager
+    def _mapped_columns(self, directory: Path, with_refs: bool = False):
+        files = [TS_FILE, KIND_FILE] + ([REF_FILE, STRING_OFFSETS_FILE, STRINGS_FILE] if with_refs else [])
+        formats = {TS_FILE: ("d", "float64"), KIND_FILE: ("B", "uint8"), REF_FILE: ("I", "uint32"),
+                   STRING_OFFSETS_FILE: ("Q", "uint64"), STRINGS_FILE: ("B", "uint8")}
+        maps, views = [], []
+        try:
+            for name in files:
+                path = directory / name
+                size = path.stat().st_size if path.exists() else 0
+                if size == 0:
+                    views.append(np.zeros(0, dtype=formats[name][1]) if np is not None else array(formats[name][0]))
+                    continue
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                maps.append(mapped)
+                if np is not None:
+                    views.append(np.frombuffer(mapped, dtype=formats[name][1]))
+                else:
+                    views.append(memoryview(mapped).cast(formats[name][0]))
+            # Columns are written ts-last, so trim to the shortest in case of a torn batch
+            column_count = 3 if with_refs else 2
+            rows = min(len(view) for view in views[:column_count])
+            yield tuple(view[:rows] for view in views[:column_count]) + tuple(views[column_count:])
+        finally:
+            for view in views:
+                if isinstance(view, memoryview):
+                    view.release()
+            del views
+            for mapped in maps:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # numpy view still referenced; unmapped on garbage collection
+
+
+class EventArchive:
+    """Per-session archives under ARCHIVE_DIR/{room_code}/{session_id}/{writer_id}/"""
+
+    def __init__(self, root: str, writer_id: str = "local"):
+        self.root = Path(root)
+        self.writer_id = re.sub(r"[^\w.-]", "_", writer_id)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-archive")
+        self.sessions: Dict[str, SessionArchive] = {}
+
+    @classmethod
+    def from_env(cls, writer_id: str = "local") -> Optional["EventArchive"]:
+        """ARCHIVE_DIR="" disables the archive"""
+        root = os.getenv("ARCHIVE_DIR", str(Path(__file__).resolve().parent.parent / "archive"))
+        return cls(root, writer_id) if root else None
+
+    def _room_dir(self, room_code: str) -> Path:
+        """ARCHIVE_DIR/{room_code}; ValueError if the code would resolve outside the root"""
+        root = self.root.resolve()
+        room_dir = (self.root / room_code).resolve()
+        if room_dir.parent != root:
+            raise ValueError(f"Room code {room_code!r} escapes the archive root")
+        return room_dir
+
+    def open_session(self, room_code: str, session_id: str) -> SessionArchive:
+        key = f"{room_code}/{session_id}"
+        if key not in self.sessions:
+            if not str(session_id).isdigit():
+                raise ValueError(f"Invalid archive session id {session_id!r}")
+            self.sessions[key] = SessionArchive(self._room_dir(room_code) / session_id, self.writer_id, self._executor)
+        return self.sessions[key]
+
+    def list_sessions(self, room_code: str) -> List[str]:
+        try:
+            room_dir = self._room_dir(room_code)
+        except ValueError:
+            return []
+        if not room_dir.is_dir():
+            return []
+        return sorted((path.name for path in room_dir.iterdir() if path.is_dir() and path.name.isdigit()), key=int)
+
+    def find_session(self, room_code: str, session_id: Optional[str] = None) -> Optional[SessionArchive]:
+        """A live or on-disk session (latest if no id is given)"""
+        known = set(self.list_sessions(room_code))
+        known.update(key.split("/", 1)[1] for key in self.sessions if key.startswith(f"{room_code}/"))
+        if session_id is None and known:
+            session_id = max(known, key=int)
+        if session_id not in known:
+            return None
+        return self.open_session(room_code, session_id)
+
+    async def close_session(self, room_code: str, session_id: str):
+        session = self.sessions.pop(f"{room_code}/{session_id}", None)
+        if session:
+            await session.flush()
+
+    async def flush_all(self):
+        for session in list(self.sessions.values()):
+            await session.flush()
+
+    def close(self):
+        """Stop the IO thread once queued batches are written (flush sessions first to keep pending events)"""
+        self._executor.shutdown(wait=True)
@@ -1,15 +1,84 @@
 import os
-import google.generativeai as genai
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import asyncio
 from functools import lru_cache
 import json
 import re
+import time
+from types import SimpleNamespace
 from datetime import datetime
+from services.metrics import registry, CACHE_LOOKUPS
+
+try:
+    import google.generativeai as genai
+except ImportError:  # Only the live API needs it (GEMINI_OFFLINE=1 runs without)
+    genai = None
 
 load_dotenv()
 
+GEMINI_CALLS = registry.counter("feedback_gemini_calls_total", "Model calls by result (ok/empty/error)", ("result",))
+GEMINI_LATENCY = registry.histogram("feedback_gemini_call_seconds", "Model call latency, rate-limit wait excluded")
+
+class OfflineModel:
+    """
+    Deterministic stand-in for the Gemini model (GEMINI_OFFLINE=1)
+    - For load tests and benchmarks on a box without API access
+    - Answers the prompts of this service and the agents with well-formed JSON
+    - Blocks for GEMINI_OFFLINE_LATENCY_MS, like the synchronous client call it replaces
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+    
+    def generate_content(self, prompt: str, generation_config=None, safety_settings=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(text=json.dumps(self._answer(prompt)))
+    
+    def _answer(self, prompt: str) -> Dict[str, Any]:
+        if '"themes"' in prompt:
+            questions = re.findall(r'^\d+\. "?(.+?)"?$', prompt, re.MULTILINE)
+            groups: Dict[str, List[str]] = {}
+            for question in questions:
+                words = re.findall(r"[a-zA-Z]{4,}", question.lower())
+                groups.setdefault(max(words, key=len) if words else "misc", []).append(question)
+            return {
+                "themes": [
+                    {
+                        "name": f"{keyword.capitalize()} follow-ups",
+                        "count": len(items),
+                        "examples": items[:2],
+                        "priority": "high" if len(items) > 2 else "medium",
+                        "reasoning": "Offline stand-in grouping by keyword",
+                        "category": "other"
+                    }
+                    for keyword, items in sorted(groups.items(), key=lambda item: -len(item[1]))[:5]
+                ],
+                "total_questions": len(questions),
+                "quality_score": 70
+            }
+        if '"pacing_status"' in prompt:
+            return {
+                "pacing_status": "good",
+                "alert_level": "none",
+                "recommendation": "Keep the current pace.",
+                "reasoning": "Offline stand-in",
+                "engagement_score": 70,
+                "action_required": False,
+                "predicted_trend": "stable",
+                "suggested_actions": ["Keep current momentum"]
+            }
+        return {
+            "sentiment": "neutral",
+            "emotion": "engaged",
+            "urgency": "low",
+            "confidence": 70,
+            "reasoning": "Offline stand-in"
+        }
+
 class GeminiService:
     """
     Ultra-optimized Gemini Service with:
@@ -22,22 +91,27 @@ class GeminiService:
     
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if os.getenv("GEMINI_OFFLINE", "").lower() in ("1", "true", "yes"):
+            self.model = OfflineModel(float(os.getenv("GEMINI_OFFLINE_LATENCY_MS", "0")) / 1000)
+            print("✅ Gemini Service: offline stand-in (GEMINI_OFFLINE)")
+        elif not api_key:
             raise ValueError("❌ GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        
-        # Use the fastest available model
-        try:
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            print("✅ Gemini Service: gemini-2.0-flash-exp (FASTEST)")
-        except:
+        elif genai is None:
+            raise ValueError("❌ google-generativeai is not installed")
+        else:
+            genai.configure(api_key=api_key)
+            
+            # Use the fastest available model
             try:
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
-                print("✅ Gemini Service: gemini-1.5-flash")
+                self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+                print("✅ Gemini Service: gemini-2.0-flash-exp (FASTEST)")
             except:
-                self.model = genai.GenerativeModel('gemini-pro')
-                print("✅ Gemini Service: gemini-pro")
+                try:
+                    self.model = genai.GenerativeModel('gemini-1.5-flash')
+                    print("✅ Gemini Service: gemini-1.5-flash")
+                except:
+                    self.model = genai.GenerativeModel('gemini-pro')
+                    print("✅ Gemini Service: gemini-pro")
         
         # Advanced caching system
         self._analysis_cache = {}
@@ -173,17 +247,20 @@ class GeminiService:
             if self._is_cache_valid(cache_key):
                 _, cached_result = self._analysis_cache[cache_key]
                 self.metrics["cache_hits"] += 1
+                CACHE_LOOKUPS.labels("gemini", "hit").inc()
                 print(f"📦 Cache hit (saved ~{int((asyncio.get_event_loop().time() - start_time) * 1000)}ms)")
                 return cached_result
+            CACHE_LOOKUPS.labels("gemini", "miss").inc()
         
         # Rate limiting
         await self._rate_limit()
         
+        call_started = time.perf_counter()
         try:
             generation_config = genai.types.GenerationConfig(
                 temperature=temperature,
                 max_output_tokens=max_tokens,
-            )
+            ) if genai else {"temperature": temperature, "max_output_tokens": max_tokens}
             
             # Permissive safety settings for business content
             safety_settings = [
@@ -200,8 +277,10 @@ class GeminiService:
             )
             
             text = self._extract_text_from_response(response)
+            GEMINI_LATENCY.observe(time.perf_counter() - call_started)
             
             if not text:
+                GEMINI_CALLS.labels("empty").inc()
                 print("⚠️ Empty Gemini response")
                 return "Analysis temporarily unavailable"
             
@@ -218,11 +297,13 @@ class GeminiService:
                 cache_key = self._get_cache_key(prompt, {"temp": temperature, "max": max_tokens})
                 self._analysis_cache[cache_key] = (asyncio.get_event_loop().time(), text)
             
+            GEMINI_CALLS.labels("ok").inc()
             print(f"✅ Gemini response ({int(elapsed * 1000)}ms)")
             return text
             
         except Exception as e:
             self.metrics["errors"] += 1
+            GEMINI_CALLS.labels("error").inc()
             print(f"❌ Gemini error: {e}")
             return f"Error: {str(e)[:100]}"
     
@@ -624,6 +705,11 @@ JSON:"""
             "suggested_actions": ["Keep current momentum"]
         }
     
+    def is_saturated(self) -> bool:
+        """True while the burst budget is spent, i.e. new calls would be throttled"""
+        now = asyncio.get_event_loop().time()
+        return self._call_tokens <= 0 and now - self._last_refill <= 1.0
+    
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get service performance metrics"""
         cache_hit_rate = (self.metrics["cache_hits"] / max(1, self.metrics["total_calls"])) * 100
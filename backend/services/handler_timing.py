@@ -0,0 +1,199 @@
+import os
+import random
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from services.metrics import format_labels, histogram_lines
+
+# Latency histogram upper bounds in seconds; one more bucket catches everything slower
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HANDLER = "handler"      # Inbound message type: time to handle it, its own broadcasts included
+BROADCAST = "broadcast"  # Outbound message type: role variants, encoding and enqueueing for every socket
+
+
+class LatencyHistogram:
+    """Count, payload bytes and a fixed-bucket latency histogram for one message type"""
+
+    __slots__ = ("count", "bytes", "max_bytes", "sampled", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.sampled = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, nbytes: int, seconds: Optional[float] = None):
+        self.count += 1
+        self.bytes += nbytes
+        if nbytes > self.max_bytes:
+            self.max_bytes = nbytes
+        if seconds is not None:
+            self.sampled += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def merge(self, other: "LatencyHistogram"):
+        self.count += other.count
+        self.bytes += other.bytes
+        self.max_bytes = max(self.max_bytes, other.max_bytes)
+        self.sampled += other.sampled
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th sample (the max for the overflow bucket)"""
+        if not self.sampled:
+            return None
+        rank = q * self.sampled
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(LATENCY_BUCKETS[index], self.max) if index < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 3) if seconds is not None else None
+
+        return {
+            "count": self.count,
+            "sampled": self.sampled,
+            "bytes_total": self.bytes,
+            "bytes_avg": round(self.bytes / self.count, 1) if self.count else 0,
+            "bytes_max": self.max_bytes,
+            "mean_ms": ms(self.total / self.sampled) if self.sampled else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p90_ms": ms(self.quantile(0.9)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if self.sampled else None,
+            "buckets": [  # [upper bound ms (None = slower), samples]
+                [ms(bound), count] for bound, count in zip(LATENCY_BUCKETS + (None,), self.buckets) if count
+            ]
+        }
+
+
+class HandlerTimings:
+    """
+    Per-room, per-message-type timing of the WebSocket handlers and of broadcast
+    - Off by default (HANDLER_TIMING_SAMPLE_RATE=0): callers check `rate` and skip
+      everything else, so a disabled instance costs one attribute read per message
+    - When on, every message is counted with its payload size (frame bytes in,
+      bytes queued across all recipients out) and a `rate` fraction is timed
+      into a latency histogram
+    - Process totals are kept next to the per-room figures; a room's figures
+      are dropped when it is deleted or hibernated
+    """
+
+    def __init__(self, rate: float = 0.0):
+        self.rate = rate
+        self.started_at = time.time()
+        self.totals: Dict[str, Dict[str, LatencyHistogram]] = {HANDLER: {}, BROADCAST: {}}
+        self.rooms: Dict[str, Dict[str, Dict[str, LatencyHistogram]]] = {}
+
+    @classmethod
+    def from_env(cls) -> "HandlerTimings":
+        return cls(rate=float(os.getenv("HANDLER_TIMING_SAMPLE_RATE", "0")))
+
+    def set_rate(self, rate: float):
+        self.rate = min(max(rate, 0.0), 1.0)
+
+    def sample(self) -> bool:
+        """Whether to time this message (only call while `rate` is set)"""
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    def record(self, kind: str, room_code: str, message_type: Optional[str], nbytes: int, elapsed: Optional[float] = None):
+        message_type = message_type or "unknown"
+
+        totals = self.totals[kind]
+        histogram = totals.get(message_type)
+        if histogram is None:
+            histogram = totals[message_type] = LatencyHistogram()
+        histogram.add(nbytes, elapsed)
+
+        room = self.rooms.get(room_code)
+        if room is None:
+            room = self.rooms[room_code] = {HANDLER: {}, BROADCAST: {}}
+        histogram = room[kind].get(message_type)
+        if histogram is None:
+            histogram = room[kind][message_type] = LatencyHistogram()
+        histogram.add(nbytes, elapsed)
+
+    def forget(self, room_code: str):
+        self.rooms.pop(room_code, None)
+
+    def reset(self):
+        self.started_at = time.time()
+        self.totals = {HANDLER: {}, BROADCAST: {}}
+        self.rooms.clear()
+
+    @staticmethod
+    def _describe(kinds: Dict[str, Dict[str, LatencyHistogram]]) -> Dict:
+        return {
+            kind: {
+                message_type: histogram.to_dict()
+                for message_type, histogram in sorted(histograms.items(), key=lambda item: -item[1].total)
+            }
+            for kind, histograms in kinds.items()
+        }
+
+    def get_stats(self, room_code: Optional[str] = None, top: int = 10) -> Dict:
+        stats = {
+            "sample_rate": self.rate,
+            "since": self.started_at,
+            "rooms_tracked": len(self.rooms)
+        }
+        if room_code is not None:
+            stats["room_code"] = room_code
+            stats.update(self._describe(self.rooms.get(room_code, {HANDLER: {}, BROADCAST: {}})))
+            return stats
+
+        stats.update(self._describe(self.totals))
+        busiest: List[Dict] = []
+        for code, kinds in self.rooms.items():
+            handled = LatencyHistogram()
+            for histogram in kinds[HANDLER].values():
+                handled.merge(histogram)
+            busiest.append({
+                "room_code": code,
+                "messages": handled.count,
+                "bytes_in": handled.bytes,
+                "sampled_ms": round(handled.total * 1000, 3)
+            })
+        stats["busiest_rooms"] = sorted(busiest, key=lambda room: (-room["sampled_ms"], -room["messages"]))[:top]
+        return stats
+
+    def prometheus_lines(self) -> List[str]:
+        """Process totals as Prometheus families (nothing until sampling has been on)"""
+        series = [
+            (kind, message_type, histogram)
+            for kind, histograms in self.totals.items()
+            for message_type, histogram in histograms.items()
+        ]
+        if not series:
+            return []
+        labelnames = ("kind", "type")
+        lines = [
+            "# HELP feedback_handler_messages_total Messages counted while handler timing was on",
+            "# TYPE feedback_handler_messages_total counter",
+            *(f"feedback_handler_messages_total{format_labels(labelnames, (kind, t))} {h.count}" for kind, t, h in series),
+            "# HELP feedback_handler_bytes_total Payload bytes counted while handler timing was on",
+            "# TYPE feedback_handler_bytes_total counter",
+            *(f"feedback_handler_bytes_total{format_labels(labelnames, (kind, t))} {h.bytes}" for kind, t, h in series),
+            "# HELP feedback_handler_seconds Sampled handler and broadcast latency",
+            "# TYPE feedback_handler_seconds histogram"
+        ]
+        for kind, message_type, histogram in series:
+            lines.extend(histogram_lines(
+                "feedback_handler_seconds", labelnames, (kind, message_type),
+                LATENCY_BUCKETS, histogram.buckets, histogram.total
+            ))
+        return lines
@@ -0,0 +1,87 @@
+import heapq
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class IdleIndex:
+    """
+    Deadline index for idle rooms (a min-heap with lazy updates)
+    - touch/set is an O(1) dict write while a key's deadline only moves later;
+      a heap entry is pushed only when it moves earlier
+    - Entries surface in deadline order: a stale one (deadline moved later) is
+      pushed back once, a due one is removed and `on_expire(key)` is called,
+      O(log n) each
+    - A single timer-wheel timer is armed for the earliest entry, so nothing
+      scans the room table
+    """
+
+    def __init__(self, wheel, on_expire: Callable[[str], None], clock: Callable[[], float] = time.monotonic):
+        self.wheel = wheel
+        self.on_expire = on_expire
+        self.clock = clock
+        self._deadlines: Dict[str, float] = {}
+        self._queued: Dict[str, float] = {}  # Earliest live heap entry per key
+        self._heap: List[Tuple[float, str]] = []
+        self._timer = None
+        self._armed_for: Optional[float] = None
+        self.metrics = {"expired": 0, "requeued": 0}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def deadline(self, key: str) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def touch(self, key: str, ttl: float):
+        self.set(key, self.clock() + ttl)
+
+    def set(self, key: str, deadline: float):
+        self._deadlines[key] = deadline
+        queued = self._queued.get(key)
+        if queued is None or deadline < queued:
+            self._queued[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+            if self._armed_for is None or deadline < self._armed_for:
+                self._arm()
+
+    def discard(self, key: str):
+        # Its heap entries go stale and are dropped when they surface
+        self._deadlines.pop(key, None)
+        self._queued.pop(key, None)
+
+    def _arm(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+            self._armed_for = None
+        if self._heap:
+            self._armed_for = self._heap[0][0]
+            self._timer = self.wheel.schedule(max(0.0, self._armed_for - self.clock()), self._expire_due)
+
+    def _expire_due(self):
+        self._timer = None
+        self._armed_for = None
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now:
+            queued, key = heapq.heappop(self._heap)
+            if self._queued.get(key) != queued:
+                continue  # Superseded by an earlier entry, or discarded
+            deadline = self._deadlines[key]
+            if deadline > now:
+                self._queued[key] = deadline
+                heapq.heappush(self._heap, (deadline, key))
+                self.metrics["requeued"] += 1
+                continue
+            self.discard(key)
+            self.metrics["expired"] += 1
+            try:
+                self.on_expire(key)
+            except Exception as e:
+                print(f"❌ Idle expiry failed for {key}: {e}")
+        self._arm()
+
+    def get_stats(self) -> Dict:
+        return {"tracked": len(self._deadlines), "heap_entries": len(self._heap), **self.metrics}
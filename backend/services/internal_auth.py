@@ -0,0 +1,40 @@
+import hmac
+import os
+import secrets
+from typing import Optional
+
+# Sent by app.supervisor on every call to a worker's /internal and /admin routes
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+def internal_token() -> str:
+    """
+    Shared secret for worker-only routes and the supervisor API (INTERNAL_TOKEN)
+    - Without one, a random token is generated for this process and logged,
+      so the routes stay closed unless the operator reads it from the log
+    """
+    token = os.getenv("INTERNAL_TOKEN")
+    if not token:
+        token = secrets.token_urlsafe(32)
+        print(f"🔑 INTERNAL_TOKEN not set; internal routes need {INTERNAL_TOKEN_HEADER}: {token}")
+    return token
+
+
+def is_internal_caller(token: str, presented: Optional[str]) -> bool:
+    """
+    Whether a request may use the internal routes: only a matching X-Internal-Token passes
+    (the peer address proves nothing: a local reverse proxy forwards from loopback)
+    """
+    if not token or presented is None:
+        return False
+    return hmac.compare_digest(presented.encode("utf-8"), token.encode("utf-8"))
+
+
+def header_value(head: bytes, name: str) -> Optional[str]:
+    """One header's value from a raw HTTP request head (None if absent)"""
+    wanted = name.lower().encode("latin-1")
+    for line in head.split(b"\r\n")[1:]:
+        key, separator, value = line.partition(b":")
+        if separator and key.strip().lower() == wanted:
+            return value.strip().decode("latin-1")
+    return None
@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from services.metrics import registry
+from services.task_context import running_task_tags
+
+LOOP_LAG = registry.histogram(
+    "feedback_event_loop_lag_seconds",
+    "How late the event loop ran a sleep that was due (scheduling delay)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_BLOCKS = registry.counter(
+    "feedback_event_loop_blocks_total",
+    "Times the event loop stayed blocked past LOOP_BLOCK_THRESHOLD, by what it was running",
+    ("source",)
+)
+
+# Innermost frames kept per incident; the outer ones are uvicorn and asyncio plumbing
+STACK_DEPTH = 25
+
+
+def loop_frames(frame):
+    """(dir/file.py, line, function) per frame, innermost first, down to the coroutine's caller"""
+    seen_code = False
+    while frame is not None:
+        code = frame.f_code
+        path = os.path.join(*code.co_filename.split(os.sep)[-2:])
+        in_asyncio = path.startswith("asyncio")
+        if (in_asyncio and seen_code) or path == os.path.join("asyncio", "runners.py"):
+            return  # Below the coroutine (or uvloop's C loop): just the runner, uvicorn and click
+        seen_code = seen_code or not in_asyncio
+        yield path, frame.f_lineno, code.co_name
+        frame = frame.f_back
+
+
+def format_frame_stack(frame, depth: int = STACK_DEPTH) -> List[str]:
+    """`dir/file.py:line function` per frame, innermost first"""
+    return [f"{path}:{line} {name}" for path, line, name in itertools.islice(loop_frames(frame), depth)]
+
+
+class LoopLagMonitor:
+    """
+    Samples event-loop scheduling delay and catches blocking calls
+    - A task sleeps `interval` seconds and measures how much later than due it
+      woke up; anything running on the loop in between (a sync LLM call, a big
+      clustering pass) shows up as lag
+    - Every sample goes into the feedback_event_loop_lag_seconds histogram;
+      the last and worst values are kept for /health
+    - A watchdog thread pings the loop (call_soon_threadsafe); when a ping is
+      `threshold` seconds unanswered it captures the loop thread's stack and
+      the running task's tags (room, message type, agent) as an incident
+    - The late answer closes the incident with the full blocked time; the last
+      `max_incidents` are kept for /admin/loop/incidents
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.25, max_incidents: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._answered = 0.0
+        self._open_incident: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self.incidents: Deque[Dict] = deque(maxlen=max_incidents)
+        self.metrics = {"samples": 0, "last_lag_ms": 0.0, "max_lag_ms": 0.0, "incidents": 0}
+
+    @classmethod
+    def from_env(cls) -> "LoopLagMonitor":
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL", "0.5")),
+            threshold=float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25")),
+            max_incidents=int(os.getenv("LOOP_BLOCK_INCIDENTS", "50"))
+        )
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if not self._task and self.interval > 0:
+            self._task = asyncio.create_task(self._sample())
+        if not self._watchdog and self.threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def _sample(self):
+        while True:
+            due = time.perf_counter() + self.interval
+            try:
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                break
+            lag = max(0.0, time.perf_counter() - due)
+            LOOP_LAG.observe(lag)
+            self.metrics["samples"] += 1
+            self.metrics["last_lag_ms"] = round(lag * 1000, 2)
+            if self.metrics["last_lag_ms"] > self.metrics["max_lag_ms"]:
+                self.metrics["max_lag_ms"] = self.metrics["last_lag_ms"]
+
+    def _watch(self):
+        """Watchdog thread: pings the loop and, if the ping goes unanswered, reads its stack"""
+        check_every = min(self.threshold / 2, 0.1)
+        while True:
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(self._pong, sent)
+            except RuntimeError:  # Loop closed
+                return
+            reported = False
+            while self._answered < sent:
+                time.sleep(check_every)
+                overdue = time.perf_counter() - sent
+                if not reported and self._answered < sent and overdue >= self.threshold:
+                    self._capture(sent, overdue)
+                    reported = True
+            time.sleep(check_every)
+
+    def _pong(self, sent: float):
+        with self._lock:
+            self._answered = sent
+            if self._open_incident is not None:
+                self._open_incident["blocked_ms"] = round((time.perf_counter() - sent) * 1000, 2)
+                self._open_incident = None
+
+    def _capture(self, sent: float, overdue: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        tags = running_task_tags(self._loop)
+        source = tags.get("agent") or tags.get("message_type") or tags.get("activity") or "unknown"
+        incident = {
+            "detected_at": datetime.now().isoformat(),
+            "overdue_ms": round(overdue * 1000, 2),
+            "blocked_ms": None,  # Filled in when the loop gets going again
+            "room_code": tags.get("room_code"),
+            "message_type": tags.get("message_type"),
+            "agent": tags.get("agent"),
+            "activity": tags.get("activity"),
+            "task": tags.get("task"),
+            "stack": format_frame_stack(frame) if frame is not None else []
+        }
+        with self._lock:
+            if self._answered >= sent:  # The loop got going while the stack was being read
+                incident["blocked_ms"] = incident["overdue_ms"]
+            else:
+                self._open_incident = incident
+            self.incidents.append(incident)
+        self.metrics["incidents"] += 1
+        LOOP_BLOCKS.labels(source).inc()
+        print(f"🐢 Event loop blocked {incident['overdue_ms']:.0f}ms+ in "
+              f"{incident['room_code'] or '-'}/{source}: {incident['stack'][0] if incident['stack'] else '?'}")
+
+    def get_incidents(self, room_code: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent first"""
+        with self._lock:
+            incidents = [dict(incident) for incident in reversed(self.incidents)]
+        if room_code is not None:
+            incidents = [incident for incident in incidents if incident["room_code"] == room_code]
+        return incidents[:limit]
+
+    def get_stats(self) -> Dict:
+        return {"interval_seconds": self.interval, "block_threshold_seconds": self.threshold, **self.metrics}
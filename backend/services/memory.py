@@ -0,0 +1,202 @@
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# First matching prefix (relative to backend/) names the subsystem of an allocation
+SUBSYSTEMS = (
+    ("agents/", "agents"),
+    ("services/records.py", "room_state"),
+    ("services/question_ranking.py", "room_state"),
+    ("services/analysis_", "analysis"),
+    ("services/gemini_service.py", "gemini"),
+    ("services/event_archive.py", "archive"),
+    ("services/snapshots.py", "snapshots"),
+    ("services/backplane.py", "backplane"),
+    ("services/wire_protocol.py", "wire"),
+    ("services/timer_wheel.py", "timers"),
+    ("services/rate_limit.py", "rate_limit"),
+    ("services/memory.py", "memory"),
+    ("app/", "rooms"),
+)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate retained size of an object tree (shared objects counted once per `seen`)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += deep_sizeof(vars(obj), seen)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+class MemoryBudget:
+    """
+    Per-room and process-wide budgets for room state
+    - Every `interval` seconds each room's approximate usage is measured;
+      a room over ROOM_MEMORY_BUDGET_MB sheds data down to 3/4 of it
+    - If all rooms together exceed MEMORY_BUDGET_MB, the largest rooms are
+      halved until the total fits
+    - Rooms shed derived data first (view cache, agent caches), then their
+      oldest reactions and questions (RoomManager.reduce_memory)
+    - Only room state counts toward the budgets; queued outbound frames are
+      reported (deduplicated) but never trigger a trim, which could not free them
+    """
+
+    def __init__(self, room_budget: int, global_budget: int, interval: float = 30.0):
+        self.room_budget = room_budget
+        self.global_budget = global_budget
+        self.interval = interval
+        self.largest_rooms: List[Dict[str, Any]] = []
+        self.metrics = {
+            "checks": 0,
+            "rooms_trimmed": 0,
+            "bytes_reclaimed": 0,
+            "rooms_bytes": 0,
+            "outbound_bytes": 0,
+            "last_check_ms": 0.0
+        }
+
+    @classmethod
+    def from_env(cls) -> "MemoryBudget":
+        megabyte = 1024 * 1024
+        return cls(
+            room_budget=int(float(os.getenv("ROOM_MEMORY_BUDGET_MB", "2")) * megabyte),
+            global_budget=int(float(os.getenv("MEMORY_BUDGET_MB", "512")) * megabyte),
+            interval=float(os.getenv("MEMORY_CHECK_INTERVAL", "30"))
+        )
+
+    async def enforce(self, rooms: Iterable):
+        started = time.perf_counter()
+        usage = {}
+        outbound = 0
+        for index, room in enumerate(list(rooms)):
+            room_usage = room.memory_usage()
+            total = room_usage["total"]
+            outbound += room_usage["outbound_queues"]
+            if total > self.room_budget:
+                total -= self._trim(room, self.room_budget * 3 // 4)
+            usage[room] = total
+            if index % 50 == 49:
+                await asyncio.sleep(0)  # Long room lists: let sockets run between batches
+
+        grand_total = sum(usage.values())
+        if grand_total > self.global_budget:
+            for room in sorted(usage, key=usage.get, reverse=True):
+                if grand_total <= self.global_budget:
+                    break
+                reclaimed = self._trim(room, usage[room] // 2)
+                usage[room] -= reclaimed
+                grand_total -= reclaimed
+
+        self.largest_rooms = [
+            {"room_code": room.room_code, "bytes": size}
+            for room, size in sorted(usage.items(), key=lambda item: item[1], reverse=True)[:5]
+        ]
+        self.metrics["checks"] += 1
+        self.metrics["rooms_bytes"] = grand_total
+        self.metrics["outbound_bytes"] = outbound
+        self.metrics["last_check_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _trim(self, room, target: int) -> int:
+        reclaimed = room.reduce_memory(target)
+        if reclaimed > 0:
+            self.metrics["rooms_trimmed"] += 1
+            self.metrics["bytes_reclaimed"] += reclaimed
+            print(f"🧽 Room {room.room_code} over memory budget, shed {reclaimed / 1024:.0f} KiB")
+        return max(0, reclaimed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "room_budget_bytes": self.room_budget,
+            "global_budget_bytes": self.global_budget,
+            "largest_rooms": self.largest_rooms,
+            **self.metrics
+        }
+
+
+def subsystem_of(traceback: tracemalloc.Traceback) -> str:
+    """Most recent frame inside backend/ decides; otherwise the library that allocated"""
+    for frame in reversed(traceback):
+        path = Path(frame.filename)
+        try:
+            relative = path.resolve().relative_to(BACKEND_DIR).as_posix()
+        except ValueError:
+            continue
+        for prefix, name in SUBSYSTEMS:
+            if relative.startswith(prefix):
+                return name
+        return "other"
+
+    filename = traceback[-1].filename if len(traceback) else ""
+    if "site-packages" in filename:
+        return "lib:" + filename.split("site-packages", 1)[1].strip("/\\").split("/")[0].split(".")[0]
+    return "python"
+
+
+async def tracemalloc_diff(seconds: float = 10.0, limit: int = 10, frames: int = 25) -> Dict[str, Any]:
+    """
+    Memory allocated and still alive after a `seconds` window, grouped by subsystem
+    Tracing is switched on only for the window (unless it was already on),
+    since it slows every allocation down
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = await asyncio.to_thread(tracemalloc.take_snapshot)
+        await asyncio.sleep(seconds)
+        after = await asyncio.to_thread(tracemalloc.take_snapshot)
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    stats = await asyncio.to_thread(after.compare_to, before, "traceback")
+    groups: Dict[str, Dict[str, Any]] = {}
+    for stat in stats:
+        if not stat.size_diff and not stat.count_diff:
+            continue
+        name = subsystem_of(stat.traceback)
+        group = groups.setdefault(name, {"size_diff": 0, "count_diff": 0, "top": []})
+        group["size_diff"] += stat.size_diff
+        group["count_diff"] += stat.count_diff
+        group["top"].append(stat)
+
+    for group in groups.values():
+        group["top"] = [
+            {
+                "location": f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff
+            }
+            for stat in sorted(group["top"], key=lambda s: abs(s.size_diff), reverse=True)[:limit]
+        ]
+
+    return {
+        "window_seconds": seconds,
+        "started_tracing": started_here,
+        "total_size_diff": sum(group["size_diff"] for group in groups.values()),
+        "subsystems": dict(sorted(groups.items(), key=lambda item: abs(item[1]["size_diff"]), reverse=True))
+    }
@@ -0,0 +1,234 @@
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; suits handlers, fan-out, agent passes and LLM calls alike
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def histogram_lines(name: str, labelnames: Sequence[str], labelvalues: Sequence[str],
+                    bounds: Sequence[float], counts: Sequence[int], total: float) -> List[str]:
+    """Exposition lines for one histogram series from per-bucket (non-cumulative) counts"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(bounds) + [math.inf], counts):
+        cumulative += count
+        labels = format_labels([*labelnames, "le"], [*labelvalues, format_value(bound)])
+        lines.append(f"{name}_bucket{labels} {cumulative}")
+    labels = format_labels(labelnames, labelvalues)
+    lines.append(f"{name}_sum{labels} {format_value(total)}")
+    lines.append(f"{name}_count{labels} {cumulative}")
+    return lines
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Metric:
+    """A metric family; `labels(...)` returns (and keeps) the child for one label set"""
+
+    kind = "untyped"
+    child_class = CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, values)} {format_value(child.value)}"
+            for values, child in self.children.items()
+        ]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+    child_class = CounterChild
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    child_class = GaugeChild
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in self.children.items():
+            lines.extend(histogram_lines(self.name, self.labelnames, values, child.bounds, child.counts, child.sum))
+        return lines
+
+
+class GaugeFunction(Metric):
+    """A gauge read at scrape time from an O(1) callback (a len(), a running total)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], object], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        if not self.labelnames:
+            return [f"{self.name} {format_value(value)}"]
+        return [
+            f"{self.name}{format_labels(self.labelnames, values)} {format_value(sample)}"
+            for values, sample in value.items()
+        ]
+
+
+class MetricsRegistry:
+    """
+    Process-wide metric families rendered in the Prometheus text format
+    - Values are maintained incrementally where events happen (counters,
+      gauges moved on connect/disconnect, histograms observed once per event),
+      so a scrape never walks rooms or connections
+    - Collectors add families owned elsewhere (e.g. the handler timings)
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_function(self, name: str, documentation: str, read: Callable[[], object],
+                       labelnames: Sequence[str] = ()) -> GaugeFunction:
+        return self._register(GaugeFunction(name, documentation, read, labelnames))
+
+    def add_collector(self, collect: Callable[[], Iterable[str]]):
+        self.collectors.append(collect)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self.metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Shared by the services and the app: lookups on every cache whose hit ratio matters
+CACHE_LOOKUPS = registry.counter(
+    "feedback_cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result")
+)
@@ -0,0 +1,96 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from services.loop_lag import loop_frames
+from services.task_context import running_task_tags
+
+IDLE = "(idle)"  # The loop is waiting in select(): nothing to run
+
+# Task tags turned into root frames, outermost first: (tag, frame prefix)
+ROOT_TAGS = (("room_code", "room"), ("agent", "agent"), ("activity", "activity"), ("message_type", "message"))
+
+
+class SamplingProfiler:
+    """
+    On-demand, time-boxed sampling profiler for the event-loop thread
+    - Nothing is installed while it is off: no trace hooks, timers or threads.
+      A profile samples from an executor thread for `seconds` and stops
+    - Every `interval` the thread reads the loop thread's stack with
+      sys._current_frames() and the running task's tags, and counts it as one
+      collapsed stack (`room:X;agent:Y;outer;...;inner`, the flamegraph.pl /
+      speedscope input format)
+    - The room, agent and activity tags become root frames, so a flame graph
+      splits by room first; `room_code` keeps only that room's samples
+    - One profile at a time per worker; samples are taken between bytecodes,
+      so a busy loop is sampled at most every sys.getswitchinterval()
+    """
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self.running = False
+        self.metrics = {"profiles": 0, "samples": 0}
+
+    async def profile(self, seconds: float, interval: float = 0.005,
+                      room_code: Optional[str] = None, lines: bool = False) -> Optional[Dict]:
+        """Profile the calling loop for `seconds` (None if a profile is already running)"""
+        if self.running:
+            return None
+        self.running = True  # Checked and set on the loop thread, so no lock
+        try:
+            loop = asyncio.get_running_loop()
+            return await asyncio.to_thread(
+                self._sample, loop, threading.get_ident(), min(seconds, self.max_seconds), interval, room_code, lines
+            )
+        finally:
+            self.running = False
+
+    def _sample(self, loop: asyncio.AbstractEventLoop, thread_id: int, seconds: float, interval: float,
+                room_code: Optional[str], lines: bool) -> Dict:
+        stacks: Counter = Counter()
+        rooms: Counter = Counter()
+        taken = skipped = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            tags = running_task_tags(loop)
+            stack = self._collapse(sys._current_frames().get(thread_id), tags, lines)
+            taken += 1
+            if room_code is not None and tags.get("room_code") != room_code:
+                skipped += 1
+            else:
+                stacks[stack] += 1
+                if stack != IDLE:
+                    rooms[tags.get("room_code") or "-"] += 1
+            time.sleep(interval)
+
+        self.metrics["profiles"] += 1
+        self.metrics["samples"] += taken
+        return {
+            "seconds": round(time.perf_counter() - started, 3),
+            "interval_seconds": interval,
+            "samples": taken,
+            "samples_filtered_out": skipped,
+            "idle_samples": stacks.get(IDLE, 0),
+            "rooms": dict(rooms.most_common()),
+            "stacks": dict(stacks.most_common())
+        }
+
+    @staticmethod
+    def _collapse(frame, tags: Dict, lines: bool) -> str:
+        frames: List[str] = [
+            (f"{path}:{name}:{line}" if lines else f"{path}:{name}").replace(" ", "_")
+            for path, line, name in loop_frames(frame)
+        ]
+        if not frames or (len(frames) == 1 and frames[0].split(":")[1] == "select"):
+            return IDLE
+        roots = [f"{label}:{tags[key]}" for key, label in ROOT_TAGS if tags.get(key)]
+        return ";".join(roots + frames[::-1])
+
+
+def collapsed_text(profile: Dict) -> str:
+    """One `stack count` line per distinct stack, for flamegraph.pl, speedscope or inferno"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
@@ -0,0 +1,106 @@
+import math
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+
+class QuestionRanking:
+    """
+    Incrementally maintained "hot questions" index
+    - Hot score = upvotes + upvote velocity, with exponential time decay
+    - Updated on every add/upvote without a re-sort: a binary search plus one
+      list delete/insert, O(n) for the element shift (a memmove over at most
+      the room's 100 questions)
+    - Top-K read is a slice of an always-sorted list
+
+    Unlike Hacker News' polynomial gravity, every event weight decays with
+    the same exponential factor, so the relative order of two questions only
+    changes when one of them receives an event. Weights are stored relative
+    to a shared epoch (w = e^(rate * (t - epoch))) and rebased before they
+    can overflow.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 5,
+        half_life_seconds: float = 600.0,
+        question_weight: float = 1.0,
+        upvote_weight: float = 1.0
+    ):
+        self.top_k = top_k
+        self.half_life_seconds = half_life_seconds
+        self.question_weight = question_weight  # Fresh questions get a head start
+        self.upvote_weight = upvote_weight
+
+        self._rate = math.log(2) / half_life_seconds
+        self._epoch = time.time()
+        self._max_exponent = 500  # e^500 is still far from float overflow
+
+        self._scores: Dict[str, float] = {}
+        self._ranked: List[Tuple[float, str]] = []  # (-score, question_id), ascending
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self._scores
+
+    def add(self, question_id: str, timestamp: Optional[float] = None):
+        """Register a new question (no-op if already ranked)"""
+        if question_id in self._scores:
+            return
+        score = self.question_weight * self._event_weight(timestamp)
+        self._scores[question_id] = score
+        insort(self._ranked, (-score, question_id))
+
+    def upvote(self, question_id: str, timestamp: Optional[float] = None):
+        """Add one upvote worth of weight at the given time"""
+        if question_id not in self._scores:
+            self.add(question_id, timestamp)
+        self._bump(question_id, self.upvote_weight * self._event_weight(timestamp))
+
+    def remove(self, question_id: str):
+        """Drop a question (e.g. evicted from the room buffer)"""
+        score = self._scores.pop(question_id, None)
+        if score is None:
+            return
+        index = bisect_left(self._ranked, (-score, question_id))
+        if index < len(self._ranked) and self._ranked[index][1] == question_id:
+            del self._ranked[index]
+
+    def top_ids(self, limit: Optional[int] = None) -> List[str]:
+        """Question ids of the current top-K, hottest first"""
+        return [question_id for _, question_id in self._ranked[:limit or self.top_k]]
+
+    def hot_score(self, question_id: str, now: Optional[float] = None) -> float:
+        """Decayed hot score as of `now` (comparable across questions)"""
+        score = self._scores.get(question_id, 0.0)
+        if not score:
+            return 0.0
+        now = now if now is not None else time.time()
+        return score * math.exp(-self._rate * (now - self._epoch))
+
+    def _bump(self, question_id: str, delta: float):
+        old_score = self._scores[question_id]
+        index = bisect_left(self._ranked, (-old_score, question_id))
+        if index < len(self._ranked) and self._ranked[index][1] == question_id:
+            del self._ranked[index]
+
+        new_score = old_score + delta
+        self._scores[question_id] = new_score
+        insort(self._ranked, (-new_score, question_id))
+
+    def _event_weight(self, timestamp: Optional[float]) -> float:
+        timestamp = timestamp if timestamp is not None else time.time()
+        exponent = self._rate * (timestamp - self._epoch)
+        if exponent > self._max_exponent:
+            self._rebase(timestamp)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, new_epoch: float):
+        """Move the epoch forward; uniform rescale keeps the order intact"""
+        factor = math.exp(-self._rate * (new_epoch - self._epoch))
+        self._epoch = new_epoch
+        self._scores = {qid: score * factor for qid, score in self._scores.items()}
+        self._ranked = [(neg_score * factor, qid) for neg_score, qid in self._ranked]
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# (tokens per second, burst) per message type; "*" applies to every message
+DEFAULT_LIMITS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "*": {"connection": (20.0, 40.0)},
+    "reaction": {"connection": (5.0, 10.0), "user": (5.0, 10.0)},
+    "question": {"connection": (0.2, 3.0), "user": (0.2, 3.0)},
+    "upvote_question": {"connection": (2.0, 10.0), "user": (2.0, 10.0)},
+    "vote_poll": {"connection": (1.0, 3.0), "user": (1.0, 3.0)},
+    "create_poll": {"connection": (0.1, 2.0)},
+    "request_ai_analysis": {"connection": (0.1, 1.0)},
+    "get_stats": {"connection": (2.0, 5.0)},
+    "ping": {"connection": (1.0, 5.0)},
+}
+
+# Every rejection costs a strike; a connection that runs out of strikes is cut off
+STRIKE_LIMIT = (2.0, 100.0)
+
+
+class TokenBucket:
+    """Lazy-refill token bucket (no timers, O(1) per check)"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float, cost: float = 1.0) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def retry_after(self, cost: float = 1.0) -> float:
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate else float("inf")
+
+
+class ConnectionLimits:
+    """Per-socket buckets, created lazily per message type"""
+
+    __slots__ = ("buckets", "strikes", "rejected", "last_notified")
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.strikes = TokenBucket(*STRIKE_LIMIT)
+        self.rejected = 0
+        self.last_notified: Dict[str, float] = {}
+
+
+class RateLimiter:
+    """
+    Ingress limits for one room
+    - Connection scope: buckets live on the socket (ConnectionLimits)
+    - User scope: buckets keyed by (user_id, message_type), shared by all of
+      a user's sockets in the room; LRU-bounded since user ids are client-supplied
+    """
+
+    def __init__(self, limits: Optional[Dict] = None, max_users: int = 10000, notify_interval: float = 1.0):
+        self.limits = limits or DEFAULT_LIMITS
+        self.max_users = max_users
+        self.notify_interval = notify_interval
+        self._user_buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.rejected: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """RATE_LIMITS='{"reaction": {"connection": [10, 20]}}' overrides per type and scope"""
+        limits = {message_type: dict(scopes) for message_type, scopes in DEFAULT_LIMITS.items()}
+        overrides = os.getenv("RATE_LIMITS")
+        if overrides:
+            for message_type, scopes in json.loads(overrides).items():
+                limits.setdefault(message_type, {}).update(
+                    {scope: tuple(value) for scope, value in scopes.items()}
+                )
+        return cls(limits)
+
+    def check(self, connection: ConnectionLimits, message_type: str, user_id: Optional[str] = None) -> Optional[float]:
+        """None if allowed, otherwise seconds until the client may retry"""
+        now = time.monotonic()
+
+        for key in ("*", message_type):
+            policy = self.limits.get(key)
+            if not policy:
+                continue
+
+            if "connection" in policy:
+                bucket = connection.buckets.get(key)
+                if bucket is None:
+                    bucket = connection.buckets[key] = TokenBucket(*policy["connection"])
+                if not bucket.take(now):
+                    return self._reject(connection, message_type, bucket)
+
+            if user_id and "user" in policy:
+                bucket = self._user_bucket(user_id, key, policy["user"])
+                if not bucket.take(now):
+                    return self._reject(connection, message_type, bucket)
+
+        return None
+
+    def _user_bucket(self, user_id: str, message_type: str, limit: Tuple[float, float]) -> TokenBucket:
+        key = (user_id, message_type)
+        bucket = self._user_buckets.get(key)
+        if bucket is None:
+            bucket = self._user_buckets[key] = TokenBucket(*limit)
+            if len(self._user_buckets) > self.max_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(key)
+        return bucket
+
+    def _counter_key(self, message_type: str) -> str:
+        # Unknown types share one key so clients cannot grow these dicts
+        return message_type if message_type in self.limits else "*"
+
+    def _reject(self, connection: ConnectionLimits, message_type: str, bucket: TokenBucket) -> float:
+        connection.rejected += 1
+        key = self._counter_key(message_type)
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        return bucket.retry_after()
+
+    def should_notify(self, connection: ConnectionLimits, message_type: str) -> bool:
+        """At most one rejection frame per type per interval, so rejecting stays cheap"""
+        key = self._counter_key(message_type)
+        now = time.monotonic()
+        if now - connection.last_notified.get(key, 0.0) < self.notify_interval:
+            return False
+        connection.last_notified[key] = now
+        return True
+
+    def is_abusive(self, connection: ConnectionLimits) -> bool:
+        """Spend a strike for a rejection; True once the connection has none left"""
+        return not connection.strikes.take(time.monotonic())
@@ -0,0 +1,228 @@
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Append-only: the index is the stored reaction code
+REACTION_TYPES = ("speed_up", "slow_down", "show_code", "im_lost")
+REACTION_CODES = {reaction_type: code for code, reaction_type in enumerate(REACTION_TYPES)}
+
+
+def iso_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def epoch_time(value) -> float:
+    """Epoch seconds from a wire timestamp (ISO string) or a number"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def anonymous_id(timestamp: float) -> str:
+    # Same shape as the ids handed out before records were compacted; rounded to the
+    # wire timestamp's microseconds so it survives a snapshot or relay round trip
+    return f"anon-{round(timestamp, 6)}"
+
+
+def stored_user_id(user_id: Optional[str], timestamp: float) -> Optional[str]:
+    """User id to keep for a wire reaction: None for the `anonymous_id` placeholder, client ids as given"""
+    if user_id and user_id.startswith("anon-"):
+        try:
+            if abs(float(user_id[5:]) - timestamp) < 1e-5:
+                return None
+        except ValueError:
+            pass
+    return user_id
+
+
+class ReactionLog:
+    """
+    Array-backed reaction buffer for one room
+    - Parallel columns: float64 timestamps, one byte per reaction type, user ids
+      (None for anonymous users), kept sorted by timestamp
+    - Wire dicts fill in an `anonymous_id` placeholder for reactions without a
+      user id; `stored_user_id` maps it back to None on load and on relay, and
+      keeps any client-supplied id (`anon-...` included) as given
+    - Only the last `capacity` reactions are visible; the columns are trimmed
+      in batches so appends stay amortized O(1)
+    - Window queries bisect the timestamp column and count type codes at C speed
+    """
+
+    __slots__ = ("room_code", "capacity", "_ts", "_codes", "_users")
+
+    def __init__(self, room_code: str, capacity: int = 300):
+        self.room_code = sys.intern(room_code)
+        self.capacity = capacity
+        self._ts = array("d")
+        self._codes = bytearray()
+        self._users: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return min(len(self._ts), self.capacity)
+
+    def append(self, reaction_type: str, timestamp: Optional[float] = None, user_id: Optional[str] = None) -> Optional[int]:
+        """Record one reaction; returns its position, or None for an unknown type"""
+        code = REACTION_CODES.get(reaction_type)
+        if code is None:
+            return None
+        if timestamp is None:
+            timestamp = time.time()
+
+        if not self._ts or timestamp >= self._ts[-1]:
+            position = len(self._ts)
+            self._ts.append(timestamp)
+            self._codes.append(code)
+            self._users.append(user_id)
+        else:
+            # Late arrival relayed from another worker: keep the column sorted
+            position = bisect_right(self._ts, timestamp)
+            self._ts.insert(position, timestamp)
+            self._codes.insert(position, code)
+            self._users.insert(position, user_id)
+
+        if len(self._ts) >= 2 * self.capacity:
+            excess = len(self._ts) - self.capacity
+            del self._ts[:excess]
+            del self._codes[:excess]
+            del self._users[:excess]
+            position -= excess
+        return position
+
+    def append_dict(self, reaction: Dict) -> Optional[int]:
+        timestamp = epoch_time(reaction["timestamp"])
+        return self.append(reaction["type"], timestamp, stored_user_id(reaction.get("user_id"), timestamp))
+
+    def to_dict(self, position: int) -> Dict:
+        timestamp = self._ts[position]
+        return {
+            "type": REACTION_TYPES[self._codes[position]],
+            "timestamp": iso_time(timestamp),
+            "user_id": self._users[position] or anonymous_id(timestamp),
+            "room_code": self.room_code
+        }
+
+    def _window_start(self, seconds: Optional[float], now: Optional[float]) -> int:
+        first = max(0, len(self._ts) - self.capacity)
+        if seconds is None:
+            return first
+        cutoff = (now if now is not None else time.time()) - seconds
+        return max(first, bisect_left(self._ts, cutoff))
+
+    def recent(self, seconds: Optional[float] = None, now: Optional[float] = None) -> List[Dict]:
+        """Reactions of the last `seconds` (all visible ones if None), as wire dicts"""
+        return [self.to_dict(i) for i in range(self._window_start(seconds, now), len(self._ts))]
+
+    def counts(self, seconds: Optional[float] = None, now: Optional[float] = None) -> Dict[str, int]:
+        window = self._codes[self._window_start(seconds, now):]
+        return {reaction_type: window.count(code) for code, reaction_type in enumerate(REACTION_TYPES)}
+
+    def drop_oldest(self, count: int) -> int:
+        """Forget the `count` oldest visible reactions (memory pressure); returns how many went"""
+        first = max(0, len(self._ts) - self.capacity)
+        end = min(len(self._ts), first + max(0, count))
+        del self._ts[:end]
+        del self._codes[:end]
+        del self._users[:end]
+        return end - first
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the columns (user id strings included, counted once)"""
+        users = {id(user): user for user in self._users if user is not None}
+        return (sys.getsizeof(self._ts) + sys.getsizeof(self._codes) + sys.getsizeof(self._users)
+                + sum(sys.getsizeof(user) for user in users.values()))
+
+    def export(self) -> List[Dict]:
+        return self.recent()
+
+    def load(self, reactions: List[Dict]):
+        for reaction in reactions:
+            if reaction.get("type") in REACTION_CODES:
+                self.append_dict(reaction)
+
+
+class Question:
+    """One audience question; the wire dict is built only when it is sent or saved"""
+
+    __slots__ = ("id", "text", "timestamp", "user_id", "upvotes", "upvoted_by", "room_code")
+
+    def __init__(self, id: str, text: str, timestamp: float, user_id: Optional[str], room_code: str,
+                 upvotes: int = 0, upvoted_by: Optional[List[str]] = None):
+        self.id = id
+        self.text = text
+        self.timestamp = timestamp
+        self.user_id = user_id
+        self.room_code = sys.intern(room_code)
+        self.upvotes = upvotes
+        self.upvoted_by = upvoted_by if upvoted_by is not None else []
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Question":
+        return cls(
+            data["id"],
+            data["text"],
+            epoch_time(data["timestamp"]),
+            data.get("user_id"),
+            data.get("room_code", ""),
+            data.get("upvotes", 0),
+            list(data.get("upvoted_by", []))
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "timestamp": iso_time(self.timestamp),
+            "user_id": self.user_id or anonymous_id(self.timestamp),
+            "upvotes": self.upvotes,
+            "upvoted_by": list(self.upvoted_by),
+            "room_code": self.room_code
+        }
+
+
+class Poll:
+    """The room's current yes/no poll"""
+
+    __slots__ = ("id", "text", "active", "yes_votes", "no_votes", "voted_users", "started_at", "duration", "room_code")
+
+    def __init__(self, id: str, text: str, started_at: float, duration: float, room_code: str,
+                 active: bool = True, yes_votes: int = 0, no_votes: int = 0,
+                 voted_users: Optional[List[str]] = None):
+        self.id = id
+        self.text = text
+        self.started_at = started_at
+        self.duration = duration
+        self.room_code = sys.intern(room_code)
+        self.active = active
+        self.yes_votes = yes_votes
+        self.no_votes = no_votes
+        self.voted_users = voted_users if voted_users is not None else []
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Poll":
+        return cls(
+            data["id"],
+            data.get("text", ""),
+            epoch_time(data["started_at"]),
+            data.get("duration", 30),
+            data.get("room_code", ""),
+            data.get("active", True),
+            data.get("yes_votes", 0),
+            data.get("no_votes", 0),
+            list(data.get("voted_users", []))
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "active": self.active,
+            "yes_votes": self.yes_votes,
+            "no_votes": self.no_votes,
+            "voted_users": list(self.voted_users),
+            "started_at": iso_time(self.started_at),
+            "duration": self.duration,
+            "room_code": self.room_code
+        }
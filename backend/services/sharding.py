@@ -0,0 +1,90 @@
+import hashlib
+import posixpath
+import re
+from bisect import bisect, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+# /ws/{room_code} and /api/rooms/{room_code}/... are owned by a single worker
+ROOM_PATH_PATTERN = re.compile(r"^/(?:ws|api/rooms)/([^/?#]+)")
+
+
+# Room codes as used in paths, channels and ARCHIVE_DIR/{room_code}/ (upper-cased first)
+ROOM_CODE_PATTERN = re.compile(r"^[A-Z0-9_-]{1,32}$")
+
+
+def valid_room_code(room_code: str) -> Optional[str]:
+    """The upper-cased room code, or None if it is not one (e.g. `..` from `/ws/%2E%2E`)"""
+    room_code = room_code.upper()
+    return room_code if ROOM_CODE_PATTERN.match(room_code) else None
+
+
+def normalize_path(path: str) -> str:
+    """
+    The path a worker will route, from a raw request target path
+    - Percent-decoded (uvicorn decodes before routing), repeated slashes
+      collapsed and dot segments resolved, so `/%69nternal/..` and
+      `//internal/./x` match the same prefixes as `/internal/x`
+    """
+    normalized = posixpath.normpath("/" + re.sub(r"/+", "/", unquote(path)).lstrip("/"))
+    return "/" if normalized in (".", "//") else normalized
+
+
+def room_code_from_path(path: str) -> Optional[str]:
+    """Room code addressed by a request path, or None for room-less routes"""
+    match = ROOM_PATH_PATTERN.match(path)
+    return match.group(1).upper() if match else None
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping room codes to worker ids
+    - Each worker owns `virtual_nodes` points on the ring for an even spread
+    - Adding a worker only moves the rooms that land on its new points
+      (~1/N of them); every other room keeps its owner
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 128):
+        self.virtual_nodes = virtual_nodes
+        self._points: List[Tuple[int, str]] = []
+        self._nodes: Dict[str, None] = {}  # Insertion-ordered set
+        for node in nodes:
+            self.add_node(node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add_node(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes[node] = None
+        for replica in range(self.virtual_nodes):
+            insort(self._points, (self._hash(f"{node}#{replica}"), node))
+
+    def remove_node(self, node: str):
+        if node in self._nodes:
+            del self._nodes[node]
+            self._points = [point for point in self._points if point[1] != node]
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("Hash ring has no workers")
+        index = bisect(self._points, (self._hash(key), "")) % len(self._points)
+        return self._points[index][1]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(virtual_nodes=self.virtual_nodes)
+        ring._points = list(self._points)
+        ring._nodes = dict(self._nodes)
+        return ring
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:  # Falls back to JSON bodies
+    msgpack = None
+
+SNAPSHOT_MAGIC = b"APS1"
+CODEC_MSGPACK = b"m"
+CODEC_JSON = b"j"
+SNAPSHOT_SUFFIX = ".snap"
+
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    """Serialize a room state (cheap, done on the event loop)"""
+    if msgpack is not None:
+        return CODEC_MSGPACK + msgpack.packb(state, use_bin_type=True)
+    return CODEC_JSON + json.dumps(state, separators=(",", ":")).encode("utf-8")
+
+
+def decode_snapshot(body: bytes) -> Dict[str, Any]:
+    codec, payload = body[:1], body[1:]
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Snapshot was written with msgpack, which is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def compress_snapshot(body: bytes, level: int = 1) -> bytes:
+    return SNAPSHOT_MAGIC + zlib.compress(body, level)
+
+
+def decompress_snapshot(blob: bytes) -> bytes:
+    if not blob.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a room snapshot")
+    return zlib.decompress(blob[len(SNAPSHOT_MAGIC):])
+
+
+class FrozenRoom:
+    """
+    An idle room kept in memory as one compressed snapshot blob
+    - Freezing and thawing are a single pack/unpack of the exported state, O(size)
+    - The live RoomManager (buffers, agent contexts, tasks, timers) is dropped
+    """
+
+    __slots__ = ("room_code", "blob", "version", "frozen_at")
+
+    def __init__(self, room_code: str, blob: bytes, version: int):
+        self.room_code = room_code
+        self.blob = blob
+        self.version = version
+        self.frozen_at = time.time()
+
+    @classmethod
+    def freeze(cls, room_code: str, state: Dict[str, Any]) -> "FrozenRoom":
+        return cls(room_code, compress_snapshot(encode_snapshot(state)), state.get("version", 0))
+
+    def thaw(self) -> Dict[str, Any]:
+        return decode_snapshot(decompress_snapshot(self.blob))
+
+
+class SnapshotStore:
+    """
+    Periodic room snapshots on local disk for fast restarts
+    - Incremental: a room is only rewritten when its version moved since the last save
+    - Non-blocking: the state is packed on the loop (one C call, no shared
+      references escape), compression and file IO run in a worker thread
+    - Compact: msgpack (JSON fallback) + zlib, written atomically via rename
+    - Lazy restore: nothing is read at startup, a room is loaded on its first connect
+    """
+
+    def __init__(self, directory: str, interval: float = 30.0, ttl_seconds: float = 24 * 3600):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.ttl_seconds = ttl_seconds
+        self._saved_versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "snapshots_written": 0,
+            "snapshots_skipped": 0,
+            "rooms_restored": 0,
+            "bytes_written": 0,
+            "last_pass_ms": 0.0,
+            "errors": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["SnapshotStore"]:
+        """SNAPSHOT_DIR="" disables snapshots"""
+        directory = os.getenv("SNAPSHOT_DIR", str(Path(__file__).resolve().parent.parent / "snapshots"))
+        if not directory:
+            return None
+        return cls(
+            directory,
+            interval=float(os.getenv("SNAPSHOT_INTERVAL", "30")),
+            ttl_seconds=float(os.getenv("SNAPSHOT_TTL", str(24 * 3600)))
+        )
+
+    def path_for(self, room_code: str) -> Path:
+        return self.directory / f"{room_code}{SNAPSHOT_SUFFIX}"
+
+    def has_snapshot(self, room_code: str) -> bool:
+        return self.path_for(room_code).exists()
+
+    def start(self, manager):
+        if not self._task:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._task = asyncio.create_task(self._periodic_snapshots(manager))
+
+    async def _periodic_snapshots(self, manager):
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.save_all(manager.rooms.values())
+                await asyncio.to_thread(self._prune_expired)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.metrics["errors"] += 1
+                print(f"Error in snapshot task: {e}")
+
+    async def save_all(self, rooms) -> int:
+        started = time.perf_counter()
+        written = 0
+        for room in list(rooms):
+            if await self.save_room(room):
+                written += 1
+            await asyncio.sleep(0)  # Let socket traffic in between rooms
+        self.metrics["last_pass_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return written
+
+    async def save_room(self, room, force: bool = False) -> bool:
+        if not force and self._saved_versions.get(room.room_code) == room.version:
+            self.metrics["snapshots_skipped"] += 1
+            return False
+
+        version = room.version
+        body = encode_snapshot(room.export_state())
+        try:
+            size = await asyncio.to_thread(self._write, room.room_code, body)
+        except OSError as e:
+            self.metrics["errors"] += 1
+            print(f"❌ Snapshot of {room.room_code} failed: {e}")
+            return False
+
+        self._saved_versions[room.room_code] = version
+        self.metrics["snapshots_written"] += 1
+        self.metrics["bytes_written"] += size
+        return True
+
+    async def load(self, room_code: str) -> Optional[Dict[str, Any]]:
+        """Read a room's last snapshot off the loop (None if missing or unreadable)"""
+        try:
+            state = await asyncio.to_thread(self._read, room_code)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"❌ Could not restore {room_code}: {e}")
+            return None
+
+        self.metrics["rooms_restored"] += 1
+        return state
+
+    def _write(self, room_code: str, body: bytes) -> int:
+        blob = compress_snapshot(body)
+        path = self.path_for(room_code)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return len(blob)
+
+    def _read(self, room_code: str) -> Dict[str, Any]:
+        with open(self.path_for(room_code), "rb") as f:
+            return decode_snapshot(decompress_snapshot(f.read()))
+
+    def _prune_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        for path in self.directory.glob(f"*{SNAPSHOT_SUFFIX}"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                self._saved_versions.pop(path.stem, None)
@@ -0,0 +1,52 @@
+import asyncio
+import weakref
+from typing import Dict, Optional
+
+# Tags of live tasks, readable from another thread while the loop is busy (or blocked)
+_task_tags: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Optional[str]]]" = weakref.WeakKeyDictionary()
+
+
+def tag_task(**tags: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Attach attribution tags (room_code, message_type, agent, activity) to the running task
+    - Returns the task's tag dict, so a long-lived task (one socket's handler loop)
+      can update a tag per message with a plain dict store
+    - A throwaway dict outside a task
+    """
+    task = asyncio.current_task()
+    if task is None:
+        return dict(tags)
+    current = _task_tags.get(task)
+    if current is None:
+        current = _task_tags[task] = {}
+    current.update(tags)
+    return current
+
+
+def inherit_task_tags(loop: asyncio.AbstractEventLoop):
+    """
+    Install a task factory that copies the creating task's tags to the new task
+    - Background work an agent spawns (create_task, gather) is then attributed
+      to the room and agent that started it
+    - Runs once per task creation, never per message; wraps any existing factory
+    """
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        parent = asyncio.current_task(loop)
+        if parent is not None:
+            tags = _task_tags.get(parent)
+            if tags:
+                _task_tags[task] = dict(tags)
+        return task
+
+    loop.set_task_factory(factory)
+
+
+def running_task_tags(loop: asyncio.AbstractEventLoop) -> Dict[str, Optional[str]]:
+    """Tags of the task `loop` is running right now; safe to call from another thread"""
+    task: Optional[asyncio.Task] = asyncio.current_task(loop)
+    if task is None:
+        return {}
+    return {"task": task.get_name(), **_task_tags.get(task, {})}
@@ -0,0 +1,223 @@
+import asyncio
+import inspect
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Slots per level: 256 x 0.1s covers 25.6s, then ~27min, then ~29h
+DEFAULT_LEVELS = (256, 64, 64)
+
+
+class TimerHandle:
+    """One scheduled callback; cancel() unlinks it from its slot in O(1)"""
+
+    __slots__ = ("wheel", "expires", "interval", "callback", "args", "level", "slot", "cancelled")
+
+    def __init__(self, wheel: "TimerWheel", expires: int, interval: int, callback: Callable, args: tuple):
+        self.wheel = wheel
+        self.expires = expires      # absolute tick
+        self.interval = interval    # ticks between repeats, 0 = one-shot
+        self.callback = callback
+        self.args = args
+        self.level = -1
+        self.slot: Optional[Dict] = None
+        self.cancelled = False
+
+    @property
+    def active(self) -> bool:
+        return not self.cancelled and (self.slot is not None or self.interval > 0)
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self.slot is not None:
+            self.wheel._unlink(self)
+        self.wheel.metrics["cancelled"] += 1
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel for the server's coarse timers (poll expiry,
+    analysis ticks, heartbeats, idle-room cleanup)
+    - Scheduling and cancelling are O(1): a timer lives in one hashed slot and
+      moves down a level at most once per level as its deadline approaches
+    - One driver task advances the wheel; while the lowest level is empty it
+      sleeps straight to the next cascade instead of waking every tick, and it
+      sleeps indefinitely when no timers exist
+    - Resolution is one tick, so sub-tick delays (debounces) stay on loop.call_later
+    - Callbacks may be plain functions or return a coroutine, which is spawned as a task
+    """
+
+    def __init__(self, tick: float = 0.1, levels=DEFAULT_LEVELS):
+        self.tick = tick
+        self.sizes = tuple(levels)
+        self._spans = [math.prod(self.sizes[:level]) for level in range(len(self.sizes))]
+        self._horizon = math.prod(self.sizes)
+        self._wheels: List[List[Dict[TimerHandle, None]]] = [[{} for _ in range(size)] for size in self.sizes]
+        self._counts = [0] * len(self.sizes)
+
+        self._origin = time.monotonic()
+        self._now_tick = 0  # last processed tick
+        self._wakeup = asyncio.Event()
+        self._driver: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "scheduled": 0,
+            "fired": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "max_lag_ms": 0.0
+        }
+
+    def start(self):
+        if not self._driver:
+            self._now_tick = max(self._now_tick, self._current_tick())
+            self._driver = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._driver:
+            self._driver.cancel()
+            self._driver = None
+
+    def __len__(self) -> int:
+        return sum(self._counts)
+
+    # === Scheduling ===
+
+    def schedule(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Run `callback(*args)` once, `delay` seconds from now (rounded up to a tick)"""
+        return self._add(delay, 0, callback, args)
+
+    def schedule_repeating(self, interval: float, callback: Callable, *args) -> TimerHandle:
+        """Run `callback(*args)` every `interval` seconds until the handle is cancelled"""
+        return self._add(interval, max(1, math.ceil(interval / self.tick)), callback, args)
+
+    def _add(self, delay: float, interval: int, callback: Callable, args: tuple) -> TimerHandle:
+        if not len(self):
+            # Nothing was pending, so the driver may have stopped counting ticks
+            self._now_tick = max(self._now_tick, self._current_tick())
+        start = max(self._now_tick, self._current_tick())
+        handle = TimerHandle(self, start + max(1, math.ceil(delay / self.tick)), interval, callback, args)
+        self._place(handle)
+        self.metrics["scheduled"] += 1
+        if handle.level == 0 or len(self) == 1:
+            self._wakeup.set()
+        return handle
+
+    def _current_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick)
+
+    def _place(self, handle: TimerHandle):
+        # Far-future timers park in the top level and are re-placed when it cascades
+        expires = min(handle.expires, self._now_tick + self._horizon - 1)
+        remaining = expires - self._now_tick
+        level = 0
+        while level < len(self.sizes) - 1 and remaining >= self._spans[level + 1]:
+            level += 1
+        slot = self._wheels[level][(expires // self._spans[level]) % self.sizes[level]]
+        slot[handle] = None
+        handle.level = level
+        handle.slot = slot
+        self._counts[level] += 1
+
+    def _unlink(self, handle: TimerHandle):
+        del handle.slot[handle]
+        self._counts[handle.level] -= 1
+        handle.slot = None
+
+    # === Driver ===
+
+    async def _run(self):
+        while True:
+            try:
+                self._advance(self._current_tick())
+
+                if not len(self):
+                    timeout = None
+                elif self._counts[0]:
+                    timeout = self._origin + (self._now_tick + 1) * self.tick - time.monotonic()
+                else:
+                    next_cascade = (self._now_tick // self.sizes[0] + 1) * self.sizes[0]
+                    timeout = self._origin + next_cascade * self.tick - time.monotonic()
+
+                self._wakeup.clear()
+                if timeout is None or timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in timer wheel: {e}")
+
+    def _advance(self, target: int):
+        """Process every tick up to and including `target`"""
+        first = self.sizes[0]
+        while self._now_tick < target:
+            if not self._counts[0]:
+                # Nothing can fire before the next cascade boundary
+                boundary = (self._now_tick // first + 1) * first
+                if boundary > target:
+                    self._now_tick = target
+                    return
+                self._now_tick = boundary - 1
+            self._step()
+
+    def _step(self):
+        self._now_tick += 1
+        tick = self._now_tick
+
+        # Cascade from the top down so timers can drop more than one level
+        for level in range(len(self.sizes) - 1, 0, -1):
+            if tick % self._spans[level] == 0:
+                self._cascade(level, (tick // self._spans[level]) % self.sizes[level])
+
+        index = tick % self.sizes[0]
+        due = self._wheels[0][index]
+        if not due:
+            return
+        self._wheels[0][index] = {}
+        self._counts[0] -= len(due)
+
+        lag_ms = round((time.monotonic() - self._origin - tick * self.tick) * 1000, 1)
+        if lag_ms > self.metrics["max_lag_ms"]:
+            self.metrics["max_lag_ms"] = lag_ms
+
+        for handle in due:
+            handle.slot = None
+            if handle.expires > tick:
+                self._place(handle)  # Parked far-future timer, not due yet
+                continue
+            self._fire(handle)
+            if handle.interval and not handle.cancelled:
+                handle.expires = tick + handle.interval
+                self._place(handle)
+
+    def _cascade(self, level: int, index: int):
+        slot = self._wheels[level][index]
+        if not slot:
+            return
+        self._wheels[level][index] = {}
+        self._counts[level] -= len(slot)
+        for handle in slot:
+            self._place(handle)
+
+    def _fire(self, handle: TimerHandle):
+        self.metrics["fired"] += 1
+        try:
+            result = handle.callback(*handle.args)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"Error in timer callback {getattr(handle.callback, '__qualname__', handle.callback)}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tick_ms": round(self.tick * 1000, 1),
+            "pending": len(self),
+            "pending_by_level": list(self._counts),
+            **self.metrics
+        }
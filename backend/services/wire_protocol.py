@@ -0,0 +1,198 @@
+import json
+import struct
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # Binary framing is optional, JSON always works
+    msgpack = None
+
+JSON_SUBPROTOCOL = "audiencepulse.json"
+MSGPACK_SUBPROTOCOL = "audiencepulse.msgpack.v1"
+
+# Append-only tables: indexes are part of the v1 wire format
+MESSAGE_TYPES = [
+    "connected", "reaction", "question", "question_upvote", "top_questions",
+    "poll_created", "poll_vote", "poll_closed", "stats", "stats_delta",
+    "not_modified", "ai_insights", "pong", "get_stats", "subscribe",
+    "unsubscribe", "create_poll", "vote_poll", "upvote_question",
+    "request_ai_analysis", "ping", "rate_limited", "reaction_counts"
+]
+
+REACTION_CODES = ["speed_up", "slow_down", "show_code", "im_lost"]
+
+INTERNED_KEYS = [
+    # Envelope and room state
+    "type", "data", "counts", "heatmap_data", "timestamp", "user_id", "id",
+    "text", "upvotes", "upvoted_by", "speed_up", "slow_down", "show_code",
+    "im_lost", "reactions", "time", "total_questions", "recent_questions",
+    "recent_reactions", "top_questions", "hot_score", "active_connections",
+    "active_poll", "ai_insights", "pacing", "qa_grouping", "sentiment",
+    "version", "changes", "message", "yes_votes", "no_votes", "voted_users",
+    "started_at", "duration", "active", "poll_id", "question_id", "vote",
+    "reaction",
+    # Agent results
+    "agent", "pacing_status", "alert_level", "engagement_score",
+    "predicted_trend", "action_required", "title", "recommendation",
+    "reasoning", "suggested_actions", "urgency", "reaction_velocity",
+    "velocity_trend", "trend_confidence", "alerts", "reaction_counts",
+    "total_reactions", "response_time", "analysis_timestamp", "ai_enhancement",
+    "rate", "trend", "intensity", "status", "themes", "name", "count",
+    "examples", "priority", "category", "questions", "question_count",
+    "total_upvotes", "avg_upvotes", "confidence", "insights", "quality_score",
+    "analysis_method", "overall_sentiment", "dominant_emotion",
+    "urgency_level", "audience_mood", "recommendations", "direction",
+    "data_source", "analyzed_messages", "analyzed_reactions", "data_quality",
+    "icon", "action", "suggested_response", "time_to_address",
+    "avg_engagement", "total_themes", "analyzed_questions", "filtered_out",
+    "message_analysis", "reaction_analysis", "emotion", "source"
+]
+
+# Keys whose string values are reaction codes and get sent as small ints
+REACTION_VALUED_KEYS = {"type", "reaction"}
+
+# Omitted from binary frames: implied by the connection's room
+IMPLIED_KEYS = {"room_code"}
+
+ANON_USER_PREFIX = "anon-"
+ANON_USER_EXT = 1
+TIMESTAMP_EXT = 2
+
+
+class JsonCodec:
+    """Default text framing, identical to what existing clients expect"""
+
+    name = "json"
+    binary = False
+
+    def __init__(self, subprotocol: Optional[str] = None):
+        self.subprotocol = subprotocol
+
+    def encode(self, message: Dict[str, Any]) -> str:
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+    def decode(self, raw: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(raw)
+
+
+class MsgpackCodec:
+    """
+    Compact binary framing: frame = [type_tag, body]
+    - Message types, common keys and reaction codes become small ints
+    - ISO timestamps and "anon-<float>" user ids become 8-byte ext values
+      (user ids only when the float prints back to the same string)
+    - room_code is dropped (the socket is already bound to a room)
+    """
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        self.subprotocol = MSGPACK_SUBPROTOCOL
+
+        self._type_tags = {name: i for i, name in enumerate(MESSAGE_TYPES)}
+        self._key_ids = {key: i for i, key in enumerate(INTERNED_KEYS)}
+        self._reaction_ids = {code: i for i, code in enumerate(REACTION_CODES)}
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        message_type = message.get("type")
+        body = {
+            self._key_ids.get(key, key): self._pack_value(key, value)
+            for key, value in message.items()
+            if key != "type" and key not in IMPLIED_KEYS
+        }
+        frame = [self._type_tags.get(message_type, message_type), body]
+        return msgpack.packb(frame, use_bin_type=True)
+
+    def decode(self, raw: Union[str, bytes]) -> Dict[str, Any]:
+        if isinstance(raw, str):
+            # Tolerate clients that fall back to text frames
+            return json.loads(raw)
+
+        type_tag, body = msgpack.unpackb(
+            raw,
+            raw=False,
+            strict_map_key=False,
+            ext_hook=self._unpack_ext
+        )
+        message = self._unpack_map(body)
+        message["type"] = MESSAGE_TYPES[type_tag] if isinstance(type_tag, int) else type_tag
+        return message
+
+    def _pack_value(self, key: Any, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                self._key_ids.get(k, k): self._pack_value(k, v)
+                for k, v in value.items()
+                if k not in IMPLIED_KEYS
+            }
+        if isinstance(value, list):
+            return [self._pack_value(key, item) for item in value]
+        if isinstance(value, str):
+            if key in REACTION_VALUED_KEYS and value in self._reaction_ids:
+                return self._reaction_ids[value]
+            if key == "user_id" and value.startswith(ANON_USER_PREFIX):
+                try:
+                    number = float(value[len(ANON_USER_PREFIX):])
+                except ValueError:
+                    return value
+                # Only ids that decode back to the same string ("anon-007" or "anon-1e5" would not)
+                if f"{ANON_USER_PREFIX}{number}" == value:
+                    return msgpack.ExtType(ANON_USER_EXT, struct.pack(">d", number))
+                return value
+            if key in ("timestamp", "started_at", "analysis_timestamp"):
+                try:
+                    return msgpack.ExtType(TIMESTAMP_EXT, struct.pack(">d", datetime.fromisoformat(value).timestamp()))
+                except ValueError:
+                    return value
+        return value
+
+    def _unpack_map(self, body: Dict[Any, Any]) -> Dict[str, Any]:
+        message = {}
+        for key, value in body.items():
+            if isinstance(key, int):
+                key = INTERNED_KEYS[key]
+            message[key] = self._unpack_value(key, value)
+        return message
+
+    def _unpack_value(self, key: str, value: Any) -> Any:
+        if isinstance(value, dict):
+            return self._unpack_map(value)
+        if isinstance(value, list):
+            return [self._unpack_value(key, item) for item in value]
+        if key in REACTION_VALUED_KEYS and isinstance(value, int) and not isinstance(value, bool):
+            return REACTION_CODES[value]
+        return value
+
+    def _unpack_ext(self, code: int, data: bytes) -> Any:
+        value = struct.unpack(">d", data)[0]
+        if code == ANON_USER_EXT:
+            return f"{ANON_USER_PREFIX}{value}"
+        if code == TIMESTAMP_EXT:
+            return value  # Binary clients get epoch seconds
+        return msgpack.ExtType(code, data)
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+# Codecs are stateless, so every connection shares these instances
+json_codec = JsonCodec()
+_json_subprotocol_codec = JsonCodec(subprotocol=JSON_SUBPROTOCOL)
+msgpack_codec = MsgpackCodec() if msgpack_available() else None
+
+
+def negotiate_codec(requested_subprotocols: List[str]):
+    """
+    Pick the framing from the Sec-WebSocket-Protocol offer
+    JSON stays the default when nothing (or nothing supported) is requested
+    """
+    if MSGPACK_SUBPROTOCOL in requested_subprotocols and msgpack_codec:
+        return msgpack_codec
+    if JSON_SUBPROTOCOL in requested_subprotocols:
+        return _json_subprotocol_codec
+    return json_codec
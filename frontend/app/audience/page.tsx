@@ -120,7 +120,7 @@ export default function AudiencePage() {
             if (message.active_poll) {
               setActivePoll(message.active_poll);
             }
-          } else if (message.type === 'reaction' && message.counts) {
+          } else if (message.type === 'reaction_counts' && message.counts) {
             setReactionCounts(message.counts);
           } else if (message.type === 'question') {
             const newQuestion = {
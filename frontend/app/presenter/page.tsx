@@ -91,20 +91,13 @@ export default function PresenterDashboard() {
     if (!roomCode) return;
 
     try {
-      const ws = new WebSocket(`${WS_BASE_URL}/${roomCode}`);
+      const ws = new WebSocket(`${WS_BASE_URL}/${roomCode}?role=presenter`);
       
       ws.onopen = () => {
         console.log(`✅ Presenter connected to room ${roomCode}`);
         setConnectionStatus('connected');
-        ws.send(JSON.stringify({ type: 'get_stats' }));
-        
-        const pollInterval = setInterval(() => {
-          if (ws.readyState === WebSocket.OPEN) {
-            ws.send(JSON.stringify({ type: 'get_stats' }));
-          }
-        }, 5000);
-        
-        (ws as any).pollInterval = pollInterval;
+        // One snapshot, then the server pushes stats_delta frames as the room changes
+        ws.send(JSON.stringify({ type: 'subscribe' }));
       };
 
       ws.onmessage = (event) => {
@@ -116,13 +109,15 @@ export default function PresenterDashboard() {
           } else if (message.type === 'ai_insights') {
             console.log('🤖 AI Insights received:', message.data);
             setAiInsights(message.data);
-          } else if (message.type === 'reaction') {
+          } else if (message.type === 'reaction_counts') {
+            // Latest aggregate only: the server may skip these while we are behind
             if (message.counts) {
               handleReactionUpdate(message.counts);
             }
             if (message.heatmap_data) {
               setHeatmapData(message.heatmap_data);
             }
+          } else if (message.type === 'reaction') {
             if (message.data) {
               setRecentReactions(prev => [message.data, ...prev].slice(0, 50));
               if (message.data.user_id) {
@@ -162,28 +157,32 @@ export default function PresenterDashboard() {
                 setActivePoll(null);
               }, 5000);
             }
-          } else if (message.type === 'stats') {
-            if (message.counts) {
-              handleReactionUpdate(message.counts);
+          } else if (message.type === 'stats' || message.type === 'stats_delta') {
+            const isDelta = message.type === 'stats_delta';
+            const stats = isDelta ? message.changes : message;
+            if (stats.counts) {
+              handleReactionUpdate(stats.counts);
             }
-            if (message.heatmap_data) {
-              setHeatmapData(message.heatmap_data);
+            if (stats.heatmap_data) {
+              setHeatmapData(stats.heatmap_data);
             }
-            setActiveConnections(message.active_connections || 0);
-            if (message.recent_questions) {
-              setQuestions(message.recent_questions.reverse());
+            if (!isDelta || stats.active_connections !== undefined) {
+              setActiveConnections(stats.active_connections || 0);
             }
-            if (message.recent_reactions) {
-              setRecentReactions(message.recent_reactions.reverse());
-              message.recent_reactions.forEach((r: any) => {
+            if (stats.recent_questions) {
+              setQuestions(stats.recent_questions.reverse());
+            }
+            if (stats.recent_reactions) {
+              setRecentReactions(stats.recent_reactions.reverse());
+              stats.recent_reactions.forEach((r: any) => {
                 if (r.user_id) addParticipant(r.user_id);
               });
             }
-            if (message.active_poll) {
-              setActivePoll(message.active_poll);
+            if (stats.active_poll) {
+              setActivePoll(stats.active_poll);
             }
-            if (message.ai_insights) {
-              setAiInsights(message.ai_insights);
+            if (stats.ai_insights) {
+              setAiInsights(stats.ai_insights);
             }
           }
         } catch (err) {
@@ -200,10 +199,6 @@ export default function PresenterDashboard() {
         console.log('🔌 Disconnected from feedback system');
         setConnectionStatus('disconnected');
         
-        if ((ws as any).pollInterval) {
-          clearInterval((ws as any).pollInterval);
-        }
-        
         reconnectTimeoutRef.current = setTimeout(() => {
           console.log('🔄 Attempting to reconnect...');
           setConnectionStatus('connecting');